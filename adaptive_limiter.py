@@ -0,0 +1,106 @@
+"""
+AIMD adaptive concurrency limiter.
+
+The limit grows additively (about +1 per limit's worth of healthy calls)
+while latency stays close to its smoothed baseline, and is cut
+multiplicatively when a call fails with an overload error or its latency
+spikes above ``latency_tolerance`` times the baseline.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, name: str, initial_limit: int = 4, min_limit: int = 1,
+                 max_limit: int = 16, latency_tolerance: float = 2.0,
+                 backoff_ratio: float = 0.5, smoothing: float = 0.2):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._latency_ewma: Optional[float] = None
+        self._last_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._increases = 0
+        self._decreases = 0
+        self._calls = 0
+        self._errors = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Hold a concurrency slot; call ``record`` on the yielded object"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+        outcome = _Outcome()
+        started = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            self._update(time.monotonic() - started, outcome.overloaded)
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _update(self, latency: float, overloaded: bool) -> None:
+        self._calls += 1
+        self._last_latency = latency
+        baseline = self._latency_ewma
+
+        spiked = baseline is not None and latency > baseline * self.latency_tolerance
+        if overloaded or spiked:
+            if overloaded:
+                self._errors += 1
+            # Only cut once per round trip so a burst of slow calls started
+            # under the old limit doesn't collapse it to the minimum
+            now = time.monotonic()
+            if now - self._last_decrease >= (baseline or latency):
+                self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                self._last_decrease = now
+                self._decreases += 1
+        elif self._in_flight >= self.limit:
+            # Only grow when the limit is actually what holds callers back
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self._increases += 1
+
+        if not overloaded:
+            if baseline is None:
+                self._latency_ewma = latency
+            else:
+                self._latency_ewma = baseline + self.smoothing * (latency - baseline)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'in_flight': self._in_flight,
+            'latency_ewma_ms': round(self._latency_ewma * 1000, 1) if self._latency_ewma is not None else None,
+            'last_latency_ms': round(self._last_latency * 1000, 1) if self._last_latency is not None else None,
+            'calls': self._calls,
+            'overload_errors': self._errors,
+            'increases': self._increases,
+            'decreases': self._decreases,
+        }
+
+
+class _Outcome:
+    """Lets the caller flag a call as failed due to overload"""
+
+    def __init__(self):
+        self.overloaded = False
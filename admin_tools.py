@@ -3,7 +3,8 @@ import logging
 import sqlite3
 from typing import List, Dict, Any
 from database import Database
-from google_services import GoogleSheetsService
+from google_quota import PRIORITY_ADMIN
+from google_services import GoogleDriveService, GoogleSheetsService
 from notification_service import NotificationService
 
 logger = logging.getLogger(__name__)
@@ -12,7 +13,7 @@ class AdminTools:
     def __init__(self):
         self.db = Database()
         self.sheets_service = GoogleSheetsService()
-        self.notification_service = NotificationService()
+        self.notification_service = NotificationService(self.db)
     
     async def get_all_submissions(self) -> List[Dict[str, Any]]:
         """Get all submissions from database"""
@@ -68,32 +69,14 @@ class AdminTools:
     async def get_submission_stats(self) -> Dict[str, Any]:
         """Get submission statistics"""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Total submissions
-                cursor.execute('SELECT COUNT(*) FROM submissions')
-                total = cursor.fetchone()[0]
-                
-                # Pending submissions
-                cursor.execute('SELECT COUNT(*) FROM submissions WHERE status = "pending"')
-                pending = cursor.fetchone()[0]
-                
-                # Approved submissions
-                cursor.execute('SELECT COUNT(*) FROM submissions WHERE status = "approved"')
-                approved = cursor.fetchone()[0]
-                
-                # Rejected submissions
-                cursor.execute('SELECT COUNT(*) FROM submissions WHERE status = "rejected"')
-                rejected = cursor.fetchone()[0]
-                
-                return {
-                    'total': total,
-                    'pending': pending,
-                    'approved': approved,
-                    'rejected': rejected
-                }
+            # Maintained by triggers, so this doesn't scan submissions
+            counts = await self.db.get_rollup_counts()
+            return {
+                'total': sum(counts.values()),
+                'pending': counts.get('pending', 0),
+                'approved': counts.get('approved', 0),
+                'rejected': counts.get('rejected', 0)
+            }
                 
         except Exception as e:
             logger.error(f"Error getting submission stats: {e}")
@@ -114,7 +97,7 @@ class AdminTools:
             with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
                 fieldnames = ['id', 'name', 'address', 'phone', 'telegram_username', 
                              'audio_drive_link', 'submitted_at', 'status', 'reviewer_comments']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
                 
                 writer.writeheader()
                 for submission in submissions:
@@ -134,7 +117,7 @@ class AdminTools:
             submissions = await self.get_all_submissions()
             
             # Get submissions from Google Sheets
-            sheets_data = await self.sheets_service.get_submissions()
+            sheets_data = await self.sheets_service.get_submissions(priority=PRIORITY_ADMIN)
             
             # Compare and sync if needed
             # This is a simplified version - in production you'd want more sophisticated sync logic
@@ -145,22 +128,92 @@ class AdminTools:
             logger.error(f"Error syncing with Google Sheets: {e}")
             return False
     
+    async def reconcile_local_audio(self) -> int:
+        """Migrate all local-fallback audio files to Google Drive"""
+        from audio_reconciler import AudioReconciler
+        from local_storage_service import LocalStorageService
+        
+        try:
+            reconciler = AudioReconciler(
+                self.db, GoogleDriveService(), self.sheets_service, LocalStorageService()
+            )
+            migrated = 0
+            while True:
+                batch = await reconciler.run_once()
+                migrated += batch
+                if batch < reconciler.batch_size:
+                    break
+            
+            logger.info(f"Migrated {migrated} local audio files to Google Drive")
+            return migrated
+            
+        except Exception as e:
+            logger.error(f"Error reconciling local audio: {e}")
+            return 0
+    
+    def _storage_quota(self, with_drive: bool = False):
+        from local_storage_service import LocalStorageService
+        from storage_quota import StorageQuotaManager
+        
+        local_storage = LocalStorageService()
+        reconciler = None
+        if with_drive:
+            from audio_reconciler import AudioReconciler
+            reconciler = AudioReconciler(
+                self.db, GoogleDriveService(), self.sheets_service, local_storage
+            )
+        return StorageQuotaManager(local_storage, reconciler=reconciler)
+    
+    async def get_storage_report(self) -> Dict[str, Any]:
+        """Local audio usage, quota and archival backlog"""
+        from config import Config
+        
+        report = self._storage_quota().snapshot()
+        migrations = await self.db.get_audio_migration_candidates(
+            limit=1_000_000, max_attempts=Config.RECONCILER_MAX_ATTEMPTS
+        )
+        report['pending_drive_migrations'] = len(migrations)
+        return report
+    
+    async def enforce_storage_quota(self) -> Dict[str, int]:
+        """Archive cold local audio now if usage is above the high watermark"""
+        try:
+            quota = self._storage_quota(with_drive=True)
+            result = await quota.enforce()
+            logger.info(f"Storage quota enforced: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Error enforcing storage quota: {e}")
+            return {}
+    
+    def reindex_local_audio(self) -> int:
+        """Add local audio files written before the file index existed"""
+        from local_storage_service import LocalStorageService
+        
+        indexed = LocalStorageService().rebuild_index()
+        logger.info(f"Indexed {indexed} local audio files")
+        return indexed
+    
     async def cleanup_old_data(self, days_old: int = 30) -> int:
         """Clean up old submission data"""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    DELETE FROM submissions 
-                    WHERE submitted_at < datetime('now', '-{} days')
-                '''.format(days_old))
-                
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                logger.info(f"Cleaned up {deleted_count} old submissions")
-                return deleted_count
+            # Also drops the submissions' fingerprints, previews and dedup
+            # entries, in the same transaction
+            deleted_count = await self.db.purge_submissions(days_old)
+            await self.db.purge_bookkeeping(days_old)
+            
+            # Local audio no longer referenced by any submission, found via
+            # the file index rather than by walking audio_files/
+            from local_storage_service import LocalStorageService
+            local_storage = LocalStorageService()
+            removed_files = 0
+            for file_path in local_storage.get_files_older_than(days_old):
+                if not await self.db.is_audio_path_referenced(file_path):
+                    local_storage.delete_file(file_path)
+                    removed_files += 1
+            
+            logger.info(f"Cleaned up {deleted_count} old submissions and {removed_files} audio files")
+            return deleted_count
                 
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
@@ -177,6 +230,10 @@ async def main():
     parser.add_argument('--export', type=str, help='Export submissions to CSV file')
     parser.add_argument('--sync', action='store_true', help='Sync with Google Sheets')
     parser.add_argument('--cleanup', type=int, help='Clean up data older than N days')
+    parser.add_argument('--reconcile', action='store_true', help='Migrate local-fallback audio to Google Drive')
+    parser.add_argument('--reindex', action='store_true', help='Index local audio files saved before the index existed')
+    parser.add_argument('--storage', action='store_true', help='Show local audio storage usage and archival backlog')
+    parser.add_argument('--archive', action='store_true', help='Archive cold local audio if over the storage quota')
     
     args = parser.parse_args()
     
@@ -207,6 +264,33 @@ async def main():
         success = await admin.sync_with_google_sheets()
         print(f"Sync {'successful' if success else 'failed'}")
     
+    if args.reconcile:
+        migrated = await admin.reconcile_local_audio()
+        print(f"Migrated {migrated} local audio files to Google Drive")
+    
+    if args.storage:
+        report = await admin.get_storage_report()
+        mb = 1024 * 1024
+        print("Local Audio Storage:")
+        print(f"On disk: {report['bytes'] / mb:.1f} MB in {report['files']} files "
+              f"({report['used_ratio']:.0%} of {report['max_bytes'] / mb:.0f} MB)")
+        print(f"Watermarks: high {report['high_watermark']:.0%}, low {report['low_watermark']:.0%} "
+              f"(mode: {report['mode']})")
+        print(f"Archived: {report['archived_bytes'] / mb:.1f} MB in {report['archived_files']} files")
+        print(f"Archival backlog: {report['backlog']['bytes'] / mb:.1f} MB "
+              f"in {report['backlog']['files']} files")
+        print(f"Pending Drive migrations: {report['pending_drive_migrations']}")
+    
+    if args.archive:
+        result = await admin.enforce_storage_quota()
+        print(f"Migrated {result.get('drive_migrated', 0)} files to Google Drive, "
+              f"archived {result.get('archived_files', 0)} files "
+              f"({result.get('archived_bytes', 0) / 1024 / 1024:.1f} MB)")
+    
+    if args.reindex:
+        indexed = admin.reindex_local_audio()
+        print(f"Indexed {indexed} local audio files")
+    
     if args.cleanup:
         deleted = await admin.cleanup_old_data(args.cleanup)
         print(f"Cleaned up {deleted} old submissions")
@@ -0,0 +1,282 @@
+"""
+Background worker that scores submitted recordings for reviewer triage.
+
+Each new submission's audio is materialised as a local file, decoded and
+measured in the AudioPipeline process pool (see ``audio_features``), and
+the results are stored on the ``submissions`` row:
+
+    pending -> analyzed -> synced
+
+``synced`` means the score has also been written to the Google Sheets row,
+so reviewers can sort by it and skip unusable recordings.
+
+The same decode yields a fingerprint (see ``audio_fingerprint``); a
+submission whose recording matches an earlier one is flagged with
+``duplicate_of`` and a warning in the sheet. Recordings that got no
+preview clip at upload time (see ``audio_preview``) get one here.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+import metrics
+from audio_features import analyze_file
+from audio_fingerprint import MIN_MATCHES, bit_error_rate, index_entries
+from audio_pipeline import AudioPipeline, extension_for
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import Config
+from database import Database
+from disk_cache import audio_cache
+from storage_refs import storage_type_for, strip_prefix
+
+logger = logging.getLogger(__name__)
+
+
+def summarize(features: Dict[str, Any]) -> str:
+    """One-line description of the features for the sheet"""
+    parts = [f"{features['duration_seconds']:.0f}s"]
+    if features.get('loudness_dbfs') is not None:
+        parts.append(f"{features['loudness_dbfs']:.0f} dBFS")
+    parts.append(f"{features['silence_pct']:.0f}% silence")
+    parts.append(f"clipping {features['clipping_ratio'] * 100:.2f}%")
+    if features.get('pitch_stability') is not None:
+        parts.append(f"pitch {features['pitch_stability']:.2f}")
+    flags = features.get('quality_flags') or []
+    if isinstance(flags, str):
+        flags = [flag for flag in flags.split(', ') if flag]
+    if flags:
+        parts.append(f"⚠ {', '.join(flags)}")
+    return ' · '.join(parts)
+
+
+class AudioAnalyzer:
+    def __init__(self, db: Database, sheets_service, pipeline: AudioPipeline,
+                 local_storage=None, drive_service=None, telegram_storage=None,
+                 database_storage=None, sheets_breaker: Optional[CircuitBreaker] = None,
+                 previews=None, enabled: bool = None, batch_size: int = None,
+                 link_for: Optional[Callable[[str], str]] = None):
+        self.db = db
+        self.sheets_service = sheets_service
+        self.pipeline = pipeline
+        self.local_storage = local_storage
+        self.drive_service = drive_service
+        self.telegram_storage = telegram_storage
+        self.database_storage = database_storage
+        self.sheets_breaker = sheets_breaker
+        self.previews = previews
+        # Audio cell value of a stored file, to find rows that predate the ID column
+        self.link_for = link_for
+        self.enabled = Config.AUDIO_ANALYSIS_ENABLED if enabled is None else enabled
+        self.batch_size = batch_size or Config.AUDIO_ANALYSIS_BATCH_SIZE
+        self._wake = asyncio.Event()
+
+        if self.enabled and not pipeline.ffmpeg:
+            logger.warning("Audio analysis enabled but ffmpeg was not found; skipping it")
+
+        self.stats = {
+            'analyzed': 0,
+            'synced': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'audio_seconds': 0.0,
+            'last_run': None,
+            'last_error': None,
+        }
+        metrics.register('audio_analysis', self.snapshot)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.enabled and self.pipeline.ffmpeg)
+
+    def wake(self) -> None:
+        """Analyse new submissions now instead of at the next interval"""
+        self._wake.set()
+
+    def _fetch_database_audio(self, object_id: str) -> Path:
+        def download(destination: Path) -> str:
+            audio = self.database_storage.get_object(object_id)
+            if not audio:
+                raise FileNotFoundError(object_id)
+            with open(destination, 'wb') as f:
+                for chunk in self.database_storage.iter_range(object_id):
+                    f.write(chunk)
+            return extension_for(audio['mime_type'])
+
+        return audio_cache.get_or_fetch('database', object_id, download)
+
+    def _local_copy(self, ref: str) -> Path:
+        """Blocking: a local file holding the audio behind a storage reference"""
+        storage_type = storage_type_for(ref)
+        file_id = strip_prefix(ref)
+        if storage_type == 'local':
+            path = self.local_storage.storage_dir / file_id
+            if path.is_file():
+                return path
+            path = self.local_storage.fetch_archived(file_id)
+            if path is None:
+                raise FileNotFoundError(ref)
+            return path
+        if storage_type == 'telegram':
+            return self.telegram_storage.fetch_audio(file_id)
+        if storage_type == 'database':
+            if self.database_storage is None:
+                from database_storage_service import DatabaseStorageService
+                self.database_storage = DatabaseStorageService(read_only=True)
+            return self._fetch_database_audio(file_id)
+        return self.drive_service.fetch_audio(file_id)
+
+    async def _find_duplicate(self, submission_id: int,
+                              fingerprint: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Index a fingerprint and return the earlier submission it matches, if any"""
+        entries = index_entries(fingerprint)
+        await self.db.save_fingerprint(submission_id, fingerprint.tobytes(), entries)
+
+        candidates = await self.db.find_fingerprint_matches(
+            entries, before_submission_id=submission_id, min_matches=MIN_MATCHES
+        )
+        best = None
+        for candidate in candidates:
+            stored = await self.db.get_fingerprint(candidate['submission_id'])
+            if stored is None:
+                continue
+            error = bit_error_rate(
+                fingerprint, np.frombuffer(stored, dtype=np.uint32), candidate['offset']
+            )
+            if error is not None and error <= Config.DUPLICATE_MAX_BIT_ERROR:
+                if best is None or error < best['bit_error_rate']:
+                    best = {'submission_id': candidate['submission_id'], 'bit_error_rate': error}
+        return best
+
+    async def _ensure_preview(self, audio_ref: str, path: Path) -> None:
+        if self.previews is None or await self.previews.get(audio_ref):
+            return
+        try:
+            await self.previews.create(audio_ref, str(path))
+        except Exception as e:
+            # A missing preview never holds up the analysis
+            logger.warning(f"Could not create preview for {audio_ref}: {e}")
+
+    async def _sheets_call(self, func, *args):
+        if self.sheets_breaker:
+            return await self.sheets_breaker.call(func, *args)
+        return await func(*args)
+
+    async def _sync_sheet(self, submission: Dict[str, Any], features: Dict[str, Any]) -> None:
+        # Reviewers may have sorted the sheet since the row was appended
+        audio_cell = self.link_for(submission['audio_drive_link']) if self.link_for else None
+        sheet_row = await self._sheets_call(
+            self.sheets_service.resolve_row, submission['id'], submission['sheet_row'], audio_cell
+        )
+        if not sheet_row:
+            logger.warning(f"Sheet row of submission #{submission['id']} is gone; not writing its quality")
+            await self.db.update_analysis_status(submission['id'], 'synced', error='sheet row not found')
+            return
+        if sheet_row != submission['sheet_row']:
+            await self.db.set_submission_sheet_row(submission['id'], sheet_row)
+
+        preview = None
+        if self.previews is not None:
+            preview = await self.previews.get(submission['audio_drive_link'])
+        await self._sheets_call(
+            self.sheets_service.update_quality, sheet_row, features['quality_score'],
+            summarize(features), preview['link'] if preview else None
+        )
+        await self.db.update_analysis_status(submission['id'], 'synced')
+        self.stats['synced'] += 1
+
+    async def _process(self, submission: Dict[str, Any]) -> bool:
+        submission_id = submission['id']
+        features = submission
+        if submission.get('analysis_status') != 'analyzed':
+            try:
+                path = await asyncio.to_thread(self._local_copy, submission['audio_drive_link'])
+                features = await self.pipeline.run(
+                    analyze_file, str(Path(path).resolve()), self.pipeline.ffmpeg,
+                    Config.AUDIO_ANALYSIS_TIMEOUT
+                )
+                await self._ensure_preview(submission['audio_drive_link'], path)
+            except Exception as e:
+                stderr = getattr(e, 'stderr', b'') or b''
+                error = f"{e} {stderr.decode(errors='replace')[:200]}".strip()
+                logger.warning(f"Could not analyse audio of submission #{submission_id}: {error}")
+                await self.db.update_analysis_status(submission_id, 'pending', error=error)
+                self.stats['failed'] += 1
+                self.stats['last_error'] = error
+                return False
+
+            fingerprint = np.frombuffer(features.pop('fingerprint'), dtype=np.uint32)
+            duplicate = await self._find_duplicate(submission_id, fingerprint)
+            if duplicate:
+                score = round(1.0 - duplicate['bit_error_rate'], 3)
+                await self.db.mark_duplicate(submission_id, duplicate['submission_id'], score)
+                features['quality_flags'].append(
+                    f"possible duplicate of #{duplicate['submission_id']}"
+                )
+                self.stats['duplicates'] += 1
+                logger.info(
+                    f"Submission #{submission_id} looks like a re-submission of "
+                    f"#{duplicate['submission_id']} (similarity {score})"
+                )
+
+            await self.db.save_audio_features(submission_id, features)
+            self.stats['analyzed'] += 1
+            self.stats['audio_seconds'] += features['duration_seconds']
+            logger.info(f"Submission #{submission_id} quality score {features['quality_score']}")
+
+            # The sheet row is recorded just after the submission, re-read it
+            submission = await self.db.get_submission(submission_id) or submission
+
+        if not submission.get('sheet_row'):
+            return True
+        try:
+            await self._sync_sheet(submission, features)
+        except CircuitOpenError:
+            # Not an attempt: retried once the Sheets circuit closes
+            return False
+        except Exception as e:
+            # Stays 'analyzed' and is retried on the next run
+            logger.warning(f"Could not write quality of submission #{submission_id} to the sheet: {e}")
+            await self.db.update_analysis_status(submission_id, 'analyzed', error=str(e))
+            self.stats['last_error'] = str(e)
+            return False
+        return True
+
+    async def run_once(self) -> int:
+        """Analyse one batch of submissions, returning how many succeeded"""
+        if not self.active:
+            return 0
+
+        self.stats['last_run'] = datetime.now().isoformat()
+        candidates = await self.db.get_analysis_candidates(
+            limit=self.batch_size, max_attempts=Config.AUDIO_ANALYSIS_MAX_ATTEMPTS
+        )
+        # Decoding already runs in parallel across the pool's workers
+        results = await asyncio.gather(*(self._process(submission) for submission in candidates))
+        return sum(results)
+
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: analyse new submissions as they arrive"""
+        interval = interval or Config.AUDIO_ANALYSIS_INTERVAL
+        while self.active:
+            try:
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audio analysis run failed: {e}")
+                self.stats['last_error'] = str(e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'enabled': self.active, **self.stats,
+                'audio_seconds': round(self.stats['audio_seconds'], 1)}
@@ -0,0 +1,146 @@
+"""
+Content-addressed deduplication for stored audio.
+
+Audio is hashed (MD5, the checksum Drive reports as ``md5Checksum``) while
+it is downloaded from Telegram and looked up in the ``audio_blobs`` index
+before uploading. Telegram's ``file_unique_id`` is indexed too, so a retry
+or re-send of the same voice note skips the download as well.
+
+The stored copy may be a transcode of the original, so Drive copies are
+verified against the MD5 of the stored bytes (``stored_md5``).
+"""
+
+import hashlib
+import io
+import logging
+from typing import Any, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+import metrics
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from database import Database
+from database_storage_service import DatabaseStorageService
+from google_services import GoogleDriveService
+from local_storage_service import LocalStorageService
+from storage_refs import strip_prefix
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBuffer(io.BytesIO):
+    """In-memory buffer that hashes bytes as they are written"""
+
+    def __init__(self):
+        super().__init__()
+        self._md5 = hashlib.md5()
+
+    def write(self, data) -> int:
+        self._md5.update(data)
+        return super().write(data)
+
+    @property
+    def md5(self) -> str:
+        return self._md5.hexdigest()
+
+
+class AudioDeduplicator:
+    def __init__(self, db: Database, drive_service: GoogleDriveService,
+                 local_storage: LocalStorageService,
+                 drive_breaker: Optional[CircuitBreaker] = None,
+                 database_storage: Optional[DatabaseStorageService] = None):
+        self.db = db
+        self.drive_service = drive_service
+        self.local_storage = local_storage
+        self.database_storage = database_storage
+        self.drive_breaker = drive_breaker
+        self.stats = {
+            'telegram_id_hits': 0,
+            'content_hash_hits': 0,
+            'misses': 0,
+            'stale_entries': 0,
+            'bytes_saved': 0,
+        }
+        metrics.register('audio_dedup', lambda: dict(self.stats))
+
+    async def _verify(self, blob: Dict[str, Any]) -> Optional[bool]:
+        """Make sure the stored copy still exists and has the expected content.
+        
+        Returns None when Drive could not be asked, so the entry is kept.
+        """
+        if blob['storage_type'] == 'local':
+            return self.local_storage.exists(blob['storage_ref'])
+        if blob['storage_type'] == 'database' and self.database_storage:
+            return self.database_storage.exists(strip_prefix(blob['storage_ref']))
+        if blob['storage_type'] != 'google_drive':
+            return False
+
+        try:
+            if self.drive_breaker:
+                checksum = await self.drive_breaker.call(
+                    self.drive_service.get_md5_checksum, blob['storage_ref']
+                )
+            else:
+                checksum = await self.drive_service.get_md5_checksum(blob['storage_ref'])
+        except CircuitOpenError:
+            # Drive file IDs are stable; trust the index while Drive is down
+            return True
+        except HttpError as e:
+            if getattr(e.resp, 'status', None) == 404:
+                return False
+            logger.warning(f"Could not verify stored audio {blob['storage_ref']}: {e}")
+            return None
+        except Exception as e:
+            logger.warning(f"Could not verify stored audio {blob['storage_ref']}: {e}")
+            return None
+        if not blob.get('stored_md5'):
+            # Indexed before stored_md5 was recorded; the file exists, so adopt
+            # Drive's checksum of it (it may be a transcode of the original)
+            await self.db.set_audio_blob_stored_md5(blob['content_md5'], checksum)
+            return True
+        return checksum == blob['stored_md5']
+
+    async def _check(self, blob: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if blob is None:
+            return None
+        verified = await self._verify(blob)
+        if verified:
+            self.stats['bytes_saved'] += blob.get('size') or 0
+            return blob
+        if verified is False:
+            self.stats['stale_entries'] += 1
+            await self.db.forget_audio_blob(blob['content_md5'])
+        return None
+
+    async def find_by_telegram_id(self, file_unique_id: str) -> Optional[Dict[str, Any]]:
+        """Look up audio already stored for a Telegram file, without downloading it"""
+        blob = await self._check(await self.db.get_audio_blob_by_telegram_id(file_unique_id))
+        if blob:
+            self.stats['telegram_id_hits'] += 1
+        return blob
+
+    async def find_by_hash(self, content_md5: str,
+                           file_unique_id: str = None) -> Optional[Dict[str, Any]]:
+        """Look up audio already stored with the same content"""
+        blob = await self._check(await self.db.get_audio_blob(content_md5))
+        if blob:
+            self.stats['content_hash_hits'] += 1
+            if file_unique_id:
+                await self.db.link_telegram_audio(file_unique_id, content_md5)
+        else:
+            self.stats['misses'] += 1
+        return blob
+
+    async def remember(self, content_md5: str, storage_ref: str, storage_type: str,
+                       size: int, mime_type: str, file_unique_id: str = None,
+                       stored_md5: str = None) -> None:
+        """Index newly stored audio by content hash and Telegram file ID.
+        
+        ``content_md5`` is the hash of the original upload (the lookup key);
+        ``stored_md5`` that of the bytes actually stored, if they differ.
+        """
+        await self.db.save_audio_blob(
+            content_md5, storage_ref, storage_type, size, mime_type, stored_md5
+        )
+        if file_unique_id:
+            await self.db.link_telegram_audio(file_unique_id, content_md5)
@@ -0,0 +1,126 @@
+"""
+HTTP helpers shared by the audio endpoints.
+
+Stored audio never changes once written (files are named by UUID or a
+backend file ID), so responses carry a strong ETag derived from that ID,
+a long-lived immutable Cache-Control header and support byte ranges, so
+reviewers scrubbing through a sample don't download it again.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+
+from flask import Response, request, send_file
+
+# Voice notes and other formats some platforms don't map by default
+mimetypes.add_type('audio/ogg', '.oga')
+mimetypes.add_type('audio/ogg', '.opus')
+mimetypes.add_type('audio/mp4', '.m4a')
+mimetypes.add_type('audio/aac', '.aac')
+
+CACHE_MAX_AGE = 365 * 24 * 3600
+CACHE_CONTROL = f"public, max-age={CACHE_MAX_AGE}, immutable"
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies outside the file"""
+
+
+def guess_mime_type(filename: str, default: str = 'audio/mpeg') -> str:
+    """Detect the MIME type from the file extension"""
+    return mimetypes.guess_type(filename)[0] or default
+
+
+def etag_for(file_id: str) -> str:
+    """Strong ETag for an immutable stored file (without quotes)"""
+    return hashlib.sha256(file_id.encode('utf-8')).hexdigest()[:32]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into inclusive (start, end).
+
+    Returns None when the header is absent or not something we handle
+    (e.g. multiple ranges), in which case the whole file is sent.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _not_modified(etag: str) -> bool:
+    return etag in request.if_none_match
+
+
+def _apply_cache_headers(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def send_audio_file(path, file_id: str, mime_type: str = None) -> Response:
+    """Send an immutable audio file with Range and conditional GET support"""
+    etag = etag_for(file_id)
+    # send_file resolves relative paths against the app root, not the cwd
+    response = send_file(
+        os.path.abspath(path),
+        mimetype=mime_type or guess_mime_type(str(path)),
+        as_attachment=False,
+        conditional=True,
+        etag=etag,
+        max_age=CACHE_MAX_AGE
+    )
+    return _apply_cache_headers(response, etag)
+
+
+def send_audio_stream(read_range, size: int, file_id: str, mime_type: str) -> Response:
+    """Send audio produced by ``read_range(start, end)`` with Range / 304 support"""
+    etag = etag_for(file_id)
+    if _not_modified(etag):
+        return _apply_cache_headers(Response(status=304), etag)
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f"bytes */{size}"
+        return _apply_cache_headers(response, etag)
+
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range.strip('"') != etag:
+        byte_range = None
+
+    if byte_range:
+        start, end = byte_range
+        response = Response(read_range(start, end), status=206, mimetype=mime_type)
+        response.headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response.headers['Content-Length'] = str(end - start + 1)
+    else:
+        response = Response(read_range(0, size - 1), mimetype=mime_type)
+        response.headers['Content-Length'] = str(size)
+
+    return _apply_cache_headers(response, etag)
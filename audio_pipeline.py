@@ -0,0 +1,170 @@
+"""
+CPU-heavy audio processing, kept off the bot's event loop.
+
+Work runs in a process pool so neither ffmpeg's output handling nor any
+Python-side number crunching can stall the bot. The first stage is an
+optional transcode: every submission is normalised to mono Opus in an Ogg
+container at ``TRANSCODE_BITRATE``, which is several times smaller than
+the typical uploaded MP3/M4A/WAV and plays in every modern browser.
+"""
+
+import asyncio
+import logging
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TARGET_MIME_TYPE = 'audio/ogg'
+TARGET_EXTENSION = 'ogg'
+
+# Telegram reports these; mimetypes doesn't know all of them
+_EXTENSIONS = {
+    'audio/ogg': 'ogg',
+    'audio/opus': 'opus',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+    'audio/mp4': 'm4a',
+    'audio/x-m4a': 'm4a',
+    'audio/m4a': 'm4a',
+    'audio/aac': 'aac',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/flac': 'flac',
+    'audio/x-flac': 'flac',
+    'audio/webm': 'webm',
+}
+
+
+def extension_for(mime_type: Optional[str]) -> str:
+    """File extension (without dot) for an audio MIME type"""
+    if not mime_type:
+        return 'mp3'
+    mime_type = mime_type.split(';')[0].strip().lower()
+    if mime_type in _EXTENSIONS:
+        return _EXTENSIONS[mime_type]
+    guessed = mimetypes.guess_extension(mime_type)
+    return guessed.lstrip('.') if guessed else 'mp3'
+
+
+@dataclass
+class ProcessedAudio:
+    data: bytes
+    mime_type: str
+    extension: str
+    transcoded: bool = False
+
+
+def _transcode(data: bytes, source_extension: str, ffmpeg: str,
+               bitrate: str, timeout: float) -> bytes:
+    """Runs in a worker process: transcode ``data`` to mono Opus/Ogg"""
+    with tempfile.TemporaryDirectory(prefix='transcode-') as workdir:
+        # Real files rather than pipes: MP4/M4A inputs need a seekable source
+        source = os.path.join(workdir, f"input.{source_extension}")
+        target = os.path.join(workdir, f"output.{TARGET_EXTENSION}")
+        with open(source, 'wb') as f:
+            f.write(data)
+
+        subprocess.run(
+            [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+             '-i', source, '-vn', '-map_metadata', '-1',
+             '-ac', '1', '-c:a', 'libopus', '-b:a', bitrate,
+             '-application', 'audio', '-f', 'ogg', target],
+            check=True, capture_output=True, timeout=timeout
+        )
+
+        with open(target, 'rb') as f:
+            return f.read()
+
+
+class AudioPipeline:
+    def __init__(self, enabled: bool = None, workers: int = None,
+                 ffmpeg: str = None, bitrate: str = None):
+        self.enabled = Config.TRANSCODE_ENABLED if enabled is None else enabled
+        self.workers = workers or Config.AUDIO_WORKERS
+        self.ffmpeg = shutil.which(ffmpeg or Config.FFMPEG_PATH)
+        self.bitrate = bitrate or Config.TRANSCODE_BITRATE
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+        if self.enabled and not self.ffmpeg:
+            logger.warning("Transcoding enabled but ffmpeg was not found; storing audio as uploaded")
+
+        self.stats = {
+            'transcoded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+        }
+        metrics.register('audio_pipeline', self.snapshot)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Started on first use; 'spawn' avoids forking the bot's threads
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    async def run(self, func, *args):
+        """Run a picklable function in the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def normalize(self, data: bytes, mime_type: Optional[str]) -> ProcessedAudio:
+        """Transcode to the storage codec, or label the original correctly"""
+        original = ProcessedAudio(data, mime_type or 'audio/mpeg', extension_for(mime_type))
+        if not self.enabled or not self.ffmpeg:
+            return original
+
+        try:
+            output = await self.run(
+                _transcode, data, original.extension, self.ffmpeg,
+                self.bitrate, Config.TRANSCODE_TIMEOUT
+            )
+        except Exception as e:
+            stderr = getattr(e, 'stderr', b'') or b''
+            logger.warning(f"Transcoding failed, storing audio as uploaded: {e} {stderr.decode(errors='replace')[:200]}")
+            self.stats['failed'] += 1
+            return original
+
+        if not output or len(output) >= len(data):
+            # Already compact (e.g. a voice note); keep the original bytes
+            self.stats['skipped'] += 1
+            return original
+
+        self.stats['transcoded'] += 1
+        self.stats['bytes_in'] += len(data)
+        self.stats['bytes_out'] += len(output)
+        return ProcessedAudio(output, TARGET_MIME_TYPE, TARGET_EXTENSION, transcoded=True)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def snapshot(self) -> Dict[str, object]:
+        bytes_in = self.stats['bytes_in']
+        return {
+            'enabled': bool(self.enabled and self.ffmpeg),
+            'bitrate': self.bitrate,
+            'workers': self.workers,
+            **self.stats,
+            'size_ratio': round(self.stats['bytes_out'] / bytes_in, 3) if bytes_in else None,
+        }
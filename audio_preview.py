@@ -0,0 +1,181 @@
+"""
+Short, low-bitrate preview clips for reviewers on slow connections.
+
+For each stored recording a ``PREVIEW_SECONDS`` clip (leading silence
+trimmed) is encoded as mono Opus at ``PREVIEW_BITRATE`` - about 100 KB for
+30 s at 24 kbit/s - and stored through the same backend as new audio. A
+waveform summary of the whole recording (peak level per slice, 0-100) is
+computed in the same worker call.
+
+Previews are keyed by the original's storage reference in
+``audio_previews``, so deduplicated uploads share one preview.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+import metrics
+from audio_features import SAMPLE_RATE, decode
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_MIME_TYPE = 'audio/ogg'
+WAVEFORM_POINTS = 100
+_SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def make_preview(path: str, ffmpeg: str, seconds: float, bitrate: str,
+                 timeout: float) -> Dict[str, Any]:
+    """Runs in a worker process: encode the preview clip and waveform of ``path``"""
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+         '-i', path, '-vn', '-map_metadata', '-1',
+         '-af', 'silenceremove=start_periods=1:start_threshold=-45dB',
+         '-t', str(seconds), '-ac', '1', '-c:a', 'libopus', '-b:a', bitrate,
+         '-f', 'ogg', 'pipe:1'],
+        check=True, capture_output=True, timeout=timeout
+    )
+
+    samples = decode(path, ffmpeg, timeout)
+    waveform = []
+    if len(samples) >= WAVEFORM_POINTS:
+        usable = len(samples) - len(samples) % WAVEFORM_POINTS
+        peaks = np.abs(samples[:usable]).reshape(WAVEFORM_POINTS, -1).max(axis=1)
+        waveform = np.round(np.minimum(peaks, 1.0) * 100).astype(int).tolist()
+
+    return {
+        'data': result.stdout,
+        'waveform': waveform,
+        'duration_seconds': round(len(samples) / SAMPLE_RATE, 2),
+    }
+
+
+def sparkline(waveform: List[int], width: int = 32) -> str:
+    """Render a waveform summary as a short line of block characters"""
+    if not waveform:
+        return ''
+    points = np.asarray(waveform, dtype=float)
+    buckets = np.array_split(points, min(width, len(points)))
+    levels = [int(min(bucket.max(), 100) / 100 * (len(_SPARK_CHARS) - 1)) for bucket in buckets]
+    return ''.join(_SPARK_CHARS[level] for level in levels)
+
+
+class PreviewService:
+    def __init__(self, db, pipeline,
+                 store: Callable[[bytes, str], Awaitable[tuple]],
+                 link_for: Callable[[str], str],
+                 enabled: bool = None):
+        self.db = db
+        self.pipeline = pipeline
+        # store(data, mime_type) -> (storage_ref, storage_type), like _store_audio
+        self.store = store
+        self.link_for = link_for
+        self.enabled = Config.PREVIEW_ENABLED if enabled is None else enabled
+        self._pending: Dict[str, asyncio.Task] = {}
+
+        self.stats = {
+            'created': 0,
+            'failed': 0,
+            'bytes_original': 0,
+            'bytes_preview': 0,
+        }
+        metrics.register('audio_previews', self.snapshot)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.enabled and self.pipeline.ffmpeg)
+
+    async def get(self, audio_ref: str) -> Optional[Dict[str, Any]]:
+        """Stored preview of a recording, with its playback link"""
+        preview = await self.db.get_audio_preview(audio_ref)
+        if preview:
+            preview['waveform'] = json.loads(preview['waveform'] or '[]')
+            preview['link'] = self.link_for(preview['preview_ref'])
+        return preview
+
+    async def create(self, audio_ref: str, path: str) -> Optional[Dict[str, Any]]:
+        """Make the preview of a recording from a local copy of it, once"""
+        if not self.active:
+            return None
+        task = self._pending.get(audio_ref)
+        if task is None:
+            task = asyncio.create_task(self._create(audio_ref, path))
+            self._pending[audio_ref] = task
+            task.add_done_callback(lambda _: self._pending.pop(audio_ref, None))
+        return await asyncio.shield(task)
+
+    def create_from_bytes(self, audio_ref: str, data: bytes, extension: str) -> None:
+        """Start making a preview in the background from freshly uploaded audio"""
+        if not self.active or audio_ref in self._pending:
+            return
+
+        async def run():
+            # Real file rather than a pipe: MP4/M4A inputs need a seekable source
+            fd, path = tempfile.mkstemp(prefix='preview-', suffix=f".{extension}")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                return await self._create(audio_ref, path)
+            finally:
+                os.unlink(path)
+
+        task = asyncio.create_task(run())
+        self._pending[audio_ref] = task
+        task.add_done_callback(lambda _: self._pending.pop(audio_ref, None))
+
+    async def wait(self, audio_ref: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Preview of a recording, waiting briefly for one still being made"""
+        task = self._pending.get(audio_ref)
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except Exception:
+                pass
+        return await self.get(audio_ref)
+
+    async def _create(self, audio_ref: str, path: str) -> Optional[Dict[str, Any]]:
+        existing = await self.get(audio_ref)
+        if existing:
+            return existing
+
+        try:
+            result = await self.pipeline.run(
+                make_preview, str(path), self.pipeline.ffmpeg, Config.PREVIEW_SECONDS,
+                Config.PREVIEW_BITRATE, Config.TRANSCODE_TIMEOUT
+            )
+            if not result['data']:
+                raise ValueError("ffmpeg produced an empty preview")
+            preview_ref, _ = await self.store(result['data'], PREVIEW_MIME_TYPE)
+        except Exception as e:
+            stderr = getattr(e, 'stderr', b'') or b''
+            logger.warning(f"Could not create preview for {audio_ref}: {e} {stderr.decode(errors='replace')[:200]}")
+            self.stats['failed'] += 1
+            return None
+
+        await self.db.save_audio_preview(
+            audio_ref, preview_ref, json.dumps(result['waveform']), result['duration_seconds']
+        )
+        self.stats['created'] += 1
+        self.stats['bytes_original'] += os.path.getsize(path)
+        self.stats['bytes_preview'] += len(result['data'])
+        logger.info(f"Created {len(result['data']) / 1024:.0f} KB preview for {audio_ref}")
+        return await self.get(audio_ref)
+
+    def snapshot(self) -> Dict[str, Any]:
+        original = self.stats['bytes_original']
+        return {
+            'enabled': self.active,
+            'seconds': Config.PREVIEW_SECONDS,
+            'bitrate': Config.PREVIEW_BITRATE,
+            'pending': len(self._pending),
+            **self.stats,
+            'size_ratio': round(self.stats['bytes_preview'] / original, 3) if original else None,
+        }
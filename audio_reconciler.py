@@ -0,0 +1,177 @@
+"""
+Background worker that migrates local-fallback audio to Google Drive.
+
+Audio lands in ``audio_files/`` whenever Drive is unavailable. The
+reconciler uploads those files to Drive, points the submission and its
+Google Sheets cell at the Drive copy and then deletes the local file.
+
+Every step is recorded in the ``audio_migrations`` table before moving on:
+
+    pending -> uploaded -> linked -> sheet_updated -> done
+
+so an interrupted run resumes at the step it stopped at and never uploads
+the same file twice.
+"""
+
+import asyncio
+import logging
+import mimetypes
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import metrics
+from circuit_breaker import CircuitBreaker
+from config import Config
+from database import Database
+from google_quota import PRIORITY_BACKGROUND
+from google_services import GoogleDriveService, GoogleSheetsService
+from local_storage_service import LocalStorageService
+
+logger = logging.getLogger(__name__)
+
+
+class AudioReconciler:
+    def __init__(self, db: Database, drive_service: GoogleDriveService,
+                 sheets_service: GoogleSheetsService,
+                 local_storage: LocalStorageService,
+                 drive_breaker: Optional[CircuitBreaker] = None,
+                 sheets_breaker: Optional[CircuitBreaker] = None,
+                 concurrency: int = None, batch_size: int = None):
+        self.db = db
+        self.drive_service = drive_service
+        self.sheets_service = sheets_service
+        self.local_storage = local_storage
+        self.drive_breaker = drive_breaker
+        self.sheets_breaker = sheets_breaker
+        self.concurrency = concurrency or Config.RECONCILER_CONCURRENCY
+        self.batch_size = batch_size or Config.RECONCILER_BATCH_SIZE
+        # The storage quota manager also drains batches; never run two at once
+        self._run_lock = asyncio.Lock()
+
+        self.stats = {
+            'migrated': 0,
+            'failed': 0,
+            'missing': 0,
+            'bytes_reclaimed': 0,
+            'last_run': None,
+        }
+        metrics.register('audio_reconciler', lambda: dict(self.stats))
+
+    async def _call(self, breaker: Optional[CircuitBreaker], func, *args, **kwargs):
+        if breaker:
+            return await breaker.call(func, *args, **kwargs)
+        return await func(*args, **kwargs)
+
+    async def run_once(self) -> int:
+        """Migrate one batch of local audio files, returning how many finished"""
+        async with self._run_lock:
+            return await self._run_batch()
+
+    async def _run_batch(self) -> int:
+        if self.drive_breaker and self.drive_breaker.state != CircuitBreaker.CLOSED:
+            logger.info("Google Drive circuit is not closed, skipping reconciliation")
+            return 0
+
+        candidates = await self.db.get_audio_migration_candidates(
+            limit=self.batch_size, max_attempts=Config.RECONCILER_MAX_ATTEMPTS
+        )
+        if not candidates:
+            return 0
+
+        logger.info(f"Reconciling {len(candidates)} local audio file(s) to Google Drive")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def migrate(candidate):
+            async with semaphore:
+                return await self._migrate(candidate)
+
+        results = await asyncio.gather(*(migrate(c) for c in candidates))
+        self.stats['last_run'] = datetime.now().isoformat()
+        return sum(1 for done in results if done)
+
+    async def _migrate(self, candidate: Dict[str, Any]) -> bool:
+        submission_id = candidate['submission_id']
+        local_path = candidate['local_path']
+        drive_file_id = candidate['drive_file_id']
+        status = candidate['status']
+
+        try:
+            if status == 'pending':
+                if not self.local_storage.exists(local_path):
+                    logger.warning(f"Local audio for submission #{submission_id} is missing: {local_path}")
+                    await self.db.update_audio_migration(submission_id, local_path, 'missing')
+                    self.stats['missing'] += 1
+                    return False
+
+                file_data = await self.local_storage.read_file(local_path)
+                mime_type = mimetypes.guess_type(local_path)[0] or 'audio/mpeg'
+                extension = local_path.rsplit('.', 1)[-1]
+                username = candidate.get('telegram_username') or 'user'
+                filename = f"worship_sample_{username}_{submission_id}.{extension}"
+
+                drive_file_id = await self._call(
+                    self.drive_breaker, self.drive_service.upload_audio_file,
+                    file_data, filename, mime_type, priority=PRIORITY_BACKGROUND
+                )
+                await self.db.update_audio_migration(
+                    submission_id, local_path, 'uploaded', drive_file_id=drive_file_id
+                )
+                status = 'uploaded'
+
+            if status == 'uploaded':
+                await self.db.link_migrated_audio(submission_id, local_path, drive_file_id)
+                status = 'linked'
+
+            if status == 'linked':
+                await self._update_sheet(candidate, drive_file_id)
+                await self.db.update_audio_migration(submission_id, local_path, 'sheet_updated')
+                status = 'sheet_updated'
+
+            if status == 'sheet_updated':
+                if not await self.db.is_audio_path_referenced(local_path):
+                    self.stats['bytes_reclaimed'] += self.local_storage.delete_file(local_path)
+                await self.db.update_audio_migration(submission_id, local_path, 'done')
+
+            self.stats['migrated'] += 1
+            logger.info(f"Migrated audio for submission #{submission_id} to Google Drive ({drive_file_id})")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to migrate audio for submission #{submission_id}: {e}")
+            await self.db.update_audio_migration(submission_id, local_path, status, error=str(e))
+            self.stats['failed'] += 1
+            return False
+
+    async def _update_sheet(self, candidate: Dict[str, Any], drive_file_id: str) -> None:
+        # The remembered row may have moved since reviewers sorted the sheet.
+        # Rows without a submission ID still hold the local path wrapped in a
+        # Drive URL by add_submission.
+        sheet_row = await self._call(
+            self.sheets_breaker, self.sheets_service.resolve_row,
+            candidate['submission_id'], candidate.get('sheet_row'),
+            f"https://drive.google.com/file/d/{candidate['local_path']}/view"
+        )
+        if not sheet_row:
+            logger.warning(f"No sheet row found for submission #{candidate['submission_id']}")
+            return
+        if sheet_row != candidate.get('sheet_row'):
+            await self.db.set_submission_sheet_row(candidate['submission_id'], sheet_row)
+
+        await self._call(
+            self.sheets_breaker, self.sheets_service.update_audio_link,
+            sheet_row, drive_file_id
+        )
+
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: reconcile on a fixed interval"""
+        interval = interval or Config.RECONCILER_INTERVAL
+        while True:
+            try:
+                # Drain the backlog before sleeping again
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audio reconciliation pass failed: {e}")
+            await asyncio.sleep(interval)
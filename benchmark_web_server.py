@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark the async web server against the old Flask thread.
+
+Each server runs in its own child process next to an asyncio loop standing
+in for the bot (optionally kept busy with --busy-ms of CPU work every
+50 ms), exactly as in production. The parent process fires concurrent
+requests at /status, a full audio file and a 64 KiB Range request, and
+reports throughput and latency percentiles.
+
+Usage:
+    python benchmark_web_server.py --requests 500 --concurrency 50 --busy-ms 10
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import aiohttp
+
+SAMPLE = "bench/sample.oga"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def simulated_bot(busy_ms: float):
+    """Stand-in for the bot: periodically hog the loop (and the GIL)"""
+    while True:
+        await asyncio.sleep(0.05)
+        deadline = time.perf_counter() + busy_ms / 1000
+        while time.perf_counter() < deadline:
+            hashlib.sha256(b'x' * 1024).digest()
+
+
+async def serve(kind: str, port: int, busy_ms: float):
+    if kind == 'flask':
+        from health_check import app
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        threading.Thread(
+            target=lambda: app.run(host='127.0.0.1', port=port, debug=False),
+            daemon=True
+        ).start()
+    else:
+        from web_server import WebServer
+        await WebServer(host='127.0.0.1', port=port).start()
+
+    if busy_ms:
+        await simulated_bot(busy_ms)
+    else:
+        await asyncio.Event().wait()
+
+
+async def wait_ready(session: aiohttp.ClientSession, base: str):
+    for _ in range(100):
+        try:
+            async with session.get(f"{base}/") as response:
+                await response.read()
+                return
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {base} did not start")
+
+
+async def run_scenario(session, url, headers, requests, concurrency):
+    latencies = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': requests / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'errors': errors,
+    }
+
+
+async def benchmark(args):
+    scenarios = [
+        ('status', '/status', {}),
+        ('audio full', f'/audio_files/{SAMPLE}', {}),
+        ('audio range', f'/audio_files/{SAMPLE}', {'Range': 'bytes=65536-131071'}),
+    ]
+    results = {}
+
+    for kind in ('flask', 'aiohttp'):
+        port = free_port()
+        child = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', kind,
+             '--port', str(port), '--busy-ms', str(args.busy_ms)],
+            env={**os.environ, 'PYTHONPATH': str(Path(__file__).parent)}
+        )
+        base = f"http://127.0.0.1:{port}"
+        try:
+            connector = aiohttp.TCPConnector(limit=args.concurrency)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                await wait_ready(session, base)
+                for name, path, headers in scenarios:
+                    results[(kind, name)] = await run_scenario(
+                        session, base + path, headers, args.requests, args.concurrency
+                    )
+        finally:
+            child.terminate()
+            child.wait()
+
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}, "
+          f"audio {args.size_kb} KiB, bot busy {args.busy_ms} ms / 50 ms\n")
+    print(f"{'scenario':<14}{'server':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, _, _ in scenarios:
+        for kind in ('flask', 'aiohttp'):
+            r = results[(kind, name)]
+            print(f"{name:<14}{kind:<10}{r['rps']:>10.1f}{r['p50']:>10.1f}"
+                  f"{r['p99']:>10.1f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--size-kb', type=int, default=1024, help="Size of the sample audio file")
+    parser.add_argument('--busy-ms', type=float, default=0,
+                        help="CPU time the simulated bot burns every 50 ms")
+    parser.add_argument('--serve', choices=['flask', 'aiohttp'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args.serve, args.port, args.busy_ms))
+        return
+
+    # Both servers read audio_files/ relative to the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        sample = Path(workdir) / "audio_files" / SAMPLE
+        sample.parent.mkdir(parents=True)
+        sample.write_bytes(os.urandom(args.size_kb * 1024))
+        os.chdir(workdir)
+        asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
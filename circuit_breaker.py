@@ -0,0 +1,153 @@
+"""
+Circuit breaker for outbound Google API calls.
+
+When a dependency keeps failing the breaker opens and callers skip it
+entirely (falling back to local storage) instead of waiting for every call
+to time out. A background probe periodically checks the dependency while
+the breaker is half-open and closes it again once the probe succeeds.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 reset_timeout: float = 60.0,
+                 is_failure: Optional[Callable[[Exception], bool]] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Errors that prove the dependency is reachable (e.g. a 404) don't count
+        self.is_failure = is_failure or (lambda error: True)
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._total_failures = 0
+        self._total_rejected = 0
+
+        metrics.register(f"circuit_breaker.{name}", self.snapshot)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a caller may use the dependency right now.
+
+        Only the background probe talks to the dependency while the circuit
+        is open or half-open, so user-facing calls never pay the timeout.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            self._total_rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = None
+
+    def record_failure(self, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._total_failures += 1
+            if error is not None:
+                self._last_error = str(error)
+
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                if self._state == self.CLOSED:
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after "
+                        f"{self._consecutive_failures} consecutive failures"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _begin_probe(self) -> bool:
+        """Move an open circuit to half-open once the reset timeout elapsed"""
+        with self._lock:
+            if self._state != self.OPEN or self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._state = self.HALF_OPEN
+            return True
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run ``func`` through the breaker, raising CircuitOpenError if open"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is {self.state}")
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+
+        self.record_success()
+        return result
+
+    async def probe_forever(self, probe: Callable[[], Awaitable[Any]],
+                            interval: float = 5.0) -> None:
+        """Background task: probe the dependency whenever the circuit is half-open"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self._begin_probe():
+                continue
+
+            logger.info(f"Circuit '{self.name}' half-open, probing")
+            try:
+                await probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Circuit '{self.name}' probe failed: {e}")
+                self.record_failure(e)
+            else:
+                self.record_success()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            open_for = None
+            if self._opened_at is not None:
+                open_for = round(time.monotonic() - self._opened_at, 1)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'open_for_seconds': open_for,
+                'total_failures': self._total_failures,
+                'total_rejected': self._total_rejected,
+                'last_error': self._last_error,
+            }
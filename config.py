@@ -7,6 +7,29 @@ load_dotenv()
 class Config:
     # Telegram Bot Configuration
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    # Connection pool of the Bot API client shared by the whole bot process
+    TELEGRAM_HTTP_POOL_SIZE = int(os.getenv('TELEGRAM_HTTP_POOL_SIZE', '32'))
+    TELEGRAM_HTTP_TIMEOUT = float(os.getenv('TELEGRAM_HTTP_TIMEOUT', '30'))
+    # Outbound pacing (telegram_rate_limit.py), sized for Telegram's flood limits:
+    # ~30 messages/s per bot, ~1/s per private chat, 20/min per group
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_GROUP_MESSAGES_PER_MINUTE = float(os.getenv('TELEGRAM_GROUP_MESSAGES_PER_MINUTE', '20'))
+    TELEGRAM_GROUP_BURST = int(os.getenv('TELEGRAM_GROUP_BURST', '3'))
+    # Applicant replies hitting a 429 are retried this many times after Retry-After
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '2'))
+    # Incoming messages per user (user_throttle.py): sustained rate per second,
+    # burst size, and how many tokens an audio upload costs
+    USER_THROTTLE_ENABLED = os.getenv('USER_THROTTLE_ENABLED', 'true').lower() == 'true'
+    USER_THROTTLE_RATE = float(os.getenv('USER_THROTTLE_RATE', '0.5'))
+    USER_THROTTLE_BURST = float(os.getenv('USER_THROTTLE_BURST', '10'))
+    USER_THROTTLE_AUDIO_COST = float(os.getenv('USER_THROTTLE_AUDIO_COST', '3'))
+    # A submit still 'submitting' after this many minutes was interrupted;
+    # /start and /status let the applicant recover from it
+    SUBMITTING_TIMEOUT_MINUTES = float(os.getenv('SUBMITTING_TIMEOUT_MINUTES', '5'))
+    # Dedupe keys, job claims and sent notifications are kept this long
+    BOOKKEEPING_RETENTION_DAYS = int(os.getenv('BOOKKEEPING_RETENTION_DAYS', '30'))
     
     # Google Drive Configuration
     GOOGLE_DRIVE_FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
@@ -14,13 +37,145 @@ class Config:
     # Google Sheets Configuration
     GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
     GOOGLE_SHEET_RANGE = os.getenv('GOOGLE_SHEET_RANGE', 'A:F')
+    GOOGLE_SHEET_AUDIO_COLUMN = os.getenv('GOOGLE_SHEET_AUDIO_COLUMN', 'E')
+    # Recording quality score (0-100) and a short summary of its features
+    GOOGLE_SHEET_QUALITY_COLUMN = os.getenv('GOOGLE_SHEET_QUALITY_COLUMN', 'I')
+    GOOGLE_SHEET_QUALITY_DETAILS_COLUMN = os.getenv('GOOGLE_SHEET_QUALITY_DETAILS_COLUMN', 'J')
+    # Link to the short preview clip of the recording
+    GOOGLE_SHEET_PREVIEW_COLUMN = os.getenv('GOOGLE_SHEET_PREVIEW_COLUMN', 'K')
+    # Submission ID, so rows are still found after reviewers sort the sheet
+    GOOGLE_SHEET_SUBMISSION_ID_COLUMN = os.getenv('GOOGLE_SHEET_SUBMISSION_ID_COLUMN', 'L')
     
     # Database Configuration
     DATABASE_PATH = os.getenv('DATABASE_PATH', './vocalist_screening.db')
     
+    # Audio storage
+    # TELEGRAM_STORAGE_CHAT_ID is a private channel (with the bot as admin)
+    # used when audio is kept in Telegram instead of Google Drive
+    TELEGRAM_STORAGE_CHAT_ID = os.getenv('TELEGRAM_STORAGE_CHAT_ID')
+    AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', './audio_cache')
+    # Byte budget for audio downloaded from Drive / Telegram for playback
+    AUDIO_CACHE_MAX_MB = int(os.getenv('AUDIO_CACHE_MAX_MB', '512'))
+    # Link Drive-stored audio through our own /audio/drive endpoint (cached)
+    AUDIO_PROXY_DRIVE = os.getenv('AUDIO_PROXY_DRIVE', 'false').lower() == 'true'
+    AUDIO_DB_PATH = os.getenv('AUDIO_DB_PATH', './data/audio_storage.db')
+    # Index of files in audio_files/ (kept outside the publicly served directory)
+    LOCAL_STORAGE_INDEX_PATH = os.getenv('LOCAL_STORAGE_INDEX_PATH', './data/local_audio_index.db')
+    # Quota for audio_files/: above the high watermark cold files move to
+    # Drive and/or zip archives until usage is below the low watermark
+    LOCAL_STORAGE_MAX_MB = int(os.getenv('LOCAL_STORAGE_MAX_MB', '700'))
+    LOCAL_STORAGE_HIGH_WATERMARK = float(os.getenv('LOCAL_STORAGE_HIGH_WATERMARK', '0.85'))
+    LOCAL_STORAGE_LOW_WATERMARK = float(os.getenv('LOCAL_STORAGE_LOW_WATERMARK', '0.70'))
+    # One of: drive, archive, auto (Drive first, then archives)
+    LOCAL_STORAGE_ARCHIVE_MODE = os.getenv('LOCAL_STORAGE_ARCHIVE_MODE', 'auto')
+    LOCAL_ARCHIVE_DIR = os.getenv('LOCAL_ARCHIVE_DIR', './data/audio_archive')
+    STORAGE_QUOTA_INTERVAL = float(os.getenv('STORAGE_QUOTA_INTERVAL', '600'))
+    # One of: google_drive, telegram, database
+    AUDIO_STORAGE_BACKEND = os.getenv(
+        'AUDIO_STORAGE_BACKEND',
+        'telegram' if TELEGRAM_STORAGE_CHAT_ID else 'google_drive'
+    )
+    
+    # Optional transcoding of submissions to mono Opus/Ogg (needs ffmpeg)
+    TRANSCODE_ENABLED = os.getenv('TRANSCODE_ENABLED', 'false').lower() == 'true'
+    TRANSCODE_BITRATE = os.getenv('TRANSCODE_BITRATE', '48k')
+    TRANSCODE_TIMEOUT = float(os.getenv('TRANSCODE_TIMEOUT', '120'))
+    FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+    # Worker processes for CPU-heavy audio processing
+    AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', '2'))
+    # Quality analysis of submitted recordings for reviewer triage (needs ffmpeg)
+    AUDIO_ANALYSIS_ENABLED = os.getenv('AUDIO_ANALYSIS_ENABLED', 'true').lower() == 'true'
+    AUDIO_ANALYSIS_INTERVAL = float(os.getenv('AUDIO_ANALYSIS_INTERVAL', '60'))
+    AUDIO_ANALYSIS_BATCH_SIZE = int(os.getenv('AUDIO_ANALYSIS_BATCH_SIZE', '10'))
+    AUDIO_ANALYSIS_MAX_ATTEMPTS = int(os.getenv('AUDIO_ANALYSIS_MAX_ATTEMPTS', '3'))
+    AUDIO_ANALYSIS_TIMEOUT = float(os.getenv('AUDIO_ANALYSIS_TIMEOUT', '120'))
+    # Recordings whose fingerprints differ in at most this fraction of bits
+    # are flagged as duplicates (unrelated audio sits around 0.5)
+    DUPLICATE_MAX_BIT_ERROR = float(os.getenv('DUPLICATE_MAX_BIT_ERROR', '0.35'))
+    # Short low-bitrate preview clips for reviewers (needs ffmpeg)
+    PREVIEW_ENABLED = os.getenv('PREVIEW_ENABLED', 'true').lower() == 'true'
+    PREVIEW_SECONDS = float(os.getenv('PREVIEW_SECONDS', '30'))
+    PREVIEW_BITRATE = os.getenv('PREVIEW_BITRATE', '24k')
+    # How long submitting waits for a preview that is still being encoded
+    PREVIEW_WAIT_SECONDS = float(os.getenv('PREVIEW_WAIT_SECONDS', '5'))
+    
     # Notification Configuration
     REVIEWER_TELEGRAM_CHAT_ID = os.getenv('REVIEWER_TELEGRAM_CHAT_ID')
     REVIEWER_EMAIL = os.getenv('REVIEWER_EMAIL')
+    # SMTP server for reviewer emails; leave SMTP_HOST empty to disable them
+    SMTP_HOST = os.getenv('SMTP_HOST')
+    SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+    SMTP_USERNAME = os.getenv('SMTP_USERNAME')
+    SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+    SMTP_FROM = os.getenv('SMTP_FROM')
+    SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'false').lower() == 'true'
+    SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+    # The connection is kept open between emails and closed after this long idle
+    SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '120'))
+    # Delivery from the notification_queue table (notification_service.py)
+    # New submissions queued within this window are candidates for one digest,
+    # which is sent once at least NOTIFICATION_DIGEST_THRESHOLD are waiting
+    NOTIFICATION_DIGEST_WINDOW = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', '10'))
+    NOTIFICATION_DIGEST_THRESHOLD = int(os.getenv('NOTIFICATION_DIGEST_THRESHOLD', '3'))
+    NOTIFICATION_POLL_INTERVAL = float(os.getenv('NOTIFICATION_POLL_INTERVAL', '30'))
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', '50'))
+    NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '8'))
+    NOTIFICATION_RETRY_BASE = float(os.getenv('NOTIFICATION_RETRY_BASE', '5'))
+    NOTIFICATION_RETRY_MAX = float(os.getenv('NOTIFICATION_RETRY_MAX', '900'))
+    # Claimed notifications not sent after this many minutes are handed out again
+    NOTIFICATION_CLAIM_TIMEOUT_MINUTES = float(os.getenv('NOTIFICATION_CLAIM_TIMEOUT_MINUTES', '10'))
+    # Daily reviewer summary, run by the bot's job queue at HH:MM UTC
+    DAILY_SUMMARY_ENABLED = os.getenv('DAILY_SUMMARY_ENABLED', 'true').lower() == 'true'
+    DAILY_SUMMARY_TIME = os.getenv('DAILY_SUMMARY_TIME', '18:00')
+    
+    # Circuit breaker for Google Drive / Sheets
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '3'))
+    CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv('CIRCUIT_BREAKER_RESET_TIMEOUT', '60'))
+    CIRCUIT_BREAKER_PROBE_INTERVAL = float(os.getenv('CIRCUIT_BREAKER_PROBE_INTERVAL', '5'))
+    
+    # Google API quotas (requests per minute) and 429 retry policy
+    GOOGLE_DRIVE_READS_PER_MINUTE = int(os.getenv('GOOGLE_DRIVE_READS_PER_MINUTE', '600'))
+    GOOGLE_DRIVE_WRITES_PER_MINUTE = int(os.getenv('GOOGLE_DRIVE_WRITES_PER_MINUTE', '120'))
+    GOOGLE_SHEETS_READS_PER_MINUTE = int(os.getenv('GOOGLE_SHEETS_READS_PER_MINUTE', '60'))
+    GOOGLE_SHEETS_WRITES_PER_MINUTE = int(os.getenv('GOOGLE_SHEETS_WRITES_PER_MINUTE', '60'))
+    GOOGLE_QUOTA_MAX_RETRIES = int(os.getenv('GOOGLE_QUOTA_MAX_RETRIES', '5'))
+    GOOGLE_QUOTA_BACKOFF_BASE = float(os.getenv('GOOGLE_QUOTA_BACKOFF_BASE', '1'))
+    GOOGLE_QUOTA_BACKOFF_MAX = float(os.getenv('GOOGLE_QUOTA_BACKOFF_MAX', '32'))
+    
+    # Adaptive concurrency for Google API calls
+    GOOGLE_CONCURRENCY_INITIAL = int(os.getenv('GOOGLE_CONCURRENCY_INITIAL', '4'))
+    GOOGLE_CONCURRENCY_MIN = int(os.getenv('GOOGLE_CONCURRENCY_MIN', '1'))
+    GOOGLE_CONCURRENCY_MAX = int(os.getenv('GOOGLE_CONCURRENCY_MAX', '16'))
+    GOOGLE_LATENCY_TOLERANCE = float(os.getenv('GOOGLE_LATENCY_TOLERANCE', '2.0'))
+    
+    # Shared HTTP connection pool for Google API clients
+    GOOGLE_HTTP_POOL_SIZE = int(os.getenv('GOOGLE_HTTP_POOL_SIZE', '16'))
+    GOOGLE_HTTP_TIMEOUT = float(os.getenv('GOOGLE_HTTP_TIMEOUT', '60'))
+    
+    # HTTP server for health checks and audio playback (runs on the bot's loop)
+    WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+    WEB_PORT = int(os.getenv('PORT', '5000'))
+    # Set to false when a separate gunicorn web tier (wsgi.py) serves HTTP
+    WEB_SERVER_ENABLED = os.getenv('WEB_SERVER_ENABLED', 'true').lower() == 'true'
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '2'))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '8'))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '60'))
+    # The bot publishes its metrics here so the web tier can report them
+    METRICS_SNAPSHOT_PATH = os.getenv('METRICS_SNAPSHOT_PATH', './data/metrics.json')
+    METRICS_SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', '15'))
+    
+    # Migration of local-fallback audio to Google Drive
+    RECONCILER_INTERVAL = float(os.getenv('RECONCILER_INTERVAL', '300'))
+    RECONCILER_CONCURRENCY = int(os.getenv('RECONCILER_CONCURRENCY', '3'))
+    RECONCILER_BATCH_SIZE = int(os.getenv('RECONCILER_BATCH_SIZE', '20'))
+    RECONCILER_MAX_ATTEMPTS = int(os.getenv('RECONCILER_MAX_ATTEMPTS', '5'))
+    
+    # Appending submissions that missed Google Sheets (sheet_backfill.py)
+    SHEET_BACKFILL_INTERVAL = float(os.getenv('SHEET_BACKFILL_INTERVAL', '60'))
+    SHEET_BACKFILL_BATCH_SIZE = int(os.getenv('SHEET_BACKFILL_BATCH_SIZE', '20'))
+    # A claimed append not finished after this many minutes is retried
+    SHEET_APPEND_CLAIM_TIMEOUT_MINUTES = float(os.getenv('SHEET_APPEND_CLAIM_TIMEOUT_MINUTES', '10'))
     
     # Google API Credentials
     GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', './credentials.json')
@@ -0,0 +1,92 @@
+"""
+The daily reviewer summary, run by the bot's job queue.
+
+Counts come from the ``daily_rollups`` table, which triggers on
+``submissions`` keep up to date, so the job never scans submissions.
+When several bot processes share the database, each one schedules the
+job, but only the first to claim the day's run in ``job_runs`` queues the
+summary; the others skip it. If queueing fails, the claim is released and
+the worker that held it retries the same day with backoff.
+"""
+
+import logging
+import os
+import socket
+from datetime import datetime, time, timezone
+from typing import Optional
+
+from telegram.ext import ContextTypes, JobQueue
+
+from config import Config
+from database import Database
+from notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'daily_summary'
+# First retry after a failed run, doubled for each further attempt
+RETRY_DELAY = 60
+MAX_RETRIES = 6
+
+
+def summary_time() -> time:
+    """DAILY_SUMMARY_TIME (HH:MM, UTC) as a time of day"""
+    hours, minutes = Config.DAILY_SUMMARY_TIME.split(':')
+    return time(int(hours), int(minutes), tzinfo=timezone.utc)
+
+
+class DailySummary:
+    def __init__(self, db: Database, notifications: NotificationService):
+        self.db = db
+        self.notifications = notifications
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def schedule(self, job_queue: Optional[JobQueue]) -> None:
+        """Run the summary every day at DAILY_SUMMARY_TIME"""
+        if not Config.DAILY_SUMMARY_ENABLED:
+            return
+        if job_queue is None:
+            logger.warning("Daily summary enabled but the job queue is unavailable; "
+                           "install python-telegram-bot[job-queue]")
+            return
+        job_queue.run_daily(self.run_job, time=summary_time(), name=JOB_NAME)
+        logger.info(f"Daily summary scheduled at {Config.DAILY_SUMMARY_TIME} UTC")
+
+    async def run_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        # The daily run has no data; retries carry the day they are for
+        retry = context.job.data or {}
+        day = retry.get('day') or datetime.now(timezone.utc).date().isoformat()
+        attempt = retry.get('attempt', 0)
+        try:
+            await self.send(day)
+        except Exception as e:
+            if attempt >= MAX_RETRIES:
+                logger.error(f"Giving up on the daily summary for {day}: {e}")
+                return
+            delay = RETRY_DELAY * 2 ** attempt
+            logger.warning(f"Daily summary for {day} failed, retrying in {delay}s: {e}")
+            context.job_queue.run_once(self.run_job, when=delay,
+                                       data={'day': day, 'attempt': attempt + 1},
+                                       name=JOB_NAME)
+
+    async def send(self, day: str = None) -> bool:
+        """Queue the summary for a day (default today), once across all workers"""
+        day = day or datetime.now(timezone.utc).date().isoformat()
+        if not await self.db.claim_job_run(JOB_NAME, day, self.owner):
+            logger.info(f"Daily summary for {day} already sent by another worker")
+            return False
+
+        try:
+            today = await self.db.get_rollup_counts(day)
+            overall = await self.db.get_rollup_counts()
+            queued = await self.notifications.send_daily_summary(
+                sum(today.values()), overall.get('pending', 0)
+            )
+        except Exception:
+            # run_job retries the day; until then nobody holds the claim
+            await self.db.release_job_run(JOB_NAME, day)
+            raise
+        if not queued:
+            # No reviewer chat configured; don't record the day as sent
+            await self.db.release_job_run(JOB_NAME, day)
+        return queued
@@ -1,13 +1,22 @@
 import sqlite3
 import asyncio
+import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from config import Config
 
 class Database:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, read_only: bool = False):
         self.db_path = db_path or Config.DATABASE_PATH
-        self.init_database()
+        self.read_only = read_only
+        # Readers (the web tier) leave schema management to the bot
+        if not read_only:
+            self.init_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return sqlite3.connect(self.db_path)
     
     def init_database(self):
         """Initialize the database with required tables"""
@@ -49,8 +58,220 @@ class Database:
                 )
             ''')
             
+            # Row number of the submission in Google Sheets (added later)
+            self._ensure_column(cursor, 'submissions', 'sheet_row', 'INTEGER')
+            # 'pending' until the row has been appended to Google Sheets
+            # (sheet_backfill.py retries it), then 'appended'. Whoever appends
+            # it first claims it as 'appending', so it is appended only once
+            self._ensure_column(cursor, 'submissions', 'sheet_status', 'TEXT')
+            self._ensure_column(cursor, 'submissions', 'sheet_claimed_at', 'TIMESTAMP')
+            
+            # Recording quality features for reviewer triage (audio_analyzer.py).
+            # analysis_status: pending -> analyzed -> synced (written to the sheet)
+            for column, definition in (
+                ('duration_seconds', 'REAL'),
+                ('loudness_dbfs', 'REAL'),
+                ('clipping_ratio', 'REAL'),
+                ('silence_pct', 'REAL'),
+                ('pitch_stability', 'REAL'),
+                ('quality_score', 'INTEGER'),
+                ('quality_flags', 'TEXT'),
+                ('analysis_status', "TEXT DEFAULT 'pending'"),
+                ('analysis_attempts', 'INTEGER DEFAULT 0'),
+                ('analysis_error', 'TEXT'),
+                ('duplicate_of', 'INTEGER'),
+                ('duplicate_score', 'REAL'),
+            ):
+                self._ensure_column(cursor, 'submissions', column, definition)
+            
+            # Progress of local-fallback audio being migrated to Google Drive.
+            # Each step is committed so an interrupted run resumes where it stopped.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_migrations (
+                    submission_id INTEGER PRIMARY KEY,
+                    local_path TEXT NOT NULL,
+                    drive_file_id TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (submission_id) REFERENCES submissions (id)
+                )
+            ''')
+            
+            # Content-addressed index of stored audio, keyed by MD5 (the
+            # checksum Google Drive reports) and by Telegram's file_unique_id
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_blobs (
+                    content_md5 TEXT PRIMARY KEY,
+                    storage_ref TEXT NOT NULL,
+                    storage_type TEXT NOT NULL,
+                    size INTEGER,
+                    mime_type TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # MD5 of the bytes actually stored (differs from content_md5, the
+            # MD5 of the original upload, when the audio was transcoded)
+            self._ensure_column(cursor, 'audio_blobs', 'stored_md5', 'TEXT')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_audio_blobs_storage_ref
+                ON audio_blobs (storage_ref)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS telegram_audio (
+                    file_unique_id TEXT PRIMARY KEY,
+                    content_md5 TEXT NOT NULL,
+                    FOREIGN KEY (content_md5) REFERENCES audio_blobs (content_md5)
+                )
+            ''')
+            
+            # Spectral fingerprints of submitted recordings (audio_fingerprint.py)
+            # and an index of their 32-bit sub-fingerprints for duplicate lookup
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_fingerprints (
+                    submission_id INTEGER PRIMARY KEY,
+                    fingerprint BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (submission_id) REFERENCES submissions (id)
+                )
+            ''')
+            # Durable outbox for reviewer notifications (notification_service.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS notification_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    sent_at TIMESTAMP
+                )
+            ''')
+            # 'telegram' rows go to a chat ID, 'email' rows to an address
+            self._ensure_column(cursor, 'notification_queue', 'channel', "TEXT DEFAULT 'telegram'")
+            # A dispatcher claims rows ('sending') before delivering them, so
+            # each row goes out once even with several bot processes
+            self._ensure_column(cursor, 'notification_queue', 'claimed_by', 'TEXT')
+            self._ensure_column(cursor, 'notification_queue', 'claimed_at', 'TIMESTAMP')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_notification_queue_due
+                ON notification_queue (status, next_attempt_at)
+            ''')
+            
+            # Short preview clips (audio_preview.py), keyed by the original's
+            # storage reference so deduplicated uploads share one preview
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_previews (
+                    audio_ref TEXT PRIMARY KEY,
+                    preview_ref TEXT NOT NULL,
+                    waveform TEXT,
+                    duration_seconds REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fingerprint_hashes (
+                    hash INTEGER NOT NULL,
+                    submission_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (hash, submission_id)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Submission counts per (UTC) day and status, kept current by
+            # triggers so summaries and stats never scan submissions
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollups'"
+            )
+            backfill_rollups = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS daily_rollups (
+                    day TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, status)
+                ) WITHOUT ROWID
+            ''')
+            if backfill_rollups:
+                cursor.execute('''
+                    INSERT INTO daily_rollups (day, status, count)
+                    SELECT date(submitted_at), COALESCE(status, 'pending'), COUNT(*)
+                    FROM submissions GROUP BY 1, 2
+                ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_insert
+                AFTER INSERT ON submissions
+                BEGIN
+                    INSERT INTO daily_rollups (day, status, count)
+                    VALUES (date(NEW.submitted_at), COALESCE(NEW.status, 'pending'), 1)
+                    ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_status
+                AFTER UPDATE OF status ON submissions
+                WHEN OLD.status IS NOT NEW.status
+                BEGIN
+                    UPDATE daily_rollups SET count = count - 1
+                    WHERE day = date(OLD.submitted_at) AND status = COALESCE(OLD.status, 'pending');
+                    INSERT INTO daily_rollups (day, status, count)
+                    VALUES (date(NEW.submitted_at), COALESCE(NEW.status, 'pending'), 1)
+                    ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_daily_rollups_delete
+                AFTER DELETE ON submissions
+                BEGIN
+                    UPDATE daily_rollups SET count = count - 1
+                    WHERE day = date(OLD.submitted_at) AND status = COALESCE(OLD.status, 'pending');
+                END
+            ''')
+            
+            # Storage reference lookups (is_audio_path_referenced)
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_submissions_audio_ref
+                ON submissions (audio_drive_link)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_audio_previews_preview_ref
+                ON audio_previews (preview_ref)
+            ''')
+            
+            # Dedupe keys of handled updates (e.g. one per submit button), so a
+            # double tap or redelivered callback is recognised by one lookup
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS processed_updates (
+                    key TEXT PRIMARY KEY,
+                    user_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+            ''')
+            
+            # Runs of scheduled jobs claimed by one of several bot processes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_runs (
+                    job TEXT NOT NULL,
+                    run_key TEXT NOT NULL,
+                    owner TEXT,
+                    claimed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (job, run_key)
+                )
+            ''')
+            
             conn.commit()
     
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str) -> None:
+        """Add a column to an existing table if it is missing"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
     async def get_user_state(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user's current state and data"""
         with sqlite3.connect(self.db_path) as conn:
@@ -84,6 +305,46 @@ class Database:
             
             conn.commit()
     
+    async def transition_user_state(self, user_id: int, from_state: str, to_state: str) -> bool:
+        """Move a user from one state to another; False if they were not in ``from_state``"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET state = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND state = ?
+            ''', (to_state, user_id, from_state))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    async def recover_stale_submitting(self, user_id: int, minutes: float) -> bool:
+        """Reset a user stuck in 'submitting' for over ``minutes``; False if they were not"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET state = 'idle', name = NULL, address = NULL, phone = NULL,
+                    audio_file_id = NULL, audio_drive_link = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND state = 'submitting' AND updated_at < datetime('now', ?)
+            ''', (user_id, f'-{float(minutes)} minutes'))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    async def claim_update(self, key: str, user_id: int = None) -> bool:
+        """Record a handled update; False if the key was already processed"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO processed_updates (key, user_id) VALUES (?, ?)
+            ''', (key, user_id))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    async def release_update(self, key: str) -> None:
+        """Forget a processed update so it can be handled again"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM processed_updates WHERE key = ?', (key,))
+            conn.commit()
+    
     async def create_submission(self, user_id: int, name: str, address: str, 
                               phone: str, telegram_username: str, audio_drive_link: str) -> int:
         """Create a new submission record"""
@@ -91,8 +352,8 @@ class Database:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO submissions 
-                (user_id, name, address, phone, telegram_username, audio_drive_link)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (user_id, name, address, phone, telegram_username, audio_drive_link, sheet_status)
+                VALUES (?, ?, ?, ?, ?, ?, 'pending')
             ''', (user_id, name, address, phone, telegram_username, audio_drive_link))
             
             submission_id = cursor.lastrowid
@@ -123,6 +384,534 @@ class Database:
             ''', (status, reviewer_comments, submission_id))
             conn.commit()
     
+    async def get_submission(self, submission_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single submission by ID"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM submissions WHERE id = ?', (submission_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    async def set_submission_sheet_row(self, submission_id: int, sheet_row: Optional[int]) -> None:
+        """Remember which Google Sheets row belongs to a submission"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions
+                SET sheet_row = COALESCE(?, sheet_row), sheet_status = 'appended', sheet_claimed_at = NULL
+                WHERE id = ?
+            ''', (sheet_row, submission_id))
+            conn.commit()
+    
+    async def claim_sheet_append(self, submission_id: int) -> bool:
+        """Take the right to append a submission to the sheet; False if someone else has it"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions SET sheet_status = 'appending', sheet_claimed_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND sheet_status = 'pending'
+            ''', (submission_id,))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    async def release_sheet_append(self, submission_id: int) -> None:
+        """Give a claimed submission back to the backfill after a failed append"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions SET sheet_status = 'pending', sheet_claimed_at = NULL
+                WHERE id = ? AND sheet_status = 'appending'
+            ''', (submission_id,))
+            conn.commit()
+    
+    async def recover_stale_sheet_appends(self, minutes: float) -> int:
+        """Return claims older than ``minutes`` (their owner died mid-append) to 'pending'"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions SET sheet_status = 'pending', sheet_claimed_at = NULL
+                WHERE sheet_status = 'appending' AND sheet_claimed_at < datetime('now', ?)
+            ''', (f'-{float(minutes)} minutes',))
+            conn.commit()
+            return cursor.rowcount
+    
+    async def get_sheet_pending_submissions(self, limit: int = 20) -> list:
+        """Submissions that still have to be appended to Google Sheets, oldest first"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM submissions WHERE sheet_status = 'pending'
+                ORDER BY id
+                LIMIT ?
+            ''', (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    async def get_analysis_candidates(self, limit: int = 10,
+                                      max_attempts: int = 3) -> list:
+        """Get submissions whose audio still needs analysing or syncing to the sheet"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM submissions
+                WHERE (COALESCE(analysis_status, 'pending') = 'pending'
+                       AND COALESCE(analysis_attempts, 0) < ?)
+                   OR (analysis_status = 'analyzed' AND sheet_row IS NOT NULL
+                       AND COALESCE(analysis_attempts, 0) < ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (max_attempts, max_attempts, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    async def save_audio_features(self, submission_id: int, features: Dict[str, Any]) -> None:
+        """Store the quality features of a submission's recording"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions
+                SET duration_seconds = ?, loudness_dbfs = ?, clipping_ratio = ?,
+                    silence_pct = ?, pitch_stability = ?, quality_score = ?,
+                    quality_flags = ?, analysis_status = 'analyzed',
+                    analysis_attempts = 0, analysis_error = NULL
+                WHERE id = ?
+            ''', (features.get('duration_seconds'), features.get('loudness_dbfs'),
+                  features.get('clipping_ratio'), features.get('silence_pct'),
+                  features.get('pitch_stability'), features.get('quality_score'),
+                  ', '.join(features.get('quality_flags') or []), submission_id))
+            conn.commit()
+    
+    async def update_analysis_status(self, submission_id: int, status: str,
+                                     error: str = None) -> None:
+        """Move a submission along the analysis flow, counting failed attempts"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions
+                SET analysis_status = ?, analysis_error = ?,
+                    analysis_attempts = COALESCE(analysis_attempts, 0) + ?
+                WHERE id = ?
+            ''', (status, error, 1 if error else 0, submission_id))
+            conn.commit()
+    
+    async def get_audio_preview(self, audio_ref: str) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM audio_previews WHERE audio_ref = ?', (audio_ref,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    async def save_audio_preview(self, audio_ref: str, preview_ref: str,
+                                 waveform: str, duration_seconds: float) -> None:
+        """Remember the preview clip and waveform summary of a recording"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO audio_previews
+                (audio_ref, preview_ref, waveform, duration_seconds)
+                VALUES (?, ?, ?, ?)
+            ''', (audio_ref, preview_ref, waveform, duration_seconds))
+            conn.commit()
+    
+    async def save_fingerprint(self, submission_id: int, fingerprint: bytes,
+                               entries: List[Tuple[int, int]]) -> None:
+        """Store a recording's fingerprint and index its sub-fingerprints"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO audio_fingerprints (submission_id, fingerprint)
+                VALUES (?, ?)
+            ''', (submission_id, fingerprint))
+            cursor.execute('DELETE FROM fingerprint_hashes WHERE submission_id = ?',
+                           (submission_id,))
+            cursor.executemany('''
+                INSERT INTO fingerprint_hashes (hash, submission_id, position)
+                VALUES (?, ?, ?)
+            ''', [(value, submission_id, position) for value, position in entries])
+            conn.commit()
+    
+    async def get_fingerprint(self, submission_id: int) -> Optional[bytes]:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT fingerprint FROM audio_fingerprints WHERE submission_id = ?
+            ''', (submission_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    async def find_fingerprint_matches(self, entries: List[Tuple[int, int]],
+                                       before_submission_id: int,
+                                       min_matches: int, limit: int = 5) -> list:
+        """Earlier submissions sharing the most sub-fingerprints at one alignment.
+        
+        Each query value is an index probe, so the cost grows with the length
+        of the query rather than with the number of stored recordings.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE fingerprint_query (hash INTEGER PRIMARY KEY, position INTEGER)
+            ''')
+            cursor.executemany('INSERT INTO fingerprint_query VALUES (?, ?)', entries)
+            cursor.execute('''
+                SELECT h.submission_id, h.position - q.position AS offset,
+                       COUNT(*) AS matches
+                FROM fingerprint_query q
+                JOIN fingerprint_hashes h ON h.hash = q.hash
+                WHERE h.submission_id < ?
+                GROUP BY h.submission_id, offset
+                HAVING matches >= ?
+                ORDER BY matches DESC
+                LIMIT ?
+            ''', (before_submission_id, min_matches, limit))
+            rows = [dict(row) for row in cursor.fetchall()]
+            cursor.execute('DROP TABLE fingerprint_query')
+            return rows
+    
+    async def mark_duplicate(self, submission_id: int, duplicate_of: int,
+                             score: float) -> None:
+        """Flag a submission as a likely re-submission of an earlier one"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions SET duplicate_of = ?, duplicate_score = ?
+                WHERE id = ?
+            ''', (duplicate_of, score, submission_id))
+            conn.commit()
+    
+    async def enqueue_notification(self, chat_id: str, kind: str, payload: str,
+                                   channel: str = 'telegram') -> int:
+        """Add a notification to the outbox"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO notification_queue (chat_id, kind, payload, channel) VALUES (?, ?, ?, ?)
+            ''', (chat_id, kind, payload, channel))
+            notification_id = cursor.lastrowid
+            conn.commit()
+            return notification_id
+    
+    async def claim_due_notifications(self, limit: int = 50, channel: str = 'telegram',
+                                      stale_minutes: float = 10) -> list:
+        """Claim pending notifications whose next attempt is due, oldest first.
+
+        Claimed rows are 'sending' until they are marked sent, rescheduled or
+        failed; claims older than ``stale_minutes`` (the dispatcher died) are
+        handed out again.
+        """
+        claim = uuid.uuid4().hex
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE notification_queue SET status = 'pending', claimed_by = NULL
+                WHERE status = 'sending' AND channel = ? AND claimed_at < datetime('now', ?)
+            ''', (channel, f'-{float(stale_minutes)} minutes'))
+            cursor.execute('''
+                UPDATE notification_queue
+                SET status = 'sending', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM notification_queue
+                    WHERE status = 'pending' AND next_attempt_at <= datetime('now')
+                      AND channel = ?
+                    ORDER BY id
+                    LIMIT ?
+                )
+            ''', (claim, channel, limit))
+            conn.commit()
+            cursor.execute('''
+                SELECT * FROM notification_queue WHERE claimed_by = ? AND status = 'sending'
+                ORDER BY id
+            ''', (claim,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    async def mark_notifications_sent(self, ids: List[int]) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE notification_queue
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL,
+                    claimed_by = NULL
+                WHERE id = ?
+            ''', [(notification_id,) for notification_id in ids])
+            conn.commit()
+    
+    async def reschedule_notifications(self, ids: List[int], delay_seconds: float,
+                                       error: str, count_attempt: bool = True) -> None:
+        """Try notifications again after a delay"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE notification_queue
+                SET status = 'pending', claimed_by = NULL, attempts = attempts + ?,
+                    last_error = ?, next_attempt_at = datetime('now', ?)
+                WHERE id = ?
+            ''', [(1 if count_attempt else 0, error, f"+{int(delay_seconds) + 1} seconds",
+                   notification_id) for notification_id in ids])
+            conn.commit()
+    
+    async def fail_notifications(self, ids: List[int], error: str) -> None:
+        """Stop retrying notifications that can never be delivered"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE notification_queue
+                SET status = 'failed', claimed_by = NULL, attempts = attempts + 1, last_error = ?
+                WHERE id = ?
+            ''', [(error, notification_id) for notification_id in ids])
+            conn.commit()
+    
+    async def get_rollup_counts(self, day: str = None) -> Dict[str, int]:
+        """Submission counts by status for one day (YYYY-MM-DD, UTC), or overall"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if day:
+                cursor.execute('''
+                    SELECT status, count FROM daily_rollups WHERE day = ? AND count > 0
+                ''', (day,))
+            else:
+                cursor.execute('''
+                    SELECT status, SUM(count) FROM daily_rollups
+                    GROUP BY status HAVING SUM(count) > 0
+                ''')
+            return {status: count for status, count in cursor.fetchall()}
+    
+    async def claim_job_run(self, job: str, run_key: str, owner: str) -> bool:
+        """Claim one run of a scheduled job; False if another worker already has it"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO job_runs (job, run_key, owner) VALUES (?, ?, ?)
+            ''', (job, run_key, owner))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    async def release_job_run(self, job: str, run_key: str) -> None:
+        """Give up a claimed run so it can be retried"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM job_runs WHERE job = ? AND run_key = ?', (job, run_key))
+            conn.commit()
+    
+    async def get_audio_migration_candidates(self, limit: int = 20,
+                                             max_attempts: int = 5) -> list:
+        """Get submissions whose audio still lives in local storage.
+        
+        Unfinished migrations come first so an interrupted run resumes them.
+        Local paths always contain a '/', Drive file IDs never do.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.id AS submission_id, s.telegram_username, s.sheet_row,
+                       COALESCE(m.local_path, s.audio_drive_link) AS local_path,
+                       m.drive_file_id, COALESCE(m.status, 'pending') AS status,
+                       COALESCE(m.attempts, 0) AS attempts
+                FROM submissions s
+                LEFT JOIN audio_migrations m ON m.submission_id = s.id
+                WHERE (m.submission_id IS NULL AND s.audio_drive_link LIKE '%/%')
+                   OR (m.status NOT IN ('done', 'missing') AND m.attempts < ?)
+                ORDER BY m.submission_id IS NULL, s.id
+                LIMIT ?
+            ''', (max_attempts, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    async def update_audio_migration(self, submission_id: int, local_path: str,
+                                     status: str, drive_file_id: str = None,
+                                     error: str = None) -> None:
+        """Record the progress of a single audio migration"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO audio_migrations
+                (submission_id, local_path, drive_file_id, status, attempts, last_error)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(submission_id) DO UPDATE SET
+                    drive_file_id = COALESCE(excluded.drive_file_id, drive_file_id),
+                    status = excluded.status,
+                    attempts = attempts + excluded.attempts,
+                    last_error = excluded.last_error,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (submission_id, local_path, drive_file_id, status,
+                  1 if error else 0, error))
+            conn.commit()
+    
+    async def link_migrated_audio(self, submission_id: int, local_path: str,
+                                  drive_file_id: str) -> None:
+        """Point a submission at its Drive copy and mark the migration linked"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE submissions SET audio_drive_link = ?
+                WHERE id = ? AND audio_drive_link = ?
+            ''', (drive_file_id, submission_id, local_path))
+            cursor.execute('''
+                UPDATE audio_migrations
+                SET status = 'linked', updated_at = CURRENT_TIMESTAMP
+                WHERE submission_id = ?
+            ''', (submission_id,))
+            cursor.execute('''
+                UPDATE audio_blobs SET storage_ref = ?, storage_type = 'google_drive'
+                WHERE storage_ref = ?
+            ''', (drive_file_id, local_path))
+            cursor.execute('''
+                UPDATE OR IGNORE audio_previews SET audio_ref = ? WHERE audio_ref = ?
+            ''', (drive_file_id, local_path))
+            conn.commit()
+    
+    async def is_audio_path_referenced(self, local_path: str) -> bool:
+        """Check whether a submission, in-progress user, dedup entry or preview
+        still uses a storage reference (a local path or a Drive file ID)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM submissions WHERE audio_drive_link = ?
+                UNION ALL
+                SELECT 1 FROM users WHERE audio_drive_link = ?
+                UNION ALL
+                SELECT 1 FROM audio_blobs WHERE storage_ref = ?
+                UNION ALL
+                SELECT 1 FROM audio_previews WHERE preview_ref = ?
+                LIMIT 1
+            ''', (local_path, local_path, local_path, local_path))
+            return cursor.fetchone() is not None
+    
+    async def get_audio_blob(self, content_md5: str) -> Optional[Dict[str, Any]]:
+        """Look up stored audio by content hash"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM audio_blobs WHERE content_md5 = ?', (content_md5,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    async def get_audio_blob_by_telegram_id(self, file_unique_id: str) -> Optional[Dict[str, Any]]:
+        """Look up stored audio by Telegram file_unique_id"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.* FROM telegram_audio t
+                JOIN audio_blobs b ON b.content_md5 = t.content_md5
+                WHERE t.file_unique_id = ?
+            ''', (file_unique_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    async def save_audio_blob(self, content_md5: str, storage_ref: str, storage_type: str,
+                              size: int, mime_type: str, stored_md5: str = None) -> None:
+        """Index stored audio by content hash"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO audio_blobs
+                (content_md5, storage_ref, storage_type, size, mime_type, stored_md5)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (content_md5, storage_ref, storage_type, size, mime_type,
+                  stored_md5 or content_md5))
+            conn.commit()
+    
+    async def set_audio_blob_stored_md5(self, content_md5: str, stored_md5: str) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE audio_blobs SET stored_md5 = ? WHERE content_md5 = ?
+            ''', (stored_md5, content_md5))
+            conn.commit()
+    
+    async def link_telegram_audio(self, file_unique_id: str, content_md5: str) -> None:
+        """Remember which content a Telegram file contains"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO telegram_audio (file_unique_id, content_md5)
+                VALUES (?, ?)
+            ''', (file_unique_id, content_md5))
+            conn.commit()
+    
+    async def purge_bookkeeping(self, days_old: int) -> Dict[str, int]:
+        """Delete dedupe keys, job claims and delivered or failed notifications
+        older than ``days_old`` days, returning how many rows went per table"""
+        cutoff = f'-{int(days_old)} days'
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            deleted = {}
+            cursor.execute('''
+                DELETE FROM processed_updates WHERE created_at < datetime('now', ?)
+            ''', (cutoff,))
+            deleted['processed_updates'] = cursor.rowcount
+            cursor.execute('''
+                DELETE FROM job_runs WHERE claimed_at < datetime('now', ?)
+            ''', (cutoff,))
+            deleted['job_runs'] = cursor.rowcount
+            # Pending and in-flight rows are kept however old they are
+            cursor.execute('''
+                DELETE FROM notification_queue
+                WHERE status IN ('sent', 'failed')
+                  AND COALESCE(sent_at, created_at) < datetime('now', ?)
+            ''', (cutoff,))
+            deleted['notification_queue'] = cursor.rowcount
+            conn.commit()
+            return deleted
+    
+    async def purge_submissions(self, days_old: int) -> int:
+        """Delete submissions older than ``days_old`` days with everything derived from them.
+        
+        Fingerprints and migration state go with the submission; the dedup
+        index and preview rows of its audio go too unless another submission
+        or in-progress user still uses that audio, so the files themselves
+        stop counting as referenced and can be cleaned up.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE purged AS
+                SELECT id, audio_drive_link AS audio_ref FROM submissions
+                WHERE submitted_at < datetime('now', ?)
+            ''', (f"-{int(days_old)} days",))
+            for table in ('audio_fingerprints', 'fingerprint_hashes', 'audio_migrations'):
+                cursor.execute(f'''
+                    DELETE FROM {table} WHERE submission_id IN (SELECT id FROM purged)
+                ''')
+            cursor.execute('DELETE FROM submissions WHERE id IN (SELECT id FROM purged)')
+            deleted_count = cursor.rowcount
+            
+            cursor.execute('''
+                CREATE TEMP TABLE orphaned AS
+                SELECT DISTINCT audio_ref FROM purged
+                WHERE audio_ref NOT IN (SELECT audio_drive_link FROM submissions)
+                  AND audio_ref NOT IN (SELECT audio_drive_link FROM users
+                                        WHERE audio_drive_link IS NOT NULL)
+            ''')
+            cursor.execute('''
+                DELETE FROM audio_previews WHERE audio_ref IN (SELECT audio_ref FROM orphaned)
+            ''')
+            cursor.execute('''
+                DELETE FROM telegram_audio WHERE content_md5 IN (
+                    SELECT content_md5 FROM audio_blobs
+                    WHERE storage_ref IN (SELECT audio_ref FROM orphaned)
+                )
+            ''')
+            cursor.execute('''
+                DELETE FROM audio_blobs WHERE storage_ref IN (SELECT audio_ref FROM orphaned)
+            ''')
+            conn.commit()
+            cursor.execute('DROP TABLE purged')
+            cursor.execute('DROP TABLE orphaned')
+            return deleted_count
+    
+    async def forget_audio_blob(self, content_md5: str) -> None:
+        """Drop an index entry whose stored copy no longer exists"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM telegram_audio WHERE content_md5 = ?', (content_md5,))
+            cursor.execute('DELETE FROM audio_blobs WHERE content_md5 = ?', (content_md5,))
+            conn.commit()
+    
     async def reset_user_state(self, user_id: int) -> None:
         """Reset user state to idle"""
         await self.update_user_state(user_id, state='idle', name=None, 
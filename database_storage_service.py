@@ -1,32 +1,185 @@
-import base64
-from typing import Optional
+import asyncio
+import hashlib
+import io
+import os
+import sqlite3
+import uuid
+from typing import BinaryIO, Iterator, Optional, Dict, Any
+from config import Config
 
 class DatabaseStorageService:
-    def __init__(self, db):
-        self.db = db
-    
-    async def upload_audio_file(self, file_data: bytes, filename: str, 
+    """Store audio as raw chunked BLOBs in a dedicated SQLite file.
+
+    Audio is split into fixed-size chunk rows. Chunks are written and read
+    through SQLite's incremental blob I/O, so neither storing nor serving a
+    file ever holds more than one slice of it in memory.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    IO_SLICE = 64 * 1024
+
+    def __init__(self, db_path: str = None, read_only: bool = False):
+        self.db_path = db_path or Config.AUDIO_DB_PATH
+        self.read_only = read_only
+        # Readers (the web tier) leave schema management to the bot
+        if not read_only:
+            self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return sqlite3.connect(self.db_path)
+
+    def init_database(self):
+        """Initialize the audio database"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            # WAL lets the web server stream audio while the bot writes
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_objects (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    mime_type TEXT,
+                    size INTEGER NOT NULL,
+                    chunk_size INTEGER NOT NULL,
+                    sha256 TEXT,
+                    complete INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Incremental blob I/O needs a rowid table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_chunks (
+                    id INTEGER PRIMARY KEY,
+                    object_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    UNIQUE (object_id, seq),
+                    FOREIGN KEY (object_id) REFERENCES audio_objects (id)
+                )
+            ''')
+
+            conn.commit()
+
+    def store_stream(self, stream: BinaryIO, size: int, filename: str,
+                     mime_type: str = 'audio/mpeg') -> str:
+        """Write ``size`` bytes from a file-like object and return the object ID"""
+        object_id = str(uuid.uuid4())
+        sha256 = hashlib.sha256()
+
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO audio_objects (id, filename, mime_type, size, chunk_size)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (object_id, filename, mime_type, size, self.CHUNK_SIZE))
+
+            remaining = size
+            seq = 0
+            while remaining > 0:
+                chunk_length = min(self.CHUNK_SIZE, remaining)
+                cursor.execute('''
+                    INSERT INTO audio_chunks (object_id, seq, data)
+                    VALUES (?, ?, zeroblob(?))
+                ''', (object_id, seq, chunk_length))
+
+                with conn.blobopen('audio_chunks', 'data', cursor.lastrowid) as blob:
+                    written = 0
+                    while written < chunk_length:
+                        data = stream.read(min(self.IO_SLICE, chunk_length - written))
+                        if not data:
+                            raise IOError(f"Stream ended {remaining - written} bytes early")
+                        blob.write(data)
+                        sha256.update(data)
+                        written += len(data)
+
+                remaining -= chunk_length
+                seq += 1
+
+            cursor.execute('''
+                UPDATE audio_objects SET sha256 = ?, complete = 1 WHERE id = ?
+            ''', (sha256.hexdigest(), object_id))
+            conn.commit()
+
+        return object_id
+
+    async def upload_audio_file(self, file_data: bytes, filename: str,
                               mime_type: str = 'audio/mpeg') -> str:
-        """Upload audio file to database as base64"""
+        """Store audio file in the database and return its object ID"""
         try:
-            # Convert to base64 for storage
-            file_base64 = base64.b64encode(file_data).decode('utf-8')
-            
-            # Store in database (you'd need to add a table for this)
-            # For now, return a reference ID
-            file_id = f"db_audio_{filename}_{len(file_data)}"
-            
-            # In a real implementation, you'd store the base64 data in the database
-            # and return the database record ID
-            
-            return file_id
-            
+            return await asyncio.to_thread(
+                self.store_stream, io.BytesIO(file_data), len(file_data), filename, mime_type
+            )
+
         except Exception as e:
             print(f"Error storing audio in database: {e}")
             raise
-    
-    def get_file_url(self, file_id: str) -> str:
+
+    def get_object(self, object_id: str) -> Optional[Dict[str, Any]]:
+        """Get metadata for a completely stored audio object"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM audio_objects WHERE id = ? AND complete = 1
+            ''', (object_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def exists(self, object_id: str) -> bool:
+        return self.get_object(object_id) is not None
+
+    def iter_range(self, object_id: str, start: int = 0,
+                   end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield bytes ``start``..``end`` (inclusive) of an object in small slices"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT size, chunk_size FROM audio_objects WHERE id = ? AND complete = 1
+            ''', (object_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise FileNotFoundError(object_id)
+            size, chunk_size = row
+            end = size - 1 if end is None else min(end, size - 1)
+
+            position = start
+            while position <= end:
+                seq, offset = divmod(position, chunk_size)
+                cursor.execute('''
+                    SELECT id FROM audio_chunks WHERE object_id = ? AND seq = ?
+                ''', (object_id, seq))
+                rowid = cursor.fetchone()[0]
+
+                with conn.blobopen('audio_chunks', 'data', rowid, readonly=True) as blob:
+                    blob.seek(offset)
+                    chunk_end = min(end + 1, (seq + 1) * chunk_size)
+                    while position < chunk_end:
+                        data = blob.read(min(self.IO_SLICE, chunk_end - position))
+                        position += len(data)
+                        yield data
+        finally:
+            conn.close()
+
+    def delete(self, object_id: str) -> None:
+        """Delete a stored audio object"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM audio_chunks WHERE object_id = ?', (object_id,))
+            cursor.execute('DELETE FROM audio_objects WHERE id = ?', (object_id,))
+            conn.commit()
+
+    @staticmethod
+    def get_file_url(file_id: str) -> str:
         """Generate a URL for accessing the file from database"""
-        # This would be an endpoint that serves the file from database
+        # Served by the /audio/db/<file_id> endpoint, which streams the chunks
         base_url = os.getenv('BASE_URL', 'https://chenaniah-bot.onrender.com')
-        return f"{base_url}/audio/{file_id}"
+        return f"{base_url}/audio/db/{file_id}"
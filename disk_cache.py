@@ -0,0 +1,209 @@
+"""
+Size-bounded on-disk LRU cache for audio fetched from remote storage.
+
+Audio kept in Google Drive or the Telegram storage channel is downloaded
+the first time a reviewer plays it and served from disk afterwards.
+Concurrent misses for the same file share one download, and the least
+recently played files are evicted once the cache exceeds its byte budget.
+
+Entries live in ``<directory>/<namespace>/<sha256(key)><extension>``. The
+file's mtime records its last use, so LRU order survives restarts and is
+shared (approximately) by several web worker processes.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A download in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path: Optional[Path] = None
+        self.error: Optional[BaseException] = None
+
+
+class DiskLRUCache:
+    def __init__(self, directory: str, max_bytes: int, name: str = 'audio_cache'):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._total_bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._bytes_saved = 0
+        self._bytes_fetched = 0
+        self._evictions = 0
+
+        self._load()
+        metrics.register(name, self.snapshot)
+
+    def _load(self) -> None:
+        """Rebuild the index from files already on disk, oldest first"""
+        found = []
+        for path in self.directory.glob('*/*'):
+            if path.suffix == '.part' or not path.is_file():
+                continue
+            stat = path.stat()
+            found.append((stat.st_mtime, self._entry_key(path.parent.name, path.stem, hashed=True),
+                          path, stat.st_size))
+
+        for _, entry_key, path, size in sorted(found, key=lambda item: item[0]):
+            self._entries[entry_key] = (path, size)
+            self._total_bytes += size
+
+    @staticmethod
+    def _entry_key(namespace: str, key: str, hashed: bool = False) -> str:
+        digest = key if hashed else hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return f"{namespace}/{digest}"
+
+    def _lookup(self, entry_key: str) -> Optional[Tuple[Path, int]]:
+        """Return a live entry and mark it most recently used (lock held)"""
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return None
+        if not entry[0].exists():
+            # Evicted by another worker process sharing the directory
+            del self._entries[entry_key]
+            self._total_bytes -= entry[1]
+            return None
+        self._entries.move_to_end(entry_key)
+        return entry
+
+    def get(self, namespace: str, key: str) -> Optional[Path]:
+        """Return the cached file for ``key`` without fetching it"""
+        with self._lock:
+            entry = self._lookup(self._entry_key(namespace, key))
+            if entry is None:
+                return None
+            self._hits += 1
+            self._bytes_saved += entry[1]
+        self._touch(entry[0])
+        return entry[0]
+
+    def get_or_fetch(self, namespace: str, key: str,
+                     fetch: Callable[[Path], str]) -> Path:
+        """Return the cached file for ``key``, downloading it on a miss.
+
+        ``fetch(path)`` must write the file to ``path`` and return the file
+        extension to keep (e.g. ``'.oga'``). Concurrent misses for the same
+        key wait for a single fetch instead of each downloading the file.
+        """
+        entry_key = self._entry_key(namespace, key)
+        with self._lock:
+            entry = self._lookup(entry_key)
+            if entry is not None:
+                self._hits += 1
+                self._bytes_saved += entry[1]
+            else:
+                flight = self._inflight.get(entry_key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[entry_key] = _Flight()
+                    self._misses += 1
+                else:
+                    self._coalesced += 1
+
+        if entry is not None:
+            self._touch(entry[0])
+            return entry[0]
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            with self._lock:
+                self._bytes_saved += self._entries.get(entry_key, (None, 0))[1]
+            return flight.path
+
+        try:
+            flight.path = self._download(namespace, entry_key, fetch)
+            return flight.path
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(entry_key, None)
+            flight.done.set()
+
+    def _download(self, namespace: str, entry_key: str,
+                  fetch: Callable[[Path], str]) -> Path:
+        directory = self.directory / namespace
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix='.part')
+        os.close(fd)
+        temp_path = Path(temp_name)
+        try:
+            extension = fetch(temp_path) or ''
+            path = directory / f"{entry_key.split('/', 1)[1]}{extension}"
+            # Rename is atomic, so readers never see a half-written file
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+        size = path.stat().st_size
+        with self._lock:
+            previous = self._entries.pop(entry_key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._entries[entry_key] = (path, size)
+            self._total_bytes += size
+            self._bytes_fetched += size
+            self._evict(keep=entry_key)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used entries until within budget (lock held)"""
+        while self._total_bytes > self.max_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                break
+            path, size = self._entries.pop(victim)
+            self._total_bytes -= size
+            self._evictions += 1
+            # Files already opened for a response stay readable after unlink
+            path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            requests = self._hits + self._coalesced + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+                'hit_ratio': round((self._hits + self._coalesced) / requests, 3) if requests else None,
+                'bytes_saved': self._bytes_saved,
+                'bytes_fetched': self._bytes_fetched,
+                'evictions': self._evictions,
+            }
+
+
+audio_cache = DiskLRUCache(Config.AUDIO_CACHE_DIR, Config.AUDIO_CACHE_MAX_MB * 1024 * 1024)
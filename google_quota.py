@@ -0,0 +1,194 @@
+"""
+Quota-aware scheduler for Google Drive and Sheets API traffic.
+
+Every request goes through a token bucket for its API and method class
+(read or write), sized from the per-minute quotas in Config. Waiting
+callers are served by priority, so user-facing uploads go ahead of
+background reconciliation and admin syncs. 429 / rate-limit responses
+block the bucket for the Retry-After period and are retried with
+jittered exponential backoff.
+
+Admitted requests then pass an adaptive concurrency limiter and run in a
+worker thread, so blocking client calls never stall the event loop. The
+clients share a thread-safe connection pool (see http_transport.py).
+
+Blocking code in worker threads (the audio endpoints) uses
+``execute_sync``, which runs the request on the bot's event loop when
+there is one, so it draws from the same buckets.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import threading
+from typing import Any, Dict, Tuple
+
+import httplib2
+import requests
+from googleapiclient.errors import HttpError
+
+import metrics
+import telegram_client
+from adaptive_limiter import AdaptiveConcurrencyLimiter
+from config import Config
+from rate_limit import PriorityTokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers are served first
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 10
+PRIORITY_ADMIN = 20
+
+READ = 'read'
+WRITE = 'write'
+
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'RESOURCE_EXHAUSTED')
+
+
+def is_rate_limited(error: HttpError) -> bool:
+    """Check whether an HttpError is a quota / rate limit rejection"""
+    status = getattr(error.resp, 'status', None)
+    if status == 429:
+        return True
+    if status == 403:
+        content = error.content.decode('utf-8', 'ignore') if isinstance(error.content, bytes) else str(error.content)
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def is_service_failure(error: Exception) -> bool:
+    """Errors that should count against a circuit breaker (anything but a 404)"""
+    return not (isinstance(error, HttpError) and getattr(error.resp, 'status', None) == 404)
+
+
+def is_overload(error: Exception) -> bool:
+    """Errors that mean the API is struggling, as opposed to a bad request"""
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, 'status', 0)
+        return status >= 500 or is_rate_limited(error)
+    return isinstance(error, (socket.timeout, TimeoutError, ConnectionError,
+                              httplib2.HttpLib2Error, requests.RequestException))
+
+
+class QuotaScheduler:
+    def __init__(self):
+        self.max_retries = Config.GOOGLE_QUOTA_MAX_RETRIES
+        self.backoff_base = Config.GOOGLE_QUOTA_BACKOFF_BASE
+        self.backoff_max = Config.GOOGLE_QUOTA_BACKOFF_MAX
+
+        per_minute = {
+            ('drive', READ): Config.GOOGLE_DRIVE_READS_PER_MINUTE,
+            ('drive', WRITE): Config.GOOGLE_DRIVE_WRITES_PER_MINUTE,
+            ('sheets', READ): Config.GOOGLE_SHEETS_READS_PER_MINUTE,
+            ('sheets', WRITE): Config.GOOGLE_SHEETS_WRITES_PER_MINUTE,
+        }
+        # Allow a short burst of up to a tenth of the minute's quota
+        self.buckets: Dict[Tuple[str, str], PriorityTokenBucket] = {
+            key: PriorityTokenBucket(rate=limit / 60.0, capacity=max(1.0, limit / 10.0))
+            for key, limit in per_minute.items()
+        }
+        self.stats: Dict[Tuple[str, str], Dict[str, float]] = {
+            key: {'requests': 0, 'rate_limited': 0, 'retries': 0, 'wait_seconds': 0.0}
+            for key in per_minute
+        }
+        self.limiters: Dict[Tuple[str, str], AdaptiveConcurrencyLimiter] = {
+            key: AdaptiveConcurrencyLimiter(
+                f"{key[0]}.{key[1]}",
+                initial_limit=Config.GOOGLE_CONCURRENCY_INITIAL,
+                min_limit=Config.GOOGLE_CONCURRENCY_MIN,
+                max_limit=Config.GOOGLE_CONCURRENCY_MAX,
+                latency_tolerance=Config.GOOGLE_LATENCY_TOLERANCE
+            )
+            for key in per_minute
+        }
+
+        metrics.register('google_quota', self.snapshot)
+        metrics.register('google_concurrency', self.concurrency_snapshot)
+
+    def _backoff(self, attempt: int, error: HttpError) -> float:
+        retry_after = error.resp.get('retry-after') if error.resp else None
+        if retry_after:
+            try:
+                # Honour the server's hint, plus a little jitter to spread retries
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def execute(self, api: str, method_class: str, request,
+                      priority: int = PRIORITY_USER) -> Any:
+        """Execute a googleapiclient request within the quota for its API"""
+        key = (api, method_class)
+        bucket = self.buckets[key]
+        stats = self.stats[key]
+        limiter = self.limiters[key]
+
+        attempt = 0
+        while True:
+            stats['wait_seconds'] += await bucket.acquire(priority)
+            stats['requests'] += 1
+            try:
+                async with limiter.acquire() as outcome:
+                    try:
+                        return await asyncio.to_thread(request.execute)
+                    except Exception as e:
+                        outcome.overloaded = is_overload(e)
+                        raise
+            except HttpError as e:
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                stats['rate_limited'] += 1
+                stats['retries'] += 1
+                delay = self._backoff(attempt, e)
+                bucket.penalize(delay)
+                logger.warning(f"Google {api} {method_class} rate limited, retrying in {delay:.1f}s")
+                attempt += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for (api, method_class), bucket in self.buckets.items():
+            stats = self.stats[(api, method_class)]
+            snapshot[f"{api}.{method_class}"] = {
+                **bucket.snapshot(),
+                'quota_per_minute': round(bucket.rate * 60),
+                'requests': stats['requests'],
+                'rate_limited': stats['rate_limited'],
+                'retries': stats['retries'],
+                'wait_seconds': round(stats['wait_seconds'], 2),
+            }
+        return snapshot
+
+    def concurrency_snapshot(self) -> Dict[str, Any]:
+        return {
+            f"{api}.{method_class}": limiter.snapshot()
+            for (api, method_class), limiter in self.limiters.items()
+        }
+
+
+scheduler = QuotaScheduler()
+
+
+_sync_loop = None
+_sync_lock = threading.Lock()
+
+
+def _private_loop() -> asyncio.AbstractEventLoop:
+    """Event loop for processes without a bot loop (e.g. gunicorn workers)"""
+    global _sync_loop
+    with _sync_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name='google-quota',
+                             daemon=True).start()
+        return _sync_loop
+
+
+def execute_sync(api: str, method_class: str, request, priority: int = PRIORITY_USER) -> Any:
+    """Blocking ``scheduler.execute`` for worker threads; never call it on an event loop"""
+    coro = scheduler.execute(api, method_class, request, priority)
+    if telegram_client.can_run_sync():
+        return telegram_client.run_sync(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _private_loop()).result()
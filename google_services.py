@@ -1,18 +1,33 @@
 import os
 import io
+import mimetypes
+import re
+from pathlib import Path
 from typing import Optional
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 from config import Config
+from disk_cache import audio_cache
+from http_transport import build_service
+from google_quota import scheduler, execute_sync, PRIORITY_USER, PRIORITY_BACKGROUND, READ, WRITE
+
+class _NextChunk:
+    """One chunk of a MediaIoBaseDownload, in the shape scheduler.execute expects"""
+    
+    def __init__(self, downloader: MediaIoBaseDownload):
+        self.downloader = downloader
+    
+    def execute(self):
+        return self.downloader.next_chunk()
 
 class GoogleDriveService:
     def __init__(self):
         self.service = None
         self.credentials = None
+        self._shared_drive_cache = {}
         self._authenticate()
     
     def _authenticate(self):
@@ -40,7 +55,7 @@ class GoogleDriveService:
                     service_account_info,
                     scopes=Config.GOOGLE_SCOPES
                 )
-                self.service = build('drive', 'v3', credentials=self.credentials)
+                self.service = build_service('drive', 'v3', self.credentials)
                 print("✅ Authenticated with service account from environment")
                 return
         except Exception as e:
@@ -53,7 +68,7 @@ class GoogleDriveService:
                     'service_account.json',
                     scopes=Config.GOOGLE_SCOPES
                 )
-                self.service = build('drive', 'v3', credentials=self.credentials)
+                self.service = build_service('drive', 'v3', self.credentials)
                 print("✅ Authenticated with service account from file")
                 return
         except Exception as e:
@@ -84,15 +99,16 @@ class GoogleDriveService:
                 token.write(creds.to_json())
         
         self.credentials = creds
-        self.service = build('drive', 'v3', credentials=creds)
+        self.service = build_service('drive', 'v3', creds)
     
     async def upload_audio_file(self, file_data: bytes, filename: str, 
-                              mime_type: str = 'audio/mpeg') -> str:
+                              mime_type: str = 'audio/mpeg',
+                              priority: int = PRIORITY_USER) -> str:
         """Upload audio file to Google Drive and return shareable link"""
         try:
             # Check if we're using a shared drive
             folder_id = Config.GOOGLE_DRIVE_FOLDER_ID
-            is_shared_drive = self._is_shared_drive(folder_id)
+            is_shared_drive = await self._is_shared_drive(folder_id, priority)
             
             # Create file metadata
             file_metadata = {
@@ -110,32 +126,32 @@ class GoogleDriveService:
             # Upload file with appropriate parameters
             if is_shared_drive:
                 # For shared drives, we need to specify supportsAllDrives=True
-                file = self.service.files().create(
+                file = await scheduler.execute('drive', WRITE, self.service.files().create(
                     body=file_metadata,
                     media_body=media,
                     fields='id,webViewLink,webContentLink',
                     supportsAllDrives=True
-                ).execute()
+                ), priority)
             else:
                 # For regular folders, try to upload but this will likely fail
-                file = self.service.files().create(
+                file = await scheduler.execute('drive', WRITE, self.service.files().create(
                     body=file_metadata,
                     media_body=media,
                     fields='id,webViewLink,webContentLink'
-                ).execute()
+                ), priority)
             
             # Make file publicly viewable
             if is_shared_drive:
-                self.service.permissions().create(
+                await scheduler.execute('drive', WRITE, self.service.permissions().create(
                     fileId=file['id'],
                     body={'role': 'reader', 'type': 'anyone'},
                     supportsAllDrives=True
-                ).execute()
+                ), priority)
             else:
-                self.service.permissions().create(
+                await scheduler.execute('drive', WRITE, self.service.permissions().create(
                     fileId=file['id'],
                     body={'role': 'reader', 'type': 'anyone'}
-                ).execute()
+                ), priority)
             
             # Return the file ID for flexible link generation
             file_id = file['id']
@@ -147,19 +163,82 @@ class GoogleDriveService:
             print(f"Error uploading to Google Drive: {e}")
             raise
     
-    def _is_shared_drive(self, folder_id: str) -> bool:
+    async def get_md5_checksum(self, file_id: str,
+                               priority: int = PRIORITY_USER) -> Optional[str]:
+        """Return the MD5 checksum of a Drive file, or None if it was trashed"""
+        file = await scheduler.execute('drive', READ, self.service.files().get(
+            fileId=file_id,
+            fields='md5Checksum,trashed',
+            supportsAllDrives=True
+        ), priority)
+        if file.get('trashed'):
+            return None
+        return file.get('md5Checksum')
+    
+    def get_file_url(self, file_id: str) -> str:
+        """Generate a link for playing a Drive file"""
+        if Config.AUDIO_PROXY_DRIVE:
+            # Served (and cached on disk) by our /audio/drive endpoint
+            base_url = os.getenv('BASE_URL', 'https://chenaniah-bot.onrender.com')
+            return f"{base_url}/audio/drive/{file_id}"
+        return f"https://drive.google.com/file/d/{file_id}/view"
+    
+    def fetch_audio(self, file_id: str) -> Path:
+        """Return a local copy of a Drive file, downloading it on first access.
+
+        Blocking, like TelegramStorageService.fetch_audio, so the web
+        endpoints can call it from worker threads.
+        """
+        return audio_cache.get_or_fetch(
+            'drive', file_id, lambda path: self._download(file_id, path)
+        )
+    
+    def _download(self, file_id: str, destination: Path) -> str:
+        """Download a Drive file in chunks and return its extension"""
+        # Metadata and every chunk count against the drive/read quota
+        file = execute_sync('drive', READ, self.service.files().get(
+            fileId=file_id,
+            fields='name,mimeType',
+            supportsAllDrives=True
+        ))
+        
+        request = self.service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        with open(destination, 'wb') as f:
+            downloader = MediaIoBaseDownload(f, request, chunksize=1024 * 1024)
+            done = False
+            while not done:
+                _, done = execute_sync('drive', READ, _NextChunk(downloader))
+        
+        return (os.path.splitext(file.get('name', ''))[1]
+                or mimetypes.guess_extension(file.get('mimeType') or '') or '')
+    
+    async def check_connection(self) -> None:
+        """Lightweight call used by the circuit breaker probe"""
+        await scheduler.execute('drive', READ, self.service.files().get(
+            fileId=Config.GOOGLE_DRIVE_FOLDER_ID,
+            fields='id',
+            supportsAllDrives=True
+        ), PRIORITY_BACKGROUND)
+    
+    async def _is_shared_drive(self, folder_id: str, priority: int = PRIORITY_USER) -> bool:
         """Check if the folder ID belongs to a shared drive"""
+        # The answer never changes for a folder, so only ask Drive once
+        if folder_id in self._shared_drive_cache:
+            return self._shared_drive_cache[folder_id]
         try:
             # Try to get the folder info with supportsAllDrives
-            folder = self.service.files().get(
+            folder = await scheduler.execute('drive', READ, self.service.files().get(
                 fileId=folder_id,
                 supportsAllDrives=True
-            ).execute()
-            
-            # Check if it's in a shared drive
-            return 'driveId' in folder
-        except:
+            ), priority)
+        except Exception as e:
+            # Don't cache a failed lookup, the next upload asks again
+            print(f"Could not check whether folder {folder_id} is on a shared drive: {e}")
             return False
+        
+        # Check if it's in a shared drive
+        self._shared_drive_cache[folder_id] = 'driveId' in folder
+        return self._shared_drive_cache[folder_id]
 
 class GoogleSheetsService:
     def __init__(self):
@@ -192,7 +271,7 @@ class GoogleSheetsService:
                     service_account_info,
                     scopes=Config.GOOGLE_SCOPES
                 )
-                self.service = build('sheets', 'v4', credentials=self.credentials)
+                self.service = build_service('sheets', 'v4', self.credentials)
                 print("✅ Authenticated with service account from environment")
                 return
         except Exception as e:
@@ -205,7 +284,7 @@ class GoogleSheetsService:
                     'service_account.json',
                     scopes=Config.GOOGLE_SCOPES
                 )
-                self.service = build('sheets', 'v4', credentials=self.credentials)
+                self.service = build_service('sheets', 'v4', self.credentials)
                 print("✅ Authenticated with service account from file")
                 return
         except Exception as e:
@@ -236,19 +315,24 @@ class GoogleSheetsService:
                 token.write(creds.to_json())
         
         self.credentials = creds
-        self.service = build('sheets', 'v4', credentials=creds)
+        self.service = build_service('sheets', 'v4', creds)
     
     async def add_submission(self, name: str, address: str, phone: str, 
-                           telegram_username: str, audio_link: str) -> None:
-        """Add a new submission to Google Sheets"""
+                           telegram_username: str, audio_link: str,
+                           priority: int = PRIORITY_USER,
+                           preview_link: Optional[str] = None,
+                           submitted_at: Optional[str] = None,
+                           submission_id: Optional[int] = None) -> Optional[int]:
+        """Add a new submission to Google Sheets and return its row number"""
         try:
             from datetime import datetime
             
-            # audio_link is now the file ID directly
-            file_id = audio_link
-            
-            # Create a simple, clean audio link that opens in Google Drive
-            view_link = f"https://drive.google.com/file/d/{file_id}/view"
+            # audio_link is either a ready-made URL or a Google Drive file ID
+            if audio_link.startswith(('http://', 'https://')):
+                view_link = audio_link
+            else:
+                # Create a simple, clean audio link that opens in Google Drive
+                view_link = f"https://drive.google.com/file/d/{audio_link}/view"
             
             # Create a clickable link that opens Google Drive player
             # Use the direct link instead of formula to ensure it works
@@ -262,36 +346,152 @@ class GoogleSheetsService:
                     phone,
                     f"https://t.me/{telegram_username}" if telegram_username else "No username",
                     view_link,  # Direct link, no formula
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    submitted_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "Under Review"  # Status column
                 ]
             ]
             
+            # Short low-bitrate clip and the submission ID, in their own
+            # columns further right
+            extra = {}
+            if preview_link:
+                extra[self._column_index(Config.GOOGLE_SHEET_PREVIEW_COLUMN)] = preview_link
+            if submission_id is not None:
+                extra[self._column_index(Config.GOOGLE_SHEET_SUBMISSION_ID_COLUMN)] = str(submission_id)
+            row = values[0]
+            for column, value in sorted(extra.items()):
+                row.extend([''] * (column - len(row)))
+                row[column:column + 1] = [value]
+            
             # Append to sheet
             body = {
                 'values': values
             }
             
-            result = self.service.spreadsheets().values().append(
+            result = await scheduler.execute('sheets', WRITE, self.service.spreadsheets().values().append(
                 spreadsheetId=Config.GOOGLE_SHEET_ID,
                 range=Config.GOOGLE_SHEET_RANGE,
                 valueInputOption='RAW',  # Use RAW to prevent formula interpretation
                 body=body
-            ).execute()
+            ), priority)
             
             print(f"Added submission to Google Sheets: {result.get('updates', {}).get('updatedRows', 0)} rows added")
             
+            # Return the row number so the cell can be updated later
+            return self._parse_row(result.get('updates', {}).get('updatedRange', ''))
+            
         except Exception as e:
             print(f"Error adding to Google Sheets: {e}")
             raise
     
-    async def get_submissions(self) -> list:
+    @staticmethod
+    def _parse_row(a1_range: str) -> Optional[int]:
+        """Extract the first row number from an A1 range like 'Sheet1!A5:G5'"""
+        match = re.search(r'[A-Z]+(\d+)', a1_range.split('!')[-1])
+        return int(match.group(1)) if match else None
+    
+    @staticmethod
+    def _column_index(letters: str) -> int:
+        """Zero-based index of a column letter such as 'A' or 'AB'"""
+        index = 0
+        for letter in letters.upper():
+            index = index * 26 + ord(letter) - ord('A') + 1
+        return index - 1
+    
+    def _sheet_range(self, cells: str) -> str:
+        """Qualify a range with the sheet name from GOOGLE_SHEET_RANGE, if any"""
+        if '!' in Config.GOOGLE_SHEET_RANGE:
+            return f"{Config.GOOGLE_SHEET_RANGE.split('!')[0]}!{cells}"
+        return cells
+    
+    async def find_audio_row(self, audio_cell_value: str,
+                             priority: int = PRIORITY_BACKGROUND) -> Optional[int]:
+        """Find the row whose audio cell holds the given value"""
+        column = Config.GOOGLE_SHEET_AUDIO_COLUMN
+        result = await scheduler.execute('sheets', READ, self.service.spreadsheets().values().get(
+            spreadsheetId=Config.GOOGLE_SHEET_ID,
+            range=self._sheet_range(f"{column}:{column}")
+        ), priority)
+        
+        for index, row in enumerate(result.get('values', []), start=1):
+            if row and row[0] == audio_cell_value:
+                return index
+        return None
+    
+    async def resolve_row(self, submission_id: int, sheet_row: Optional[int],
+                          audio_cell_value: Optional[str] = None,
+                          priority: int = PRIORITY_BACKGROUND) -> Optional[int]:
+        """The row that holds a submission now, or None if it can't be found.
+
+        Reviewers sort and filter the sheet, so a remembered row number may
+        point at another applicant by the time it is updated. Rows are found
+        by the submission ID column; rows appended before it existed fall
+        back to their audio cell.
+        """
+        column = Config.GOOGLE_SHEET_SUBMISSION_ID_COLUMN
+        result = await scheduler.execute('sheets', READ, self.service.spreadsheets().values().get(
+            spreadsheetId=Config.GOOGLE_SHEET_ID,
+            range=self._sheet_range(f"{column}:{column}")
+        ), priority)
+        
+        values = result.get('values', [])
+        wanted = str(submission_id)
+        if sheet_row and sheet_row <= len(values) and values[sheet_row - 1][:1] == [wanted]:
+            return sheet_row
+        for index, row in enumerate(values, start=1):
+            if row and row[0] == wanted:
+                return index
+        if audio_cell_value:
+            return await self.find_audio_row(audio_cell_value, priority)
+        return None
+    
+    async def update_audio_link(self, sheet_row: int, file_id: str,
+                                priority: int = PRIORITY_BACKGROUND) -> None:
+        """Point the audio cell of an existing row at a Google Drive file"""
+        column = Config.GOOGLE_SHEET_AUDIO_COLUMN
+        await scheduler.execute('sheets', WRITE, self.service.spreadsheets().values().update(
+            spreadsheetId=Config.GOOGLE_SHEET_ID,
+            range=self._sheet_range(f"{column}{sheet_row}"),
+            valueInputOption='RAW',
+            body={'values': [[f"https://drive.google.com/file/d/{file_id}/view"]]}
+        ), priority)
+    
+    async def update_quality(self, sheet_row: int, score: int, details: str,
+                             preview_link: Optional[str] = None,
+                             priority: int = PRIORITY_BACKGROUND) -> None:
+        """Write the recording quality score, its summary and the preview link next to a row"""
+        cells = [
+            (Config.GOOGLE_SHEET_QUALITY_COLUMN, score),
+            (Config.GOOGLE_SHEET_QUALITY_DETAILS_COLUMN, details),
+        ]
+        if preview_link:
+            cells.append((Config.GOOGLE_SHEET_PREVIEW_COLUMN, preview_link))
+        
+        await scheduler.execute('sheets', WRITE, self.service.spreadsheets().values().batchUpdate(
+            spreadsheetId=Config.GOOGLE_SHEET_ID,
+            body={
+                'valueInputOption': 'RAW',
+                'data': [
+                    {'range': self._sheet_range(f"{column}{sheet_row}"), 'values': [[value]]}
+                    for column, value in cells
+                ]
+            }
+        ), priority)
+    
+    async def check_connection(self) -> None:
+        """Lightweight call used by the circuit breaker probe"""
+        await scheduler.execute('sheets', READ, self.service.spreadsheets().get(
+            spreadsheetId=Config.GOOGLE_SHEET_ID,
+            fields='spreadsheetId'
+        ), PRIORITY_BACKGROUND)
+    
+    async def get_submissions(self, priority: int = PRIORITY_USER) -> list:
         """Get all submissions from Google Sheets"""
         try:
-            result = self.service.spreadsheets().values().get(
+            result = await scheduler.execute('sheets', READ, self.service.spreadsheets().values().get(
                 spreadsheetId=Config.GOOGLE_SHEET_ID,
                 range=Config.GOOGLE_SHEET_RANGE
-            ).execute()
+            ), priority)
             
             values = result.get('values', [])
             return values
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for the standalone web tier (wsgi.py).
+
+Audio responses are long-lived and mostly I/O bound, so each worker process
+runs a pool of threads. Scale out with WEB_WORKERS / WEB_THREADS, or by
+running more instances behind a load balancer; workers keep no state.
+"""
+
+from config import Config
+
+bind = f"{Config.WEB_HOST}:{Config.WEB_PORT}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+# Let the kernel copy file bodies straight to the socket
+sendfile = True
+
+# Recycle workers now and then to contain any slow leaks
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
@@ -3,27 +3,37 @@
 Health check endpoint for Render.com deployment
 """
 
-from flask import Flask, jsonify, send_file, abort
+from flask import Flask, jsonify, abort
+import asyncio
 import os
+import time
 from datetime import datetime
 from pathlib import Path
+from werkzeug.exceptions import HTTPException
+
+import metrics
+from audio_http import send_audio_file, send_audio_stream
+from storage_refs import TELEGRAM_PREFIX
 
 app = Flask(__name__)
 
-@app.route('/')
-def home():
-    """Home endpoint"""
-    return jsonify({
+def home_report():
+    """Service banner shown on the root URL"""
+    return {
         'status': 'online',
         'service': 'Chenaniah Worship Ministry Application Bot',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
         'ministry': 'Chenaniah Worship Ministry'
-    })
+    }
 
-@app.route('/health')
-def health():
-    """Health check endpoint for Render"""
+@app.route('/')
+def home():
+    """Home endpoint"""
+    return jsonify(home_report())
+
+def health_report():
+    """Run the health checks and return (payload, HTTP status)"""
     try:
         # Check if required environment variables are set
         required_vars = [
@@ -35,22 +45,22 @@ def health():
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         
         if missing_vars:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': f'Missing environment variables: {missing_vars}',
                 'timestamp': datetime.now().isoformat()
-            }), 500
+            }, 500
         
         # Check if credentials file exists
         credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE', './credentials.json')
         if not os.path.exists(credentials_file):
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'Google credentials file not found',
                 'timestamp': datetime.now().isoformat()
-            }), 500
+            }, 500
         
-        return jsonify({
+        return {
             'status': 'healthy',
             'message': 'All systems operational',
             'timestamp': datetime.now().isoformat(),
@@ -59,25 +69,62 @@ def health():
                 'credentials_file': 'ok',
                 'database_path': os.getenv('DATABASE_PATH', './data/vocalist_screening.db')
             }
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'status': 'error',
             'message': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/status')
-def status():
-    """Detailed status endpoint"""
-    return jsonify({
-        'bot_status': 'running',
+def status_report():
+    """Detailed status payload"""
+    collected = metrics.collect()
+    bot_status = 'running'
+    if not metrics.is_publishing():
+        # Separate web tier: report the snapshot last published by the bot
+        # alongside this worker's own metrics
+        collected = {f"web.{name}": value for name, value in collected.items()}
+        snapshot = metrics.read_snapshot(
+            os.getenv('METRICS_SNAPSHOT_PATH', './data/metrics.json')
+        )
+        if snapshot is None:
+            bot_status = 'unknown'
+        else:
+            interval = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', '15'))
+            age = time.time() - snapshot['published_at']
+            bot_status = 'running' if age < 3 * interval else 'stale'
+            collected.update(snapshot['metrics'])
+    
+    return {
+        'bot_status': bot_status,
         'database_status': 'connected',
         'google_apis_status': 'connected',
         'telegram_api_status': 'connected',
+        'metrics': collected,
         'last_check': datetime.now().isoformat()
-    })
+    }
+
+@app.route('/health')
+def health():
+    """Health check endpoint for Render"""
+    payload, status_code = health_report()
+    return jsonify(payload), status_code
+
+@app.route('/status')
+def status():
+    """Detailed status endpoint"""
+    return jsonify(status_report())
+
+_local_storage = None
+
+def _get_local_storage():
+    global _local_storage
+    if _local_storage is None:
+        from local_storage_service import LocalStorageService
+        _local_storage = LocalStorageService(read_only=True)
+    return _local_storage
 
 @app.route('/audio_files/<path:filename>')
 def serve_audio(filename):
@@ -90,22 +137,98 @@ def serve_audio(filename):
         # Construct file path
         file_path = Path("audio_files") / filename
         
-        # Check if file exists
+        # Check if file exists, or was packed into an archive
         if not file_path.exists():
-            abort(404)
+            file_path = _get_local_storage().fetch_archived(filename)
+            if file_path is None:
+                abort(404)
         
-        # Serve the file
-        return send_file(
-            file_path,
-            as_attachment=False,
-            mimetype='audio/mpeg'
-        )
+        # Serve the file with Range, ETag and long-lived cache headers
+        return send_audio_file(file_path, filename)
     
+    except HTTPException:
+        # 403/404 above and 304/416 from conditional handling
+        raise
     except Exception as e:
         print(f"Error serving file {filename}: {e}")
         abort(500)
 
+_drive_service = None
+_telegram_storage = None
+_database_storage = None
+_database = None
+
+def _is_known_audio(ref):
+    """Only audio the bot stored may be proxied, not any file our credentials can read"""
+    global _database
+    if _database is None:
+        from database import Database
+        _database = Database(read_only=True)
+    return asyncio.run(_database.is_audio_path_referenced(ref))
+
+@app.route('/audio/drive/<file_id>')
+def serve_drive_audio(file_id):
+    """Serve Drive-stored audio from the disk cache, downloading it on a miss"""
+    global _drive_service
+    try:
+        if not _is_known_audio(file_id):
+            abort(404)
+        if _drive_service is None:
+            from google_services import GoogleDriveService
+            _drive_service = GoogleDriveService()
+        
+        file_path = _drive_service.fetch_audio(file_id)
+        
+        return send_audio_file(file_path, file_id)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error serving Drive audio {file_id}: {e}")
+        abort(404)
+
+@app.route('/audio/telegram/<file_id>')
+def serve_telegram_audio(file_id):
+    """Serve audio kept in the Telegram storage channel, fetching it on first play"""
+    global _telegram_storage
+    try:
+        if not _is_known_audio(TELEGRAM_PREFIX + file_id):
+            abort(404)
+        if _telegram_storage is None:
+            from telegram_storage_service import TelegramStorageService
+            _telegram_storage = TelegramStorageService()
+        
+        file_path = _telegram_storage.fetch_audio(file_id)
+        
+        return send_audio_file(file_path, file_id)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error serving Telegram audio {file_id}: {e}")
+        abort(404)
+
+@app.route('/audio/db/<file_id>')
+def serve_database_audio(file_id):
+    """Stream audio kept in the SQLite audio database chunk by chunk"""
+    global _database_storage
+    if _database_storage is None:
+        from database_storage_service import DatabaseStorageService
+        # The web tier only ever reads the audio database
+        _database_storage = DatabaseStorageService(read_only=True)
+    
+    audio = _database_storage.get_object(file_id)
+    if not audio:
+        abort(404)
+    
+    return send_audio_stream(
+        lambda start, end: _database_storage.iter_range(file_id, start, end),
+        audio['size'],
+        file_id,
+        audio['mime_type'] or 'audio/mpeg'
+    )
+
 if __name__ == '__main__':
-    # This is for local testing only
-    # Render will use the main bot process
+    # This is for local testing only; production runs the async web_server
+    # inside the bot process, or this app under gunicorn (see wsgi.py)
     app.run(host='0.0.0.0', port=5000, debug=False)
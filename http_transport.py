@@ -0,0 +1,100 @@
+"""
+Pooled, thread-safe HTTP transport for the Google API discovery clients.
+
+googleapiclient defaults to httplib2, whose connections are neither
+thread-safe nor shared between threads. ``PooledHttp`` implements the small
+part of the httplib2.Http interface that googleapiclient uses on top of a
+google-auth ``AuthorizedSession``. Every Drive and Sheets client mounts the
+same urllib3 connection pool, so TLS connections are kept alive and reused
+across worker threads.
+"""
+
+import logging
+import threading
+from typing import Any, Dict
+
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request
+from googleapiclient.discovery import build
+
+import metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that reports how often pooled connections are reused"""
+
+    def __init__(self, pool_maxsize: int):
+        super().__init__(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+        return super().send(request, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        connections = 0
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        return {
+            'requests': self.requests,
+            'connections_opened': connections,
+            'reused_requests': max(0, self.requests - connections),
+            'pool_maxsize': self._pool_maxsize,
+        }
+
+
+_adapter = PooledAdapter(pool_maxsize=Config.GOOGLE_HTTP_POOL_SIZE)
+metrics.register('google_http_pool', _adapter.snapshot)
+
+
+class PooledHttp:
+    """httplib2.Http-compatible wrapper around a shared AuthorizedSession pool"""
+
+    def __init__(self, credentials, timeout: float = None):
+        self.credentials = credentials
+        self.timeout = timeout or Config.GOOGLE_HTTP_TIMEOUT
+        self._refresh_lock = threading.Lock()
+        self.session = AuthorizedSession(credentials)
+        self.session.mount('https://', _adapter)
+
+    def _ensure_token(self) -> None:
+        # Refresh once under a lock rather than from every worker thread
+        if self.credentials.valid:
+            return
+        with self._refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                redirections=5, connection_type=None):
+        self._ensure_token()
+        response = self.session.request(
+            method, uri, data=body, headers=headers, timeout=self.timeout,
+            # Resumable uploads answer 308 without a Location header
+            allow_redirects=method in ('GET', 'HEAD')
+        )
+
+        info = {key.lower(): value for key, value in response.headers.items()}
+        # requests already decompressed the body, as httplib2 would have
+        info.pop('content-encoding', None)
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self) -> None:
+        # The connection pool is shared, so only the session wrapper goes away
+        pass
+
+
+def build_service(service_name: str, version: str, credentials):
+    """Build a discovery client that uses the shared connection pool"""
+    return build(service_name, version, http=PooledHttp(credentials), cache_discovery=False)
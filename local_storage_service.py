@@ -1,48 +1,379 @@
+import asyncio
+import hashlib
 import os
+import sqlite3
 import uuid
-from datetime import datetime
+import zipfile
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import aiofiles
+from config import Config
+from disk_cache import audio_cache
 
 class LocalStorageService:
-    def __init__(self):
+    """Store audio files on local disk.
+
+    Files go to ``audio_files/<YYYY-MM-DD>/<shard>/<uuid>.<ext>``, where the
+    date is taken at write time and the shard is the first two hex digits of
+    the UUID, so no single directory grows without bound. Every file is
+    recorded in a SQLite index (path, size, hash), so lookups and cleanup
+    never need to scan the directories.
+
+    Cold files can be packed into zip archives under ``LOCAL_ARCHIVE_DIR``
+    (each archive holds files of one day and is never modified after it is
+    written); they stay readable and the index records which archive holds
+    them.
+    """
+
+    def __init__(self, index_path: str = None, read_only: bool = False):
         self.storage_dir = Path("audio_files")
-        self.storage_dir.mkdir(exist_ok=True)
-        
-        # Create subdirectories by date for organization
-        self.today_dir = self.storage_dir / datetime.now().strftime("%Y-%m-%d")
-        self.today_dir.mkdir(exist_ok=True)
-    
-    async def upload_audio_file(self, file_data: bytes, filename: str, 
+        self.index_path = index_path or Config.LOCAL_STORAGE_INDEX_PATH
+        self.archive_dir = Path(Config.LOCAL_ARCHIVE_DIR)
+        self.read_only = read_only
+        # Readers (the web tier) leave the directory and the index to the bot
+        if not read_only:
+            self.storage_dir.mkdir(exist_ok=True)
+            self.init_index()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+        return sqlite3.connect(self.index_path)
+
+    def init_index(self):
+        """Initialize the file index"""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS local_files (
+                    file_id TEXT PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT,
+                    mime_type TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_local_files_created
+                ON local_files (created_at)
+            ''')
+            
+            # Archive holding the file once it has been packed (NULL = on disk)
+            cursor.execute('PRAGMA table_info(local_files)')
+            columns = {row[1] for row in cursor.fetchall()}
+            if 'archive' not in columns:
+                cursor.execute('ALTER TABLE local_files ADD COLUMN archive TEXT')
+                cursor.execute('ALTER TABLE local_files ADD COLUMN archived_at TIMESTAMP')
+            conn.commit()
+
+    def _relative_path(self, file_id: str, extension: str) -> Path:
+        # Computed per write so long-running processes keep dating correctly
+        day = datetime.now().strftime("%Y-%m-%d")
+        return Path(day) / file_id[:2] / f"{file_id}.{extension}"
+
+    async def upload_audio_file(self, file_data: bytes, filename: str,
                               mime_type: str = 'audio/mpeg') -> str:
         """Upload audio file to local storage and return file path"""
         try:
             # Generate unique filename to avoid conflicts
-            file_id = str(uuid.uuid4())
+            file_id = uuid.uuid4().hex
             file_extension = filename.split('.')[-1] if '.' in filename else 'mp3'
-            unique_filename = f"{file_id}.{file_extension}"
-            
-            # Save file to local storage
-            file_path = self.today_dir / unique_filename
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(file_data)
-            
+            relative_path = self._relative_path(file_id, file_extension)
+
+            file_path = self.storage_dir / relative_path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temp file and rename, so readers never see a partial file
+            temp_path = file_path.with_name(f"{file_path.name}.part")
+            try:
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    await f.write(file_data)
+                os.replace(temp_path, file_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO local_files (file_id, path, size, sha256, mime_type)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (file_id, relative_path.as_posix(), len(file_data),
+                      hashlib.sha256(file_data).hexdigest(), mime_type))
+                conn.commit()
+
             # Return the file path for database storage
-            return str(file_path.relative_to(self.storage_dir))
-            
+            return relative_path.as_posix()
+
         except Exception as e:
             print(f"Error saving audio file locally: {e}")
             raise
-    
+
     def get_file_url(self, file_path: str) -> str:
         """Generate a URL for accessing the file"""
         # For Render, we'll serve files through the main app
         # In production, you'd want to set up proper file serving
         base_url = os.getenv('BASE_URL', 'https://chenaniah-bot.onrender.com')
         return f"{base_url}/audio_files/{file_path}"
-    
+
+    def get_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Look up a stored file in the index.
+
+        Files written before the index existed are indexed on first lookup.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM local_files WHERE path = ?', (file_path,))
+            row = cursor.fetchone()
+            if row:
+                return dict(row)
+
+        return self._index_existing(file_path)
+
+    def _index_existing(self, file_path: str) -> Optional[Dict[str, Any]]:
+        full_path = self.storage_dir / file_path
+        if not full_path.is_file():
+            return None
+
+        stat = full_path.stat()
+        info = {
+            'file_id': full_path.stem,
+            'path': Path(file_path).as_posix(),
+            'size': stat.st_size,
+            'sha256': None,
+            'mime_type': None,
+            # Same format and timezone (UTC) as CURRENT_TIMESTAMP
+            'created_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        if self.read_only:
+            # Still serve the file; the bot indexes it on its own next lookup
+            return info
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO local_files (file_id, path, size, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (info['file_id'], info['path'], info['size'], info['created_at']))
+            conn.commit()
+        return info
+
+    def rebuild_index(self) -> int:
+        """Index every file on disk that is missing from the index (one-off scan)"""
+        indexed = 0
+        for full_path in self.storage_dir.rglob('*'):
+            if not full_path.is_file() or full_path.suffix == '.part':
+                continue
+            file_path = full_path.relative_to(self.storage_dir).as_posix()
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1 FROM local_files WHERE path = ?', (file_path,))
+                if cursor.fetchone():
+                    continue
+            if self._index_existing(file_path):
+                indexed += 1
+        return indexed
+
+    async def read_file(self, file_path: str) -> bytes:
+        """Read a stored audio file, from its archive if it was packed"""
+        full_path = self.storage_dir / file_path
+        if not full_path.is_file():
+            info = self.get_file_info(file_path)
+            if info and info.get('archive'):
+                return await asyncio.to_thread(self._read_archived, info)
+
+        async with aiofiles.open(full_path, 'rb') as f:
+            return await f.read()
+
+    def exists(self, file_path: str) -> bool:
+        """Check whether a stored audio file exists (on disk or archived)"""
+        info = self.get_file_info(file_path)
+        if info and info.get('archive'):
+            return True
+        if info and not (self.storage_dir / file_path).is_file():
+            # Removed outside the service; drop the stale index entry
+            if not self.read_only:
+                self._forget(info['path'])
+            return False
+        return info is not None
+
+    def _forget(self, file_path: str) -> None:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT archive FROM local_files WHERE path = ?', (file_path,))
+            row = cursor.fetchone()
+            cursor.execute('DELETE FROM local_files WHERE path = ?', (file_path,))
+            archive = row[0] if row else None
+            if archive:
+                cursor.execute('SELECT 1 FROM local_files WHERE archive = ? LIMIT 1', (archive,))
+                if cursor.fetchone() is None:
+                    # Last live member gone, the whole archive can go
+                    (self.archive_dir / archive).unlink(missing_ok=True)
+            conn.commit()
+
+    def delete_file(self, file_path: str) -> int:
+        """Delete a stored audio file and return the number of bytes reclaimed"""
+        info = self.get_file_info(file_path)
+        if not info:
+            return 0
+        (self.storage_dir / file_path).unlink(missing_ok=True)
+        self._forget(info['path'])
+        return info['size']
+
     def get_file_size(self, file_path: str) -> int:
         """Get file size in bytes"""
-        full_path = self.storage_dir / file_path
-        return full_path.stat().st_size if full_path.exists() else 0
+        info = self.get_file_info(file_path)
+        return info['size'] if info else 0
+
+    def get_files_older_than(self, days: int) -> List[str]:
+        """Paths of files stored more than ``days`` days ago"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT path FROM local_files
+                WHERE created_at < datetime('now', ?)
+                ORDER BY created_at
+            ''', (f'-{int(days)} days',))
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_usage(self) -> Dict[str, int]:
+        """Bytes and file counts on disk and in archives"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    COALESCE(SUM(CASE WHEN archive IS NULL THEN size END), 0),
+                    COUNT(CASE WHEN archive IS NULL THEN 1 END),
+                    COALESCE(SUM(CASE WHEN archive IS NOT NULL THEN size END), 0),
+                    COUNT(CASE WHEN archive IS NOT NULL THEN 1 END)
+                FROM local_files
+            ''')
+            disk_bytes, disk_files, archived_bytes, archived_files = cursor.fetchone()
+            return {
+                'bytes': disk_bytes,
+                'files': disk_files,
+                'archived_bytes': archived_bytes,
+                'archived_files': archived_files,
+            }
+
+    def get_coldest_files(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Files still on disk, oldest first"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM local_files WHERE archive IS NULL
+                ORDER BY created_at LIMIT ?
+            ''', (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def count_coldest_files(self, total_bytes: int) -> int:
+        """How many of the oldest on-disk files add up to ``total_bytes``"""
+        if total_bytes <= 0:
+            return 0
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM (
+                    SELECT SUM(size) OVER (ORDER BY created_at, path) - size AS before
+                    FROM local_files WHERE archive IS NULL
+                ) WHERE before < ?
+            ''', (total_bytes,))
+            return cursor.fetchone()[0]
+
+    def archive_file(self, file_path: str) -> int:
+        """Pack a file into a zip archive and return the bytes freed"""
+        return self.archive_files([file_path])
+
+    def archive_files(self, file_paths: List[str]) -> int:
+        """Pack files into new zip archives, one per day, and return the bytes freed.
+
+        Archives are never modified once written: each batch goes to a temp
+        file that is fsynced, checked and renamed into place, and only then
+        are the originals removed. A crash mid-write leaves earlier archives
+        (and the originals) intact, and readers never see a partial zip.
+        """
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for file_path in file_paths:
+            info = self.get_file_info(file_path)
+            if not info or info.get('archive'):
+                continue
+            if not (self.storage_dir / info['path']).is_file():
+                self._forget(info['path'])
+                continue
+            by_day.setdefault(info['path'].split('/', 1)[0], []).append(info)
+
+        freed = 0
+        for day, infos in by_day.items():
+            archive = self._write_archive(day, infos)
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE local_files SET archive = ?, archived_at = CURRENT_TIMESTAMP
+                    WHERE path = ?
+                ''', [(archive, info['path']) for info in infos])
+                conn.commit()
+
+            for info in infos:
+                (self.storage_dir / info['path']).unlink(missing_ok=True)
+                freed += info['size']
+        return freed
+
+    def _write_archive(self, day: str, infos: List[Dict[str, Any]]) -> str:
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        archive = f"{day}-{uuid.uuid4().hex[:12]}.zip"
+        final_path = self.archive_dir / archive
+        temp_path = final_path.with_name(f"{archive}.part")
+        try:
+            with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for info in infos:
+                    zf.write(self.storage_dir / info['path'], arcname=info['path'])
+            with open(temp_path, 'rb') as f:
+                os.fsync(f.fileno())
+
+            # Read every member back before the originals are deleted
+            with zipfile.ZipFile(temp_path) as zf:
+                bad = zf.testzip()
+                if bad is not None or len(zf.namelist()) != len(infos):
+                    raise zipfile.BadZipFile(f"Archive {archive} failed verification ({bad})")
+
+            os.replace(temp_path, final_path)
+            directory = os.open(self.archive_dir, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        return archive
+
+    def _read_archived(self, info: Dict[str, Any]) -> bytes:
+        with zipfile.ZipFile(self.archive_dir / info['archive']) as zf:
+            return zf.read(info['path'])
+
+    def _extract_archived(self, info: Dict[str, Any], destination: Path) -> str:
+        with zipfile.ZipFile(self.archive_dir / info['archive']) as zf:
+            with zf.open(info['path']) as source, open(destination, 'wb') as f:
+                while True:
+                    chunk = source.read(64 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+        return Path(info['path']).suffix
+
+    def fetch_archived(self, file_path: str) -> Optional[Path]:
+        """Return a playable copy of an archived file via the disk cache.
+
+        Blocking; used by the web endpoints, which can't write to audio_files/.
+        """
+        info = self.get_file_info(file_path)
+        if not info or not info.get('archive'):
+            return None
+        return audio_cache.get_or_fetch(
+            'archive', info['path'], lambda path: self._extract_archived(info, path)
+        )
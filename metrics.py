@@ -0,0 +1,97 @@
+"""
+In-process registry of runtime metrics exposed on the /status endpoint
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_providers: Dict[str, Callable[[], Any]] = {}
+_lock = threading.Lock()
+_publishing = False
+
+
+def register(name: str, provider: Callable[[], Any]) -> None:
+    """Register a callable that returns a JSON-serialisable snapshot"""
+    with _lock:
+        _providers[name] = provider
+
+
+def unregister(name: str) -> None:
+    """Remove a previously registered provider"""
+    with _lock:
+        _providers.pop(name, None)
+
+
+def collect() -> Dict[str, Any]:
+    """Collect a snapshot from every registered provider"""
+    with _lock:
+        providers = dict(_providers)
+
+    snapshot = {}
+    for name, provider in providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.warning(f"Metrics provider {name} failed: {e}")
+            snapshot[name] = {'error': str(e)}
+    return snapshot
+
+
+def write_snapshot(path: str) -> None:
+    """Write the current metrics to ``path`` for other processes to read.
+
+    The web tier runs in separate gunicorn workers with an empty registry,
+    so the bot publishes its metrics to a shared file instead.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    payload = {
+        'published_at': time.time(),
+        'pid': os.getpid(),
+        'metrics': collect(),
+    }
+    fd, temp_path = tempfile.mkstemp(dir=directory or '.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f, default=str)
+        # Rename is atomic, so readers never see a half-written snapshot
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Read a snapshot written by write_snapshot, or None if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_publishing() -> bool:
+    """True in the process that publishes snapshots (the bot)"""
+    return _publishing
+
+
+async def publish_forever(path: str, interval: float) -> None:
+    """Background task: periodically write the metrics snapshot"""
+    global _publishing
+    _publishing = True
+    while True:
+        try:
+            await asyncio.to_thread(write_snapshot, path)
+        except Exception as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+        await asyncio.sleep(interval)
@@ -1,42 +1,106 @@
+"""
+Reviewer notifications, delivered from a durable queue.
+
+Callers only add a row to ``notification_queue``; the dispatcher task in
+the bot process sends it, so the submit path never waits on Telegram.
+Rows stay pending until Telegram accepts the message and are retried with
+exponential backoff (or after Telegram's Retry-After), so nothing is lost
+across restarts. Admin tools can queue notifications from another process
+and the bot delivers them on its next poll.
+
+During a burst of submissions, new-submission notifications for the same
+chat are collapsed into one digest message. Pacing is left to the shared
+bot's rate limiter (see ``telegram_rate_limit``): notifications queue
+behind applicant replies, and digests and summaries behind notifications.
+
+Reviewer emails (``EmailNotificationService``) use the same queue, with
+``channel = 'email'`` and the address in ``chat_id``.
+
+Every bot process runs the dispatchers, so each pass first claims its rows
+(``status = 'sending'``); a row is only delivered by the process that
+claimed it, and claims left by a process that died are released after
+``NOTIFICATION_CLAIM_TIMEOUT_MINUTES``.
+"""
+
 import asyncio
+import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from collections import defaultdict
+from email.message import EmailMessage
+from typing import Dict, Any, List, Optional, Tuple
+
+import aiosmtplib
 from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import metrics
+import telegram_client
 from config import Config
+from database import Database
+from telegram_rate_limit import PRIORITY_REVIEWER, PRIORITY_SUMMARY, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
+# Telegram rejects messages longer than 4096 characters
+DIGEST_MAX_ITEMS = 20
+
+
 class NotificationService:
-    def __init__(self):
-        self.bot = None
-        if Config.TELEGRAM_BOT_TOKEN:
-            self.bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+    def __init__(self, db: Database = None, bot: Bot = None):
+        self.db = db or Database()
+        self.bot = bot
+        if self.bot is None and Config.TELEGRAM_BOT_TOKEN:
+            # Same client and connection pool as the Application
+            self.bot = telegram_client.shared_bot()
+        self._wake = asyncio.Event()
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'digests': 0,
+            'retried': 0,
+            'failed': 0,
+        }
+        metrics.register('notifications', self.snapshot)
     
-    async def notify_reviewers_new_submission(self, submission_data: Dict[str, Any]) -> bool:
-        """Send notification to reviewers about new submission"""
-        if not self.bot or not Config.REVIEWER_TELEGRAM_CHAT_ID:
-            logger.warning("Notification service not configured - missing bot token or reviewer chat ID")
-            return False
+    async def enqueue(self, kind: str, payload: Dict[str, Any],
+                      chat_id: str = None) -> Optional[int]:
+        """Queue a notification for delivery; returns immediately"""
+        chat_id = chat_id or Config.REVIEWER_TELEGRAM_CHAT_ID
+        if not chat_id:
+            logger.warning("Notification service not configured - missing reviewer chat ID")
+            return None
         
-        try:
-            message = self._format_submission_notification(submission_data)
-            
-            await self.bot.send_message(
-                chat_id=Config.REVIEWER_TELEGRAM_CHAT_ID,
-                text=message,
-                parse_mode='Markdown'
-            )
-            
-            logger.info(f"Notification sent to reviewers for submission #{submission_data.get('id')}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}")
-            return False
+        notification_id = await self.db.enqueue_notification(
+            str(chat_id), kind, json.dumps(payload, default=str)
+        )
+        self.stats['queued'] += 1
+        self._wake.set()
+        return notification_id
+    
+    async def notify_reviewers_new_submission(self, submission_data: Dict[str, Any]) -> bool:
+        """Queue a notification to reviewers about a new submission"""
+        return await self.enqueue('new_submission', submission_data) is not None
+    
+    async def notify_reviewers_status_update(self, submission_id: int, status: str, 
+                                           reviewer_comments: str = None) -> bool:
+        """Queue a notification about a status update"""
+        return await self.enqueue('status_update', {
+            'id': submission_id,
+            'status': status,
+            'reviewer_comments': reviewer_comments,
+        }) is not None
+    
+    async def send_daily_summary(self, submissions_count: int, pending_count: int) -> bool:
+        """Queue the daily summary for reviewers"""
+        return await self.enqueue('daily_summary', {
+            'submissions_count': submissions_count,
+            'pending_count': pending_count,
+        }) is not None
     
     def _format_submission_notification(self, submission_data: Dict[str, Any]) -> str:
         """Format submission data into notification message"""
-        return f"""
+        message = f"""
 🔔 **New Worship Ministry Application**
 
 **Name:** {submission_data.get('name', 'N/A')}
@@ -44,78 +108,379 @@ class NotificationService:
 **Address:** {submission_data.get('address', 'N/A')}
 **Telegram:** @{submission_data.get('telegram_username', 'No username')}
 **Application ID:** #{submission_data.get('id', 'N/A')}
-**Worship Sample:** {submission_data.get('audio_drive_link', 'N/A')}
+**Worship Sample:** {submission_data.get('audio_link') or submission_data.get('audio_drive_link', 'N/A')}
 **Submitted:** {submission_data.get('submitted_at', 'N/A')}
-
-Please prayerfully review this application in the Google Sheet.
-        """
+"""
+        if submission_data.get('preview_link'):
+            message += f"**Preview ({Config.PREVIEW_SECONDS:.0f}s):** {submission_data['preview_link']}\n"
+            if submission_data.get('waveform'):
+                message += f"`{submission_data['waveform']}`\n"
+        message += "\nPlease prayerfully review this application in the Google Sheet."
+        return message
     
-    async def notify_reviewers_status_update(self, submission_id: int, status: str, 
-                                           reviewer_comments: str = None) -> bool:
-        """Send notification about status update"""
-        if not self.bot or not Config.REVIEWER_TELEGRAM_CHAT_ID:
-            return False
-        
-        try:
-            message = f"""
+    def _format_digest(self, submissions: List[Dict[str, Any]]) -> str:
+        """One message for a burst of new submissions"""
+        lines = [f"🔔 **{len(submissions)} New Worship Ministry Applications**", ""]
+        for submission in submissions:
+            link = (submission.get('preview_link') or submission.get('audio_link')
+                    or submission.get('audio_drive_link', ''))
+            lines.append(f"#{submission.get('id', 'N/A')} {submission.get('name', 'N/A')} - {link}")
+        lines.append("")
+        lines.append("Please prayerfully review these applications in the Google Sheet.")
+        return "\n".join(lines)
+    
+    def _format_status_update(self, payload: Dict[str, Any]) -> str:
+        message = f"""
 📝 **Application Status Updated**
 
-**Application ID:** #{submission_id}
-**New Status:** {status}
+**Application ID:** #{payload.get('id')}
+**New Status:** {payload.get('status')}
 """
-            if reviewer_comments:
-                message += f"**Comments:** {reviewer_comments}\n"
-            
-            await self.bot.send_message(
-                chat_id=Config.REVIEWER_TELEGRAM_CHAT_ID,
-                text=message,
-                parse_mode='Markdown'
-            )
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send status update notification: {e}")
-            return False
+        if payload.get('reviewer_comments'):
+            message += f"**Comments:** {payload['reviewer_comments']}\n"
+        return message
     
-    async def send_daily_summary(self, submissions_count: int, pending_count: int) -> bool:
-        """Send daily summary to reviewers"""
-        if not self.bot or not Config.REVIEWER_TELEGRAM_CHAT_ID:
-            return False
-        
-        try:
-            message = f"""
+    def _format_daily_summary(self, payload: Dict[str, Any]) -> str:
+        return f"""
 📊 **Daily Ministry Application Summary**
 
-**Total Applications Today:** {submissions_count}
-**Pending Review:** {pending_count}
+**Total Applications Today:** {payload.get('submissions_count')}
+**Pending Review:** {payload.get('pending_count')}
 
 Please review applications in the Google Sheet.
-            """
-            
-            await self.bot.send_message(
-                chat_id=Config.REVIEWER_TELEGRAM_CHAT_ID,
-                text=message,
-                parse_mode='Markdown'
-            )
-            
-            return True
-            
+        """
+    
+    def _format(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind == 'new_submission':
+            return self._format_submission_notification(payload)
+        if kind == 'status_update':
+            return self._format_status_update(payload)
+        if kind == 'daily_summary':
+            return self._format_daily_summary(payload)
+        return payload.get('text', '')
+    
+    @staticmethod
+    def _priority(kind: str, rows: List[Dict[str, Any]]) -> int:
+        if kind == 'daily_summary' or len(rows) > 1:
+            return PRIORITY_SUMMARY
+        return PRIORITY_REVIEWER
+    
+    async def _send(self, chat_id: str, text: str, priority: int = PRIORITY_REVIEWER) -> None:
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown',
+                                        rate_limit_args=priority)
+        except BadRequest as e:
+            # User-supplied names can break Markdown; send those as plain text
+            if "parse entities" not in str(e).lower():
+                raise
+            await self.bot.send_message(chat_id=chat_id, text=text, rate_limit_args=priority)
+    
+    async def _deliver(self, chat_id: str, rows: List[Dict[str, Any]], text: str) -> None:
+        ids = [row['id'] for row in rows]
+        try:
+            await self._send(chat_id, text, self._priority(rows[0]['kind'], rows))
+        except RetryAfter as e:
+            retry_after = retry_after_seconds(e)
+            # Telegram told us when to come back; that isn't a failed attempt
+            await self.db.reschedule_notifications(ids, retry_after, str(e), count_attempt=False)
+            self.stats['retried'] += len(ids)
+        except (BadRequest, Forbidden) as e:
+            logger.error(f"Notification to {chat_id} rejected: {e}")
+            await self.db.fail_notifications(ids, str(e))
+            self.stats['failed'] += len(ids)
         except Exception as e:
-            logger.error(f"Failed to send daily summary: {e}")
-            return False
+            attempts = max(row['attempts'] for row in rows) + 1
+            if attempts >= Config.NOTIFICATION_MAX_ATTEMPTS:
+                logger.error(f"Giving up on notification(s) {ids} after {attempts} attempts: {e}")
+                await self.db.fail_notifications(ids, str(e))
+                self.stats['failed'] += len(ids)
+            else:
+                delay = min(Config.NOTIFICATION_RETRY_BASE * 2 ** (attempts - 1),
+                            Config.NOTIFICATION_RETRY_MAX)
+                logger.warning(f"Notification(s) {ids} failed, retrying in {delay:.0f}s: {e}")
+                await self.db.reschedule_notifications(ids, delay, str(e))
+                self.stats['retried'] += len(ids)
+        else:
+            await self.db.mark_notifications_sent(ids)
+            self.stats['sent'] += len(ids)
+            logger.info(f"Sent notification(s) {ids} to {chat_id}")
+    
+    async def _dispatch_chat(self, chat_id: str, rows: List[Dict[str, Any]]) -> None:
+        submissions = [row for row in rows if row['kind'] == 'new_submission']
+        messages = []
+        if len(submissions) >= Config.NOTIFICATION_DIGEST_THRESHOLD:
+            for start in range(0, len(submissions), DIGEST_MAX_ITEMS):
+                batch = submissions[start:start + DIGEST_MAX_ITEMS]
+                payloads = [json.loads(row['payload']) for row in batch]
+                messages.append((batch, self._format_digest(payloads)))
+                self.stats['digests'] += 1
+            rows = [row for row in rows if row['kind'] != 'new_submission']
+        
+        for row in rows:
+            messages.append(([row], self._format(row['kind'], json.loads(row['payload']))))
+        
+        for batch, text in sorted(messages, key=lambda message: message[0][0]['id']):
+            await self._deliver(chat_id, batch, text)
+    
+    async def dispatch_once(self) -> int:
+        """Send every notification that is due, returning how many were handled"""
+        if not self.bot:
+            return 0
+        rows = await self.db.claim_due_notifications(
+            limit=Config.NOTIFICATION_BATCH_SIZE,
+            stale_minutes=Config.NOTIFICATION_CLAIM_TIMEOUT_MINUTES
+        )
+        by_chat = defaultdict(list)
+        for row in rows:
+            by_chat[row['chat_id']].append(row)
+        await asyncio.gather(*(self._dispatch_chat(chat_id, chat_rows)
+                               for chat_id, chat_rows in by_chat.items()))
+        return len(rows)
+    
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: deliver queued notifications"""
+        interval = interval or Config.NOTIFICATION_POLL_INTERVAL
+        if not self.bot:
+            return
+        while True:
+            try:
+                while await self.dispatch_once() >= Config.NOTIFICATION_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+            
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+                # Give a burst of submissions a moment to collect into a digest
+                await asyncio.sleep(Config.NOTIFICATION_DIGEST_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats)
 
 # Email notification service (optional)
 class EmailNotificationService:
-    def __init__(self):
-        self.smtp_server = None
-        self.smtp_port = 587
-        self.email = None
-        self.password = None
+    """Reviewer emails, delivered from the same queue (``channel = 'email'``).
+
+    One authenticated SMTP connection is kept open between sends and closed
+    after ``SMTP_IDLE_TIMEOUT`` seconds without use (servers drop idle
+    clients anyway); the next send reconnects. Emails are held in the queue
+    while the server rejects the SMTP credentials, and go out once they are
+    fixed.
+    """
+    
+    def __init__(self, db: Database = None):
+        self.db = db or Database()
+        self.recipient = Config.REVIEWER_EMAIL
+        self.enabled = bool(Config.SMTP_HOST and self.recipient)
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_used = 0.0
+        self._wake = asyncio.Event()
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'digests': 0,
+            'retried': 0,
+            'failed': 0,
+            'connections': 0,
+        }
+        metrics.register('email_notifications', self.snapshot)
+    
+    async def enqueue(self, kind: str, payload: Dict[str, Any],
+                      recipient: str = None) -> Optional[int]:
+        """Queue an email for delivery; returns immediately"""
+        recipient = recipient or self.recipient
+        if not (Config.SMTP_HOST and recipient):
+            return None
+        
+        notification_id = await self.db.enqueue_notification(
+            recipient, kind, json.dumps(payload, default=str), channel='email'
+        )
+        self.stats['queued'] += 1
+        self._wake.set()
+        return notification_id
     
     async def send_submission_notification(self, submission_data: Dict[str, Any]) -> bool:
-        """Send email notification about new submission"""
-        # This would require additional email configuration
-        # For now, just log the notification
-        logger.info(f"Email notification would be sent for submission #{submission_data.get('id')}")
-        return True
+        """Queue an email to reviewers about a new submission"""
+        return await self.enqueue('new_submission', submission_data) is not None
+    
+    def _format_submission(self, submission: Dict[str, Any]) -> Tuple[str, str]:
+        subject = f"New worship ministry application #{submission.get('id')}: {submission.get('name', 'N/A')}"
+        lines = [
+            f"Name: {submission.get('name', 'N/A')}",
+            f"Phone: {submission.get('phone', 'N/A')}",
+            f"Address: {submission.get('address', 'N/A')}",
+            f"Telegram: @{submission.get('telegram_username', 'No username')}",
+            f"Application ID: #{submission.get('id', 'N/A')}",
+            f"Worship sample: {submission.get('audio_link') or submission.get('audio_drive_link', 'N/A')}",
+        ]
+        if submission.get('preview_link'):
+            lines.append(f"Preview ({Config.PREVIEW_SECONDS:.0f}s): {submission['preview_link']}")
+        lines.append(f"Submitted: {submission.get('submitted_at', 'N/A')}")
+        lines += ["", "Please prayerfully review this application in the Google Sheet."]
+        return subject, "\n".join(lines)
+    
+    def _format_digest(self, submissions: List[Dict[str, Any]]) -> Tuple[str, str]:
+        subject = f"{len(submissions)} new worship ministry applications"
+        lines = []
+        for submission in submissions:
+            link = (submission.get('preview_link') or submission.get('audio_link')
+                    or submission.get('audio_drive_link', ''))
+            lines.append(f"#{submission.get('id', 'N/A')} {submission.get('name', 'N/A')}, "
+                         f"{submission.get('phone', 'N/A')} - {link}")
+        lines += ["", "Please prayerfully review these applications in the Google Sheet."]
+        return subject, "\n".join(lines)
+    
+    def _message(self, recipient: str, subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+        message['From'] = Config.SMTP_FROM or Config.SMTP_USERNAME or recipient
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        return message
+    
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and not self._smtp.is_connected:
+            self._smtp = None
+        if self._smtp is None:
+            # connect() also runs STARTTLS and AUTH when configured
+            smtp = aiosmtplib.SMTP(
+                hostname=Config.SMTP_HOST, port=Config.SMTP_PORT,
+                username=Config.SMTP_USERNAME or None, password=Config.SMTP_PASSWORD or None,
+                use_tls=Config.SMTP_USE_TLS, start_tls=Config.SMTP_STARTTLS,
+                timeout=Config.SMTP_TIMEOUT
+            )
+            await smtp.connect()
+            self._smtp = smtp
+            self.stats['connections'] += 1
+        return self._smtp
+    
+    async def close(self) -> None:
+        """Say goodbye to the SMTP server, if connected"""
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+    
+    async def _send(self, message: EmailMessage) -> None:
+        for attempt in range(2):
+            smtp = await self._connection()
+            try:
+                await smtp.send_message(message)
+                self._last_used = time.monotonic()
+                return
+            except aiosmtplib.SMTPServerDisconnected:
+                # The kept-open connection went stale; reconnect once
+                self._smtp = None
+                if attempt:
+                    raise
+    
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        if isinstance(error, aiosmtplib.SMTPAuthenticationError):
+            return False  # Fixed by configuration, not by dropping the email
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+            return True
+        return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+    
+    async def _deliver(self, recipient: str, rows: List[Dict[str, Any]],
+                       subject: str, body: str) -> None:
+        ids = [row['id'] for row in rows]
+        try:
+            await self._send(self._message(recipient, subject, body))
+        except Exception as e:
+            await self.close()
+            attempts = max(row['attempts'] for row in rows) + 1
+            if isinstance(e, aiosmtplib.SMTPAuthenticationError):
+                # Not the emails' fault: keep them queued, without using up
+                # attempts, until the SMTP credentials are fixed
+                logger.error(f"SMTP authentication failed, holding email(s) {ids}: {e}")
+                await self.db.reschedule_notifications(
+                    ids, Config.NOTIFICATION_RETRY_MAX, str(e), count_attempt=False
+                )
+                self.stats['retried'] += len(ids)
+            elif self._is_permanent(e) or attempts >= Config.NOTIFICATION_MAX_ATTEMPTS:
+                logger.error(f"Giving up on email(s) {ids} to {recipient}: {e}")
+                await self.db.fail_notifications(ids, str(e))
+                self.stats['failed'] += len(ids)
+            else:
+                delay = min(Config.NOTIFICATION_RETRY_BASE * 2 ** (attempts - 1),
+                            Config.NOTIFICATION_RETRY_MAX)
+                logger.warning(f"Email(s) {ids} failed, retrying in {delay:.0f}s: {e}")
+                await self.db.reschedule_notifications(ids, delay, str(e))
+                self.stats['retried'] += len(ids)
+        else:
+            await self.db.mark_notifications_sent(ids)
+            self.stats['sent'] += len(ids)
+            logger.info(f"Emailed notification(s) {ids} to {recipient}")
+    
+    async def dispatch_once(self) -> int:
+        """Send every email that is due, returning how many rows were handled"""
+        rows = await self.db.claim_due_notifications(
+            limit=Config.NOTIFICATION_BATCH_SIZE, channel='email',
+            stale_minutes=Config.NOTIFICATION_CLAIM_TIMEOUT_MINUTES
+        )
+        by_recipient = defaultdict(list)
+        for row in rows:
+            by_recipient[row['chat_id']].append(row)
+        
+        # One SMTP connection, so recipients are served one after another
+        for recipient, recipient_rows in by_recipient.items():
+            submissions = [row for row in recipient_rows if row['kind'] == 'new_submission']
+            if len(submissions) >= Config.NOTIFICATION_DIGEST_THRESHOLD:
+                for start in range(0, len(submissions), DIGEST_MAX_ITEMS):
+                    batch = submissions[start:start + DIGEST_MAX_ITEMS]
+                    subject, body = self._format_digest([json.loads(row['payload']) for row in batch])
+                    await self._deliver(recipient, batch, subject, body)
+                    self.stats['digests'] += 1
+                recipient_rows = [row for row in recipient_rows if row['kind'] != 'new_submission']
+            
+            for row in recipient_rows:
+                payload = json.loads(row['payload'])
+                if row['kind'] == 'new_submission':
+                    subject, body = self._format_submission(payload)
+                else:
+                    subject, body = payload.get('subject', 'Worship ministry notification'), payload.get('text', '')
+                await self._deliver(recipient, [row], subject, body)
+        return len(rows)
+    
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: deliver queued emails"""
+        interval = interval or Config.NOTIFICATION_POLL_INTERVAL
+        if not self.enabled:
+            return
+        try:
+            while True:
+                try:
+                    while await self.dispatch_once() >= Config.NOTIFICATION_BATCH_SIZE:
+                        pass
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Email dispatch failed: {e}")
+                
+                timeout = interval
+                if self._smtp is not None:
+                    idle = time.monotonic() - self._last_used
+                    if idle >= Config.SMTP_IDLE_TIMEOUT:
+                        await self.close()
+                    else:
+                        timeout = min(interval, Config.SMTP_IDLE_TIMEOUT - idle)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    # Give a burst of submissions a moment to collect into a digest
+                    await asyncio.sleep(Config.NOTIFICATION_DIGEST_WINDOW)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            await self.close()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {'enabled': self.enabled, 'connected': self._smtp is not None, **self.stats}
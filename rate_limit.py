@@ -0,0 +1,110 @@
+"""
+Token bucket primitives shared by the outbound rate limiters.
+
+Buckets are confined to the bot's event loop; other threads only read
+their snapshots.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """``rate`` tokens are added per second, up to ``capacity``"""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available; otherwise return the seconds to wait"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        self._refill(now)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """Return tokens that were acquired but not used"""
+        self._refill(time.monotonic())
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def penalize(self, seconds: float) -> None:
+        """Stop handing out tokens for a while (e.g. after a 429 Retry-After)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    @property
+    def available(self) -> float:
+        self._refill(time.monotonic())
+        return self._tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'available': round(self.available, 2),
+            'capacity': self.capacity,
+            'rate_per_second': self.rate,
+            'blocked_for': round(max(0.0, self._blocked_until - time.monotonic()), 2),
+        }
+
+
+class PriorityTokenBucket(TokenBucket):
+    """Token bucket whose waiters are served lowest priority number first"""
+
+    def __init__(self, rate: float, capacity: float):
+        super().__init__(rate, capacity)
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = 0, tokens: float = 1.0) -> float:
+        """Wait for tokens, returning how long the caller waited"""
+        if not self._waiters and self.try_acquire(tokens) == 0:
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waiter = [priority, next(self._sequence), loop.create_future()]
+        heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                waiter[2] = loop.create_future()
+                if self._waiters[0] is waiter:
+                    delay = self.try_acquire(tokens)
+                    if delay == 0:
+                        return loop.time() - started
+                    try:
+                        # A newly arrived higher-priority waiter wakes us early
+                        await asyncio.wait_for(waiter[2], delay)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await waiter[2]
+        finally:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._wake_head()
+
+    def _wake_head(self) -> None:
+        if self._waiters and not self._waiters[0][2].done():
+            self._waiters[0][2].set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot['queue_depth'] = self.queue_depth
+        return snapshot
@@ -7,7 +7,6 @@ import asyncio
 import logging
 import signal
 import sys
-import threading
 from pathlib import Path
 
 # Add current directory to Python path
@@ -38,7 +37,6 @@ class BotRunner:
     def __init__(self):
         self.bot = None
         self.running = False
-        self.health_server = None
     
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
@@ -75,26 +73,6 @@ class BotRunner:
         
         return True
     
-    def start_health_server(self):
-        """Start health check server for Render"""
-        try:
-            from health_check import app
-            import os
-            
-            port = int(os.getenv('PORT', 5000))
-            self.health_server = threading.Thread(
-                target=lambda: app.run(host='0.0.0.0', port=port, debug=False),
-                daemon=True
-            )
-            self.health_server.start()
-            logger.info(f"Health check server started on port {port}")
-            
-            # Audio files are served through the main health check app
-            logger.info("Audio files will be served through the main app")
-                
-        except Exception as e:
-            logger.warning(f"Could not start health server: {e}")
-
     def run(self):
         """Run the bot"""
         logger.info("Starting Vocalist Screening Bot...")
@@ -104,9 +82,6 @@ class BotRunner:
             logger.error("Configuration check failed. Exiting.")
             sys.exit(1)
         
-        # Start health check server for Render
-        self.start_health_server()
-        
         # Set up signal handlers
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
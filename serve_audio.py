@@ -3,9 +3,12 @@
 Simple HTTP server to serve audio files
 """
 
-from flask import Flask, send_file, abort
+from flask import Flask, abort
 import os
 from pathlib import Path
+from werkzeug.exceptions import HTTPException
+
+from audio_http import send_audio_file
 
 app = Flask(__name__)
 
@@ -24,13 +27,12 @@ def serve_audio(filename):
         if not file_path.exists():
             abort(404)
         
-        # Serve the file
-        return send_file(
-            file_path,
-            as_attachment=False,
-            mimetype='audio/mpeg'
-        )
+        # Serve the file with Range, ETag and long-lived cache headers
+        return send_audio_file(file_path, filename)
     
+    except HTTPException:
+        # 403/404 above and 304/416 from conditional handling
+        raise
     except Exception as e:
         print(f"Error serving file {filename}: {e}")
         abort(500)
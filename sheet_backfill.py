@@ -0,0 +1,111 @@
+"""
+Background worker that appends submissions missing from Google Sheets.
+
+Every submission starts with ``sheet_status = 'pending'``. The submit path
+tries to append the row straight away; if the Sheets circuit is open or
+the append fails, the row goes back to pending and this worker appends it
+once the circuit has closed again, so reviewers never lose an application.
+Both claim the row (``'appending'``) first, so it is appended only once.
+Once ``sheet_row`` is known the audio analyzer can write the quality score
+next to it.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+from circuit_breaker import CircuitBreaker
+from config import Config
+from database import Database
+from google_quota import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class SheetBackfill:
+    def __init__(self, db: Database, sheets_service, link_for: Callable[[str], str],
+                 sheets_breaker: Optional[CircuitBreaker] = None, previews=None,
+                 on_appended: Callable[[], None] = None, batch_size: int = None):
+        self.db = db
+        self.sheets_service = sheets_service
+        self.link_for = link_for
+        self.sheets_breaker = sheets_breaker
+        self.previews = previews
+        # Called after rows were appended (e.g. to wake the audio analyzer)
+        self.on_appended = on_appended
+        self.batch_size = batch_size or Config.SHEET_BACKFILL_BATCH_SIZE
+
+        self.stats = {
+            'appended': 0,
+            'failed': 0,
+            'last_run': None,
+            'last_error': None,
+        }
+        metrics.register('sheet_backfill', lambda: dict(self.stats))
+
+    async def _append(self, submission: Dict[str, Any]) -> None:
+        preview = None
+        if self.previews is not None:
+            preview = await self.previews.get(submission['audio_drive_link'])
+        kwargs = dict(
+            name=submission['name'],
+            address=submission['address'],
+            phone=submission['phone'],
+            telegram_username=submission['telegram_username'],
+            audio_link=self.link_for(submission['audio_drive_link']),
+            priority=PRIORITY_BACKGROUND,
+            preview_link=preview['link'] if preview else None,
+            submitted_at=submission['submitted_at'],
+            submission_id=submission['id']
+        )
+        if self.sheets_breaker:
+            sheet_row = await self.sheets_breaker.call(self.sheets_service.add_submission, **kwargs)
+        else:
+            sheet_row = await self.sheets_service.add_submission(**kwargs)
+        await self.db.set_submission_sheet_row(submission['id'], sheet_row)
+
+    async def run_once(self) -> int:
+        """Append one batch of pending submissions, returning how many succeeded"""
+        if self.sheets_breaker and self.sheets_breaker.state != CircuitBreaker.CLOSED:
+            return 0
+
+        await self.db.recover_stale_sheet_appends(Config.SHEET_APPEND_CLAIM_TIMEOUT_MINUTES)
+        pending = await self.db.get_sheet_pending_submissions(limit=self.batch_size)
+        self.stats['last_run'] = datetime.now().isoformat()
+        appended = 0
+        # One at a time, so the rows keep the submissions' order
+        for submission in pending:
+            # The submit path may be appending it right now
+            if not await self.db.claim_sheet_append(submission['id']):
+                continue
+            try:
+                await self._append(submission)
+            except Exception as e:
+                await self.db.release_sheet_append(submission['id'])
+                logger.warning(f"Could not append submission #{submission['id']} to the sheet: {e}")
+                self.stats['failed'] += 1
+                self.stats['last_error'] = str(e)
+                break
+            appended += 1
+            self.stats['appended'] += 1
+            logger.info(f"Appended submission #{submission['id']} to the sheet")
+
+        if appended and self.on_appended:
+            self.on_appended()
+        return appended
+
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: append pending submissions on a fixed interval"""
+        interval = interval or Config.SHEET_BACKFILL_INTERVAL
+        while True:
+            try:
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Sheet backfill pass failed: {e}")
+                self.stats['last_error'] = str(e)
+            await asyncio.sleep(interval)
@@ -0,0 +1,158 @@
+"""
+Disk quota for locally stored audio.
+
+Tracks the bytes held in ``audio_files/`` through the local file index. When
+usage crosses the high watermark, cold files are moved off the disk until it
+drops below the low watermark:
+
+1. ``drive``: drain the reconciler so local-fallback audio moves to
+   Google Drive (only while the Drive circuit is closed)
+2. ``archive``: pack the oldest remaining files into zip archives (one
+   per day per batch, never modified afterwards)
+
+``LOCAL_STORAGE_ARCHIVE_MODE`` picks ``drive``, ``archive`` or ``auto``
+(Drive first, then archives).
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import metrics
+from circuit_breaker import CircuitBreaker
+from config import Config
+from local_storage_service import LocalStorageService
+
+logger = logging.getLogger(__name__)
+
+
+class StorageQuotaManager:
+    def __init__(self, local_storage: LocalStorageService, reconciler=None,
+                 drive_breaker: Optional[CircuitBreaker] = None,
+                 max_bytes: int = None, high_watermark: float = None,
+                 low_watermark: float = None, mode: str = None):
+        self.local_storage = local_storage
+        self.reconciler = reconciler
+        self.drive_breaker = drive_breaker
+        self.max_bytes = max_bytes or Config.LOCAL_STORAGE_MAX_MB * 1024 * 1024
+        self.high_watermark = high_watermark or Config.LOCAL_STORAGE_HIGH_WATERMARK
+        self.low_watermark = low_watermark or Config.LOCAL_STORAGE_LOW_WATERMARK
+        self.mode = mode or Config.LOCAL_STORAGE_ARCHIVE_MODE
+        self._lock = asyncio.Lock()
+        self.stats = {
+            'runs': 0,
+            'drive_migrated': 0,
+            'archived_files': 0,
+            'archived_bytes': 0,
+            'last_run': None,
+            'last_error': None,
+        }
+
+        metrics.register('storage_quota', self.snapshot)
+
+    @property
+    def high_bytes(self) -> int:
+        return int(self.max_bytes * self.high_watermark)
+
+    @property
+    def low_bytes(self) -> int:
+        return int(self.max_bytes * self.low_watermark)
+
+    def backlog(self) -> Dict[str, int]:
+        """Cold files that have to leave the disk to get back under the low watermark"""
+        excess = max(self.local_storage.get_usage()['bytes'] - self.low_bytes, 0)
+        return {'bytes': excess, 'files': self.local_storage.count_coldest_files(excess)}
+
+    def _drive_available(self) -> bool:
+        if self.mode not in ('drive', 'auto') or self.reconciler is None:
+            return False
+        return self.drive_breaker is None or self.drive_breaker.state == CircuitBreaker.CLOSED
+
+    async def enforce(self) -> Dict[str, int]:
+        """Bring usage under the low watermark if it is above the high one"""
+        async with self._lock:
+            result = {'drive_migrated': 0, 'archived_files': 0, 'archived_bytes': 0}
+            self.stats['runs'] += 1
+            self.stats['last_run'] = datetime.now().isoformat()
+
+            usage = self.local_storage.get_usage()['bytes']
+            if usage <= self.high_bytes:
+                return result
+
+            logger.warning(
+                f"Local audio storage at {usage / 1024 / 1024:.1f} MB "
+                f"(high watermark {self.high_bytes / 1024 / 1024:.1f} MB), archiving cold files"
+            )
+
+            if self._drive_available():
+                while usage > self.low_bytes:
+                    migrated = await self.reconciler.run_once()
+                    result['drive_migrated'] += migrated
+                    usage = self.local_storage.get_usage()['bytes']
+                    if migrated < self.reconciler.batch_size:
+                        break
+
+            if self.mode in ('archive', 'auto'):
+                usage = await self._archive_cold_files(usage, result)
+
+            self.stats['drive_migrated'] += result['drive_migrated']
+            self.stats['archived_files'] += result['archived_files']
+            self.stats['archived_bytes'] += result['archived_bytes']
+            if usage > self.high_bytes:
+                logger.error(
+                    f"Local audio storage still at {usage / 1024 / 1024:.1f} MB after archiving"
+                )
+            return result
+
+    async def _archive_cold_files(self, usage: int, result: Dict[str, int]) -> int:
+        while usage > self.low_bytes:
+            cold = self.local_storage.get_coldest_files(limit=20)
+            if not cold:
+                break
+            # Only as many of them as it takes to get under the low watermark
+            batch = []
+            planned = usage
+            for info in cold:
+                batch.append(info['path'])
+                planned -= info['size']
+                if planned <= self.low_bytes:
+                    break
+            try:
+                freed = await asyncio.to_thread(self.local_storage.archive_files, batch)
+            except Exception as e:
+                logger.error(f"Could not archive {len(batch)} file(s): {e}")
+                self.stats['last_error'] = str(e)
+                return usage
+            if not freed:
+                break
+            result['archived_files'] += len(batch)
+            result['archived_bytes'] += freed
+            usage -= freed
+        return usage
+
+    async def run_forever(self, interval: float = None) -> None:
+        """Background task: check the quota periodically"""
+        interval = interval or Config.STORAGE_QUOTA_INTERVAL
+        while True:
+            try:
+                await self.enforce()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Storage quota check failed: {e}")
+                self.stats['last_error'] = str(e)
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> Dict[str, Any]:
+        usage = self.local_storage.get_usage()
+        return {
+            **usage,
+            'max_bytes': self.max_bytes,
+            'used_ratio': round(usage['bytes'] / self.max_bytes, 3) if self.max_bytes else None,
+            'high_watermark': self.high_watermark,
+            'low_watermark': self.low_watermark,
+            'mode': self.mode,
+            'backlog': self.backlog(),
+            **self.stats,
+        }
@@ -0,0 +1,32 @@
+"""
+Helpers for the audio references stored in ``audio_drive_link``.
+
+Depending on where the audio was stored the reference is:
+
+* a Google Drive file ID (no prefix, never contains '/')
+* a local storage path relative to ``audio_files/`` (contains '/')
+* ``tg:<file_id>`` for audio kept in the Telegram storage channel
+* ``db:<object_id>`` for audio kept in the SQLite audio database
+"""
+
+TELEGRAM_PREFIX = 'tg:'
+DATABASE_PREFIX = 'db:'
+
+
+def storage_type_for(ref: str) -> str:
+    """Work out which backend a stored audio reference belongs to"""
+    if ref.startswith(TELEGRAM_PREFIX):
+        return 'telegram'
+    if ref.startswith(DATABASE_PREFIX):
+        return 'database'
+    if '/' in ref:
+        return 'local'
+    return 'google_drive'
+
+
+def strip_prefix(ref: str) -> str:
+    """Return the backend-specific ID of a stored audio reference"""
+    for prefix in (TELEGRAM_PREFIX, DATABASE_PREFIX):
+        if ref.startswith(prefix):
+            return ref[len(prefix):]
+    return ref
@@ -1,15 +1,34 @@
 import asyncio
+import hashlib
 import logging
 from datetime import datetime
 from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes, CallbackQueryHandler
 from telegram.constants import ParseMode
 
+import metrics
+import telegram_client
+from audio_analyzer import AudioAnalyzer
+from audio_dedup import AudioDeduplicator, HashingBuffer
+from audio_pipeline import AudioPipeline, extension_for
+from audio_preview import PreviewService, sparkline
+from audio_reconciler import AudioReconciler
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 from config import Config
+from daily_summary import DailySummary
 from database import Database
+from database_storage_service import DatabaseStorageService
+from google_quota import is_service_failure
 from google_services import GoogleDriveService, GoogleSheetsService
 from local_storage_service import LocalStorageService
+from notification_service import EmailNotificationService, NotificationService
+from sheet_backfill import SheetBackfill
+from storage_quota import StorageQuotaManager
+from storage_refs import DATABASE_PREFIX, TELEGRAM_PREFIX, storage_type_for, strip_prefix
+from telegram_storage_service import TelegramStorageService
+from user_throttle import UserThrottle
+from web_server import WebServer
 
 # Configure logging
 logging.basicConfig(
@@ -21,16 +40,89 @@ logger = logging.getLogger(__name__)
 class VocalistScreeningBot:
     def __init__(self):
         self.db = Database()
+        # One Bot API client (and connection pool) for the Application and
+        # every service that talks to Telegram
+        bot = telegram_client.shared_bot() if Config.TELEGRAM_BOT_TOKEN else None
         self.drive_service = GoogleDriveService()
         self.sheets_service = GoogleSheetsService()
         self.local_storage = LocalStorageService()
+        self.telegram_storage = TelegramStorageService(bot=bot)
+        self.database_storage = None
+        if Config.AUDIO_STORAGE_BACKEND == 'database':
+            self.database_storage = DatabaseStorageService()
+        self.drive_breaker = CircuitBreaker(
+            'google_drive',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            is_failure=is_service_failure
+        )
+        self.sheets_breaker = CircuitBreaker(
+            'google_sheets',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            is_failure=is_service_failure
+        )
+        self.dedup = AudioDeduplicator(
+            self.db, self.drive_service, self.local_storage,
+            drive_breaker=self.drive_breaker, database_storage=self.database_storage
+        )
+        self.reconciler = AudioReconciler(
+            self.db, self.drive_service, self.sheets_service, self.local_storage,
+            drive_breaker=self.drive_breaker, sheets_breaker=self.sheets_breaker
+        )
+        self.audio_pipeline = AudioPipeline()
+        self.notifications = NotificationService(self.db, bot=bot)
+        self.email_notifications = EmailNotificationService(self.db)
+        self.daily_summary = DailySummary(self.db, self.notifications)
+        self.user_throttle = UserThrottle()
+        self.previews = PreviewService(
+            self.db, self.audio_pipeline,
+            store=lambda data, mime_type: self._store_audio(data, 'clip', mime_type, kind='preview'),
+            link_for=self._audio_view_link
+        )
+        self.audio_analyzer = AudioAnalyzer(
+            self.db, self.sheets_service, self.audio_pipeline,
+            local_storage=self.local_storage,
+            drive_service=self.drive_service,
+            telegram_storage=self.telegram_storage,
+            database_storage=self.database_storage,
+            sheets_breaker=self.sheets_breaker,
+            previews=self.previews,
+            link_for=self._audio_view_link
+        )
+        self.sheet_backfill = SheetBackfill(
+            self.db, self.sheets_service, self._audio_view_link,
+            sheets_breaker=self.sheets_breaker, previews=self.previews,
+            on_appended=self.audio_analyzer.wake
+        )
+        self.storage_quota = StorageQuotaManager(
+            self.local_storage, reconciler=self.reconciler, drive_breaker=self.drive_breaker
+        )
+        self.web_server = WebServer(
+            drive_service=self.drive_service,
+            telegram_storage=self.telegram_storage,
+            database_storage=self.database_storage,
+            local_storage=self.local_storage,
+            db=self.db
+        )
         self.application = None
+        self._background_tasks = []
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         user = update.effective_user
         user_id = user.id
         
+        # Don't pull the data out from under a submit that is still running;
+        # one stuck for longer than SUBMITTING_TIMEOUT_MINUTES is recovered
+        user_data = await self.db.get_user_state(user_id)
+        if user_data and user_data.get('state') == 'submitting':
+            if not await self.db.recover_stale_submitting(user_id, Config.SUBMITTING_TIMEOUT_MINUTES):
+                await update.message.reply_text(
+                    "⏳ Your application is still being submitted. Check /status in a moment."
+                )
+                return
+        
         # Reset any existing state
         await self.db.reset_user_state(user_id)
         
@@ -138,32 +230,49 @@ Please send me your **full name**:
             # Show processing message
             processing_msg = await update.message.reply_text("🔄 Processing your worship song...")
             
-            # Get file from Telegram
-            file = await context.bot.get_file(audio.file_id)
-            file_data = await file.download_as_bytearray()
+            # Reuse audio we already stored for this Telegram file (e.g. after
+            # "Try Again"), otherwise download it, hashing as it streams in,
+            # and reuse any stored copy with identical content
+            file_id = None
+            stored = await self.dedup.find_by_telegram_id(audio.file_unique_id)
+            if stored:
+                file_id = stored['storage_ref']
+            elif self.telegram_storage.enabled:
+                # Keep the audio in the Telegram storage channel: one API call,
+                # no download or upload; it is fetched lazily when played
+                try:
+                    telegram_file_id = await self.telegram_storage.forward_audio(
+                        update.message.chat_id, update.message.message_id
+                    )
+                    file_id = f"{TELEGRAM_PREFIX}{telegram_file_id}"
+                except Exception as e:
+                    logger.warning(f"Telegram storage failed, uploading instead: {e}")
             
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            username = user_data.get('username', 'user')
-            filename = f"worship_sample_{username}_{timestamp}.mp3"
+            if file_id is None:
+                file = await context.bot.get_file(audio.file_id)
+                buffer = HashingBuffer()
+                await file.download_to_memory(buffer)
+                file_data = buffer.getvalue()
+                content_md5 = buffer.md5
+                stored = await self.dedup.find_by_hash(content_md5, audio.file_unique_id)
+                
+                if stored:
+                    file_id = stored['storage_ref']
+                else:
+                    # Optionally transcode to compact Opus in the worker pool
+                    processed = await self.audio_pipeline.normalize(file_data, audio.mime_type)
+                    file_id, storage_type = await self._store_audio(
+                        processed.data, user_data.get('username', 'user'), processed.mime_type
+                    )
+                    await self.dedup.remember(
+                        content_md5, file_id, storage_type, len(processed.data),
+                        processed.mime_type, audio.file_unique_id,
+                        stored_md5=hashlib.md5(processed.data).hexdigest()
+                    )
+                    # Encode the reviewers' preview clip while the user confirms
+                    self.previews.create_from_bytes(file_id, processed.data, processed.extension)
             
-            # Try Google Drive first, fallback to local storage
-            try:
-                file_id = await self.drive_service.upload_audio_file(
-                    file_data, filename, audio.mime_type or 'audio/mpeg'
-                )
-                # Create a viewable link for display
-                audio_view_link = f"https://drive.google.com/file/d/{file_id}/view"
-                storage_type = "google_drive"
-            except Exception as drive_error:
-                logger.warning(f"Google Drive upload failed, using local storage: {drive_error}")
-                # Fallback to local storage
-                file_id = await self.local_storage.upload_audio_file(
-                    file_data, filename, audio.mime_type or 'audio/mpeg'
-                )
-                # Create a local file URL
-                audio_view_link = self.local_storage.get_file_url(file_id)
-                storage_type = "local"
+            audio_view_link = self._audio_view_link(file_id)
             
             # Update user state with audio info
             await self.db.update_user_state(
@@ -227,6 +336,54 @@ Please send me your **full name**:
                 reply_markup=reply_markup
             )
     
+    async def _store_audio(self, file_data: bytes, username: str,
+                           mime_type: Optional[str], kind: str = 'worship_sample') -> tuple:
+        """Store new audio, returning its file ID / path and storage type"""
+        # Generate filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{kind}_{username}_{timestamp}.{extension_for(mime_type)}"
+        
+        # Drive-free mode: keep the audio in the SQLite audio database
+        if self.database_storage:
+            try:
+                object_id = await self.database_storage.upload_audio_file(
+                    file_data, filename, mime_type or 'audio/mpeg'
+                )
+                return f"{DATABASE_PREFIX}{object_id}", "database"
+            except Exception as db_error:
+                logger.warning(f"Audio database write failed, using local storage: {db_error}")
+                file_id = await self.local_storage.upload_audio_file(
+                    file_data, filename, mime_type or 'audio/mpeg'
+                )
+                return file_id, "local"
+        
+        # Try Google Drive first, fallback to local storage.
+        # An open circuit skips Drive entirely so we don't wait for a timeout.
+        try:
+            file_id = await self.drive_breaker.call(
+                self.drive_service.upload_audio_file,
+                file_data, filename, mime_type or 'audio/mpeg'
+            )
+            return file_id, "google_drive"
+        except Exception as drive_error:
+            logger.warning(f"Google Drive upload failed, using local storage: {drive_error}")
+            # Fallback to local storage
+            file_id = await self.local_storage.upload_audio_file(
+                file_data, filename, mime_type or 'audio/mpeg'
+            )
+            return file_id, "local"
+    
+    def _audio_view_link(self, file_id: str) -> str:
+        """Create a link for previewing stored audio"""
+        storage_type = storage_type_for(file_id)
+        if storage_type == "telegram":
+            return self.telegram_storage.get_file_url(strip_prefix(file_id))
+        if storage_type == "database":
+            return DatabaseStorageService.get_file_url(strip_prefix(file_id))
+        if storage_type == "local":
+            return self.local_storage.get_file_url(file_id)
+        return self.drive_service.get_file_url(file_id)
+    
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle callback queries from inline keyboards"""
         query = update.callback_query
@@ -244,12 +401,21 @@ Please send me your **full name**:
     
     async def submit_application(self, query, user_id: int):
         """Submit the application"""
+        # Both taps of a double tap (and a redelivered callback) come from the
+        # same confirmation message; only the first one gets past this
+        message_id = query.message.message_id if query.message else query.id
+        dedupe_key = f"submit:{user_id}:{message_id}"
+        if not await self.db.claim_update(dedupe_key, user_id):
+            logger.info(f"Ignoring duplicate submit from user {user_id}")
+            return
+        
+        submission_id = None
         try:
-            # Get user data
-            user_data = await self.db.get_user_state(user_id)
-            if not user_data or user_data.get('state') != 'ready_to_submit':
+            # Only one submit can move the user out of ready_to_submit
+            if not await self.db.transition_user_state(user_id, 'ready_to_submit', 'submitting'):
                 await query.edit_message_text("❌ No application data found. Please start over with /start")
                 return
+            user_data = await self.db.get_user_state(user_id)
             
             # Create submission in database
             submission_id = await self.db.create_submission(
@@ -261,15 +427,41 @@ Please send me your **full name**:
                 audio_drive_link=user_data.get('audio_drive_link')
             )
             
-            # Add to Google Sheets
-            await self.sheets_service.add_submission(
-                name=user_data.get('name'),
-                address=user_data.get('address'),
-                phone=user_data.get('phone'),
-                telegram_username=user_data.get('username'),
-                audio_link=user_data.get('audio_drive_link')
+            # Hold the sheet append while waiting for the preview, so
+            # SheetBackfill doesn't append the same submission meanwhile
+            sheet_claimed = await self.db.claim_sheet_append(submission_id)
+            
+            # Short preview clip for reviewers, if it has been encoded by now
+            preview = await self.previews.wait(
+                user_data.get('audio_drive_link'), Config.PREVIEW_WAIT_SECONDS
             )
             
+            # Add to Google Sheets (the database row is the source of truth,
+            # so a degraded Sheets API must not fail the submission)
+            if sheet_claimed:
+                try:
+                    sheet_row = await self.sheets_breaker.call(
+                        self.sheets_service.add_submission,
+                        name=user_data.get('name'),
+                        address=user_data.get('address'),
+                        phone=user_data.get('phone'),
+                        telegram_username=user_data.get('username'),
+                        audio_link=self._audio_view_link(user_data.get('audio_drive_link')),
+                        preview_link=preview['link'] if preview else None,
+                        submission_id=submission_id
+                    )
+                    await self.db.set_submission_sheet_row(submission_id, sheet_row)
+                except CircuitOpenError as e:
+                    # Back to sheet_status='pending'; SheetBackfill appends it later
+                    await self.db.release_sheet_append(submission_id)
+                    logger.warning(f"Deferring Google Sheets for submission #{submission_id}: {e}")
+                except Exception as e:
+                    await self.db.release_sheet_append(submission_id)
+                    logger.error(f"Google Sheets append failed for submission #{submission_id}, will retry: {e}")
+            
+            # Score the recording for reviewers in the background
+            self.audio_analyzer.wake()
+            
             # Reset user state
             await self.db.reset_user_state(user_id)
             
@@ -285,10 +477,17 @@ Please send me your **full name**:
             )
             
             # Notify reviewers (if configured)
-            await self.notify_reviewers(user_data, submission_id)
+            await self.notify_reviewers(user_data, submission_id, preview)
             
         except Exception as e:
             logger.error(f"Error submitting application: {e}")
+            if submission_id is None:
+                # Nothing was recorded, so the user can submit again
+                await self.db.transition_user_state(user_id, 'submitting', 'ready_to_submit')
+                await self.db.release_update(dedupe_key)
+            else:
+                # The submission is recorded; don't leave the user in 'submitting'
+                await self.db.reset_user_state(user_id)
             await query.edit_message_text(
                 "❌ Sorry, there was an error submitting your application. Please try again later."
             )
@@ -311,28 +510,30 @@ Please send me your **full name**:
             parse_mode=ParseMode.MARKDOWN
         )
     
-    async def notify_reviewers(self, user_data: dict, submission_id: int):
+    async def notify_reviewers(self, user_data: dict, submission_id: int,
+                               preview: Optional[dict] = None):
         """Notify reviewers about new submission"""
-        if not Config.REVIEWER_TELEGRAM_CHAT_ID:
+        if not (Config.REVIEWER_TELEGRAM_CHAT_ID or self.email_notifications.enabled):
             return
         
         try:
-            notification_text = f"""
-🔔 **New Vocalist Submission**
-
-**Name:** {user_data.get('name')}
-**Phone:** {user_data.get('phone')}
-**Address:** {user_data.get('address')}
-**Telegram:** @{user_data.get('username', 'No username')}
-**Submission ID:** #{submission_id}
-**Audio Link:** {user_data.get('audio_drive_link')}
-
-Check the Google Sheet for full details.
-            """
-            
-            # This would require the bot to send to reviewers
-            # For now, we'll just log it
-            logger.info(f"New submission notification: {notification_text}")
+            # Queued durably and sent by the notification dispatchers, so the
+            # submit path never waits on Telegram or SMTP
+            submission = {
+                'id': submission_id,
+                'name': user_data.get('name'),
+                'phone': user_data.get('phone'),
+                'address': user_data.get('address'),
+                'telegram_username': user_data.get('username') or 'No username',
+                'audio_link': self._audio_view_link(user_data.get('audio_drive_link')),
+                'preview_link': preview['link'] if preview else None,
+                'waveform': sparkline(preview['waveform']) if preview else None,
+                'submitted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            if Config.REVIEWER_TELEGRAM_CHAT_ID:
+                await self.notifications.notify_reviewers_new_submission(submission)
+            if self.email_notifications.enabled:
+                await self.email_notifications.send_submission_notification(submission)
             
         except Exception as e:
             logger.error(f"Error notifying reviewers: {e}")
@@ -377,17 +578,31 @@ Need help? Contact our ministry team.
             return
         
         state = user_data.get('state', 'idle')
+        if state == 'submitting' and await self.db.recover_stale_submitting(
+                user_id, Config.SUBMITTING_TIMEOUT_MINUTES):
+            await update.message.reply_text(
+                "⚠️ Your last submission didn't finish. If you didn't get an application ID, "
+                "send /start to apply again."
+            )
+            return
+        
         status_messages = {
             'collecting_name': "⏳ Please provide your full name",
             'collecting_address': "⏳ Please provide your address",
             'collecting_phone': "⏳ Please provide your phone number",
             'collecting_audio': "⏳ Please upload your worship song sample",
-            'ready_to_submit': "✅ Ready to submit - click the button in your last message"
+            'ready_to_submit': "✅ Ready to submit - click the button in your last message",
+            'submitting': "⏳ Your application is being submitted"
         }
         
         message = status_messages.get(state, "Unknown status")
         await update.message.reply_text(message)
     
+    async def purge_bookkeeping(self, context: ContextTypes.DEFAULT_TYPE):
+        """Daily job: drop old dedupe keys, job claims and finished notifications"""
+        deleted = await self.db.purge_bookkeeping(Config.BOOKKEEPING_RETENTION_DAYS)
+        logger.info(f"Purged bookkeeping rows older than {Config.BOOKKEEPING_RETENTION_DAYS} days: {deleted}")
+    
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle errors"""
         logger.error(f"Update {update} caused error {context.error}")
@@ -398,17 +613,76 @@ Need help? Contact our ministry team.
                 "❌ Sorry, something went wrong. Please try again or contact support if the issue persists."
             )
 
+    async def post_init(self, application: Application):
+        """Start background tasks once the application is initialized"""
+        # Lets worker threads (audio endpoints) use the shared bot client
+        telegram_client.bind_loop(asyncio.get_running_loop())
+        interval = Config.CIRCUIT_BREAKER_PROBE_INTERVAL
+        self._background_tasks = [
+            asyncio.create_task(
+                self.drive_breaker.probe_forever(self.drive_service.check_connection, interval)
+            ),
+            asyncio.create_task(
+                self.sheets_breaker.probe_forever(self.sheets_service.check_connection, interval)
+            ),
+            asyncio.create_task(self.reconciler.run_forever()),
+            asyncio.create_task(self.sheet_backfill.run_forever()),
+            asyncio.create_task(self.storage_quota.run_forever()),
+            asyncio.create_task(self.audio_analyzer.run_forever()),
+            asyncio.create_task(self.notifications.run_forever()),
+            asyncio.create_task(self.email_notifications.run_forever()),
+            asyncio.create_task(metrics.publish_forever(
+                Config.METRICS_SNAPSHOT_PATH, Config.METRICS_SNAPSHOT_INTERVAL
+            )),
+        ]
+        
+        # Health checks and audio are served from this same event loop,
+        # unless a separate web tier (wsgi.py under gunicorn) handles them
+        if Config.WEB_SERVER_ENABLED:
+            try:
+                await self.web_server.start()
+            except OSError as e:
+                logger.warning(f"Could not start web server: {e}")
+    
+    async def post_shutdown(self, application: Application):
+        """Stop background tasks"""
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks = []
+        telegram_client.bind_loop(None)
+        await self.web_server.stop()
+        self.audio_pipeline.shutdown()
+
     def run(self):
         """Run the bot"""
         if not Config.TELEGRAM_BOT_TOKEN:
             raise ValueError("TELEGRAM_BOT_TOKEN not found in environment variables")
         
         # Create application
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        self.application = (
+            Application.builder()
+            .bot(telegram_client.shared_bot())
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
         
         # Add error handler
         self.application.add_error_handler(self.error_handler)
         
+        # Scheduled jobs
+        self.daily_summary.schedule(self.application.job_queue)
+        if self.application.job_queue:
+            self.application.job_queue.run_repeating(
+                self.purge_bookkeeping, interval=24 * 60 * 60, first=5 * 60,
+                name='purge_bookkeeping'
+            )
+        
+        # Drop floods from a single user before any handler touches the DB
+        if Config.USER_THROTTLE_ENABLED:
+            self.application.add_handler(TypeHandler(Update, self.user_throttle.handle), group=-1)
+        
         # Add handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
@@ -0,0 +1,130 @@
+"""
+The process-wide Telegram Bot API client.
+
+Every component that talks to Telegram - the ``Application`` that polls
+for updates, ``NotificationService`` and ``TelegramStorageService`` -
+uses the one ``ExtBot`` returned by ``shared_bot()``, so there is a single
+httpx connection pool for API calls (plus the one-connection pool python-
+telegram-bot keeps for long polling ``getUpdates``), initialised once by
+``Application.initialize()``, and a single outbound rate limiter (see
+``telegram_rate_limit``).
+
+Blocking code running in worker threads (the audio endpoints) reaches the
+same client through ``run_sync`` once the bot's event loop is bound.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+import metrics
+from config import Config
+from telegram_rate_limit import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class CountingHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest that reports how often pooled connections are reused"""
+
+    def __init__(self, name: str, connection_pool_size: int, **kwargs):
+        self.name = name
+        self.pool_size = connection_pool_size
+        self.requests = 0
+        self.errors = 0
+        self.connections_opened = 0
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        client = super()._build_client()
+        client.event_hooks['request'].append(self._attach_trace)
+        return client
+
+    async def _attach_trace(self, request: httpx.Request) -> None:
+        request.extensions['trace'] = self._trace
+
+    async def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        if event == 'connection.connect_tcp.complete':
+            self.connections_opened += 1
+
+    async def do_request(self, *args, **kwargs):
+        self.requests += 1
+        try:
+            return await super().do_request(*args, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'connections_opened': self.connections_opened,
+            'reused_requests': max(0, self.requests - self.connections_opened),
+            'pool_size': self.pool_size,
+        }
+
+
+_lock = threading.Lock()
+_bot: Optional[ExtBot] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def shared_bot() -> ExtBot:
+    """The bot client shared by every Telegram component in this process"""
+    global _bot
+    with _lock:
+        if _bot is None:
+            api_request = CountingHTTPXRequest(
+                'api', Config.TELEGRAM_HTTP_POOL_SIZE,
+                read_timeout=Config.TELEGRAM_HTTP_TIMEOUT,
+                media_write_timeout=Config.TELEGRAM_HTTP_TIMEOUT
+            )
+            # Long polling holds its connection open, so it gets its own
+            updates_request = CountingHTTPXRequest('get_updates', 1)
+            _bot = ExtBot(
+                token=Config.TELEGRAM_BOT_TOKEN,
+                request=api_request,
+                get_updates_request=updates_request,
+                rate_limiter=TelegramRateLimiter()
+            )
+            metrics.register('telegram_http_pool', lambda: {
+                'api': api_request.snapshot(),
+                'get_updates': updates_request.snapshot(),
+            })
+        return _bot
+
+
+def bind_loop(loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Record the event loop the shared bot runs on (None when it stops)"""
+    global _loop
+    _loop = loop
+
+
+def can_run_sync() -> bool:
+    """Whether ``run_sync`` can be used from the current thread.
+
+    False when no loop is bound (e.g. in the gunicorn web tier) or when
+    called from the bot's loop itself, where blocking would deadlock;
+    callers then fall back to their own transport.
+    """
+    loop = _loop
+    if loop is None or not loop.is_running():
+        return False
+    try:
+        return asyncio.get_running_loop() is not loop
+    except RuntimeError:
+        return True
+
+
+def run_sync(coro, timeout: float = None):
+    """Run a Bot API coroutine from a worker thread on the bot's event loop"""
+    if not can_run_sync():
+        coro.close()
+        raise RuntimeError("The shared Telegram bot is not running on an event loop")
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result(timeout)
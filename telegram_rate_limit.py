@@ -0,0 +1,202 @@
+"""
+Central scheduler for outbound Telegram Bot API calls.
+
+Plugged into the shared ``ExtBot`` as its rate limiter, so every call -
+``reply_text``, ``edit_text``, reviewer notifications - waits for a token
+from the bucket of its chat and from the bot-wide bucket, sized for
+Telegram's flood limits (about 1 message per second per private chat, 20
+per minute per group and 30 per second overall).
+
+Waiters are served by priority class: applicant replies first, then
+reviewer notifications, then summaries. Pass a class through the
+``rate_limit_args`` of any bot method, e.g.
+``bot.send_message(..., rate_limit_args=PRIORITY_SUMMARY)``; calls without
+one count as applicant replies.
+
+Edits of the same message are coalesced: if a newer edit is queued before
+an older one gets its turn, only the newer one is sent and both callers
+receive its result.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+from config import Config
+from rate_limit import PriorityTokenBucket
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_APPLICANT = 0
+PRIORITY_REVIEWER = 10
+PRIORITY_SUMMARY = 20
+
+# Edits where only the latest version of a message matters
+_COALESCED_ENDPOINTS = {'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup'}
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TelegramRateLimiter(BaseRateLimiter[int]):
+    def __init__(self):
+        self.global_bucket = PriorityTokenBucket(
+            Config.TELEGRAM_GLOBAL_RATE, Config.TELEGRAM_GLOBAL_RATE
+        )
+        self._chat_buckets: Dict[str, PriorityTokenBucket] = {}
+        # Edit queued for each message, and which newer edit replaced an older one
+        self._latest_edits: Dict[Tuple, asyncio.Future] = {}
+        self._superseded_by: Dict[asyncio.Future, asyncio.Future] = {}
+        self.stats = {
+            'requests': 0,
+            'coalesced': 0,
+            'retry_after': 0,
+            'waited_seconds': 0.0,
+        }
+        metrics.register('telegram_rate_limit', self.snapshot)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def _is_group(chat_id) -> bool:
+        # Group and channel IDs are negative; @usernames only address channels
+        try:
+            return int(chat_id) < 0
+        except (TypeError, ValueError):
+            return True
+
+    def _chat_bucket(self, chat_id) -> PriorityTokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            if len(self._chat_buckets) >= 1000:
+                self._prune_idle_buckets()
+            if self._is_group(chat_id):
+                bucket = PriorityTokenBucket(
+                    Config.TELEGRAM_GROUP_MESSAGES_PER_MINUTE / 60.0,
+                    Config.TELEGRAM_GROUP_BURST
+                )
+            else:
+                bucket = PriorityTokenBucket(Config.TELEGRAM_CHAT_RATE, Config.TELEGRAM_CHAT_BURST)
+            self._chat_buckets[key] = bucket
+        return bucket
+
+    def _prune_idle_buckets(self) -> None:
+        # A full bucket with nobody waiting is the same as a new one
+        for key, bucket in list(self._chat_buckets.items()):
+            if not bucket.queue_depth and bucket.available >= bucket.capacity:
+                del self._chat_buckets[key]
+
+    @staticmethod
+    def _coalesce_key(endpoint: str, data: Dict[str, Any]) -> Optional[Tuple]:
+        if endpoint not in _COALESCED_ENDPOINTS:
+            return None
+        if data.get('inline_message_id'):
+            return (endpoint, data['inline_message_id'])
+        if data.get('chat_id') is not None and data.get('message_id') is not None:
+            return (endpoint, str(data['chat_id']), data['message_id'])
+        return None
+
+    async def _acquire(self, chat_id, priority: int) -> None:
+        waited = 0.0
+        if chat_id is not None:
+            waited += await self._chat_bucket(chat_id).acquire(priority)
+        waited += await self.global_bucket.acquire(priority)
+        self.stats['waited_seconds'] += waited
+
+    async def process_request(self, callback, args, kwargs, endpoint: str,
+                              data: Dict[str, Any], rate_limit_args: Optional[int]):
+        priority = PRIORITY_APPLICANT if rate_limit_args is None else rate_limit_args
+        chat_id = data.get('chat_id')
+        self.stats['requests'] += 1
+
+        key = self._coalesce_key(endpoint, data)
+        own = None
+        if key is not None:
+            own = asyncio.get_running_loop().create_future()
+            previous = self._latest_edits.get(key)
+            if previous is not None:
+                self._superseded_by[previous] = own
+            self._latest_edits[key] = own
+
+        try:
+            result = await self._run(callback, args, kwargs, chat_id, priority, own)
+        except asyncio.CancelledError:
+            if own is not None:
+                own.cancel()
+            raise
+        except Exception as e:
+            if own is not None and not own.done():
+                own.set_exception(e)
+                own.exception()  # Nobody may be waiting for it; don't log it twice
+            raise
+        else:
+            if own is not None and not own.done():
+                own.set_result(result)
+            return result
+        finally:
+            if own is not None:
+                self._superseded_by.pop(own, None)
+                if self._latest_edits.get(key) is own:
+                    del self._latest_edits[key]
+
+    async def _run(self, callback, args, kwargs, chat_id, priority: int,
+                   own: Optional[asyncio.Future]):
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+
+            newer = self._superseded_by.get(own) if own is not None else None
+            if newer is not None:
+                # A newer edit of this message is queued; send only that one
+                self.stats['coalesced'] += 1
+                self.global_bucket.refund()
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).refund()
+                try:
+                    return await asyncio.shield(newer)
+                except asyncio.CancelledError:
+                    if not newer.cancelled():
+                        raise
+                    # The newer edit was abandoned; send this one after all
+                    self._superseded_by.pop(own, None)
+                    continue
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.stats['retry_after'] += 1
+                delay = retry_after_seconds(e)
+                # Hold back everything for this chat (or the whole bot)
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+                bucket.penalize(delay)
+                # Only applicant replies are retried here; background senders
+                # such as the notification queue reschedule on their own
+                attempt += 1
+                if priority > PRIORITY_APPLICANT or attempt > Config.TELEGRAM_MAX_RETRIES:
+                    raise
+                logger.warning(f"Telegram flood limit hit, retrying in {delay:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'waited_seconds': round(self.stats['waited_seconds'], 2),
+            'global': self.global_bucket.snapshot(),
+            'chats': len(self._chat_buckets),
+            'queued': self.global_bucket.queue_depth + sum(
+                bucket.queue_depth for bucket in self._chat_buckets.values()
+            ),
+            'pending_edits': len(self._latest_edits),
+        }
@@ -1,40 +1,139 @@
+import io
+import logging
 import os
-from typing import Optional
+from pathlib import Path
+
+import requests
 from telegram import Bot
+
+import telegram_client
 from config import Config
+from disk_cache import audio_cache
+
+logger = logging.getLogger(__name__)
+
+# Downloads outside the bot process (the gunicorn web tier) share one pool
+_session = requests.Session()
 
 class TelegramStorageService:
-    def __init__(self):
-        self.bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
-    
-    async def upload_audio_file(self, file_data: bytes, filename: str, 
+    """Keep audio in a private Telegram channel and fetch it only when played.
+
+    Forwarding the applicant's message to the storage channel costs a single
+    Bot API call and gives us a durable file_id. The audio is downloaded
+    lazily, the first time a reviewer opens it, and kept in the shared
+    disk cache.
+    """
+
+    def __init__(self, bot: Bot = None):
+        # Defaults to the process-wide client shared with the Application
+        self._bot = bot
+        self.storage_chat_id = Config.TELEGRAM_STORAGE_CHAT_ID
+
+    @property
+    def bot(self) -> Bot:
+        if self._bot is None:
+            self._bot = telegram_client.shared_bot()
+        return self._bot
+
+    @property
+    def enabled(self) -> bool:
+        return bool(
+            Config.AUDIO_STORAGE_BACKEND == 'telegram'
+            and Config.TELEGRAM_BOT_TOKEN and self.storage_chat_id
+        )
+
+    async def _ensure_initialized(self):
+        # A no-op once the Application has initialized the shared bot
+        await self.bot.initialize()
+
+    @staticmethod
+    def _file_id_of(message) -> str:
+        media = message.voice or message.audio or message.document
+        if not media:
+            raise ValueError("Storage channel message has no audio attached")
+        return media.file_id
+
+    async def forward_audio(self, from_chat_id: int, message_id: int) -> str:
+        """Forward an applicant's audio message to the storage channel and return its file_id"""
+        try:
+            await self._ensure_initialized()
+            message = await self.bot.forward_message(
+                chat_id=self.storage_chat_id,
+                from_chat_id=from_chat_id,
+                message_id=message_id,
+                disable_notification=True
+            )
+            return self._file_id_of(message)
+
+        except Exception as e:
+            logger.error(f"Error forwarding audio to storage channel: {e}")
+            raise
+
+    async def upload_audio_file(self, file_data: bytes, filename: str,
                               mime_type: str = 'audio/mpeg') -> str:
-        """Upload audio file using Telegram's file storage"""
+        """Upload audio bytes to the storage channel and return the file_id"""
         try:
-            # Create a temporary file
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                temp_file.write(file_data)
-                temp_file_path = temp_file.name
-            
-            # Upload to Telegram as a document
-            with open(temp_file_path, 'rb') as file:
-                # Send to a private channel or use the bot's own chat
-                # For this example, we'll use the bot's get_file method
-                # In practice, you'd send to a private channel and get the file_id
-                pass
-            
-            # Clean up temp file
-            os.unlink(temp_file_path)
-            
-            # Return a Telegram file ID or URL
-            return f"telegram_file_{filename}"
-            
+            await self._ensure_initialized()
+            message = await self.bot.send_audio(
+                chat_id=self.storage_chat_id,
+                audio=io.BytesIO(file_data),
+                filename=filename,
+                disable_notification=True
+            )
+            return self._file_id_of(message)
+
         except Exception as e:
-            print(f"Error uploading to Telegram: {e}")
+            logger.error(f"Error uploading to Telegram: {e}")
             raise
-    
+
     def get_file_url(self, file_id: str) -> str:
-        """Generate a URL for accessing the file via Telegram"""
-        # This would be a Telegram file URL
-        return f"https://api.telegram.org/file/bot{Config.TELEGRAM_BOT_TOKEN}/{file_id}"
+        """Generate a URL for playing the file through our own server.
+
+        Telegram's file URLs embed the bot token, so they must never be shared.
+        """
+        base_url = os.getenv('BASE_URL', 'https://chenaniah-bot.onrender.com')
+        return f"{base_url}/audio/telegram/{file_id}"
+
+    def fetch_audio(self, file_id: str) -> Path:
+        """Return a local copy of the audio, downloading it on first access.
+
+        This is synchronous so the web endpoints can call it from their
+        worker threads without needing the bot's event loop.
+        """
+        return audio_cache.get_or_fetch(
+            'telegram', file_id, lambda path: self._download(file_id, path)
+        )
+
+    async def _download_with_bot(self, file_id: str, destination: Path) -> str:
+        await self._ensure_initialized()
+        file = await self.bot.get_file(file_id)
+        await file.download_to_drive(destination)
+        return os.path.splitext(file.file_path)[1] or '.mp3'
+
+    def _download(self, file_id: str, destination: Path) -> str:
+        """Download a file from Telegram and return its extension"""
+        if telegram_client.can_run_sync():
+            # In the bot process: reuse the shared bot's connection pool
+            extension = telegram_client.run_sync(
+                self._download_with_bot(file_id, destination), timeout=120
+            )
+            logger.info(f"Fetched Telegram audio {file_id[:16]}... ({destination.stat().st_size} bytes)")
+            return extension
+
+        api_url = f"https://api.telegram.org/bot{Config.TELEGRAM_BOT_TOKEN}"
+        response = _session.get(f"{api_url}/getFile", params={'file_id': file_id}, timeout=30)
+        response.raise_for_status()
+        file_path = response.json()['result']['file_path']
+
+        with _session.get(
+            f"https://api.telegram.org/file/bot{Config.TELEGRAM_BOT_TOKEN}/{file_path}",
+            stream=True, timeout=60
+        ) as download:
+            download.raise_for_status()
+            with open(destination, 'wb') as f:
+                for chunk in download.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+
+        logger.info(f"Fetched Telegram audio {file_id[:16]}... ({destination.stat().st_size} bytes)")
+        # Keep Telegram's extension (.oga for voice notes) for MIME detection
+        return os.path.splitext(file_path)[1] or '.mp3'
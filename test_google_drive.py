@@ -3,6 +3,7 @@
 Test script to help fix Google Drive permissions
 """
 
+import asyncio
 import os
 from google_services import GoogleDriveService
 from config import Config
@@ -30,7 +31,7 @@ def test_google_drive():
             print(f"🔍 Testing access to folder: {folder_id}")
             try:
                 # Check if it's a shared drive
-                is_shared_drive = drive_service._is_shared_drive(folder_id)
+                is_shared_drive = asyncio.run(drive_service._is_shared_drive(folder_id))
                 print(f"📁 Folder type: {'✅ Shared Drive' if is_shared_drive else '❌ Regular Folder'}")
                 
                 if not is_shared_drive:
@@ -0,0 +1,26 @@
+import pytest
+
+from database import Database
+
+
+class FakeClock:
+    """Stand-in for the ``time`` module whose monotonic clock only moves when told"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / 'bot.db'))
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import adaptive_limiter
+from adaptive_limiter import AdaptiveConcurrencyLimiter
+
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    monkeypatch.setattr(adaptive_limiter, 'time', clock)
+    return AdaptiveConcurrencyLimiter('test', initial_limit=8, min_limit=1, max_limit=16,
+                                      latency_tolerance=2.0, backoff_ratio=0.5)
+
+
+def test_overload_halves_the_limit(limiter):
+    limiter._update(0.1, overloaded=False)
+    limiter._update(0.1, overloaded=True)
+    assert limiter.limit == 4
+
+
+def test_only_one_cut_per_round_trip(limiter, clock):
+    limiter._update(0.1, overloaded=False)
+    limiter._update(0.1, overloaded=True)
+    clock.advance(0.05)
+    limiter._update(0.1, overloaded=True)
+    assert limiter.limit == 4
+    clock.advance(0.1)
+    limiter._update(0.1, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_latency_spike_counts_as_overload(limiter):
+    limiter._update(0.1, overloaded=False)
+    limiter._update(0.15, overloaded=False)
+    assert limiter.limit == 8
+    limiter._update(0.5, overloaded=False)
+    assert limiter.limit == 4
+
+
+def test_limit_never_drops_below_minimum(limiter, clock):
+    for _ in range(10):
+        clock.advance(1.0)
+        limiter._update(0.1, overloaded=True)
+    assert limiter.limit == 1
+
+
+def test_overloaded_calls_do_not_move_the_baseline(limiter):
+    limiter._update(0.1, overloaded=False)
+    limiter._update(5.0, overloaded=True)
+    assert limiter.snapshot()['latency_ewma_ms'] == pytest.approx(100.0)
+
+
+def test_grows_only_while_the_limit_holds_callers_back():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter('grow', initial_limit=1, max_limit=4)
+        async with limiter.acquire():
+            pass
+        after_saturated = limiter.limit
+        # One call in flight under a limit of 2: not limit-bound, no growth
+        async with limiter.acquire():
+            pass
+        return after_saturated, limiter.limit
+
+    assert asyncio.run(scenario()) == (2, 2)
+
+
+def test_acquire_never_exceeds_the_limit():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter('cap', initial_limit=2, max_limit=2)
+        in_flight = peak = 0
+
+        async def call():
+            nonlocal in_flight, peak
+            async with limiter.acquire():
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, limiter.snapshot()['in_flight']
+
+    assert asyncio.run(scenario()) == (2, 0)
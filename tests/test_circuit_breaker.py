@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class NotFound(Exception):
+    pass
+
+
+def make_breaker(reset_timeout=60.0):
+    return CircuitBreaker('test', failure_threshold=3, reset_timeout=reset_timeout,
+                          is_failure=lambda error: not isinstance(error, NotFound))
+
+
+async def fail(error):
+    raise error
+
+
+async def succeed():
+    return 'ok'
+
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_failure(RuntimeError('down'))
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(RuntimeError('down'))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['total_rejected'] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_rejects_while_open():
+    breaker = make_breaker()
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            asyncio.run(breaker.call(fail, RuntimeError('down')))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(succeed))
+
+
+def test_errors_that_prove_reachability_do_not_count():
+    breaker = make_breaker()
+    for _ in range(5):
+        with pytest.raises(NotFound):
+            asyncio.run(breaker.call(fail, NotFound()))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert asyncio.run(breaker.call(succeed)) == 'ok'
+
+
+def test_probe_only_after_reset_timeout():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert not breaker._begin_probe()
+
+    breaker.reset_timeout = 0
+    assert breaker._begin_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Half-open still rejects callers; only the probe talks to the dependency
+    assert not breaker.allow_request()
+
+
+def test_failed_probe_reopens_and_successful_probe_closes():
+    breaker = make_breaker(reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker._begin_probe()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker._begin_probe()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_forever_closes_the_circuit():
+    async def scenario():
+        breaker = make_breaker(reset_timeout=0)
+        for _ in range(3):
+            breaker.record_failure()
+        probes = []
+
+        async def probe():
+            probes.append(len(probes))
+            if len(probes) == 1:
+                raise RuntimeError('still down')
+
+        task = asyncio.create_task(breaker.probe_forever(probe, interval=0.001))
+        for _ in range(200):
+            if breaker.state == CircuitBreaker.CLOSED:
+                break
+            await asyncio.sleep(0.001)
+        task.cancel()
+        return breaker.state, len(probes)
+
+    state, probes = asyncio.run(scenario())
+    assert state == CircuitBreaker.CLOSED
+    assert probes == 2
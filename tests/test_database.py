@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def submit(db, user_id=1):
+    return run(db.create_submission(user_id, 'Name', 'Address', '+100', 'user', 'tg:file'))
+
+
+def test_claim_update_is_first_come_only(db):
+    assert run(db.claim_update('message:1:10', user_id=1))
+    assert not run(db.claim_update('message:1:10', user_id=1))
+    assert run(db.claim_update('message:1:11', user_id=1))
+
+
+def test_released_update_can_be_claimed_again(db):
+    run(db.claim_update('callback:abc'))
+    run(db.release_update('callback:abc'))
+    assert run(db.claim_update('callback:abc'))
+
+
+def test_transition_user_state_requires_the_expected_state(db):
+    run(db.update_user_state(1, state='confirming'))
+    assert run(db.transition_user_state(1, 'confirming', 'submitting'))
+    # The second of two concurrent confirms loses
+    assert not run(db.transition_user_state(1, 'confirming', 'submitting'))
+    assert run(db.get_user_state(1))['state'] == 'submitting'
+
+
+def test_transition_user_state_for_unknown_user(db):
+    assert not run(db.transition_user_state(99, 'idle', 'waiting_name'))
+
+
+def test_rollups_follow_inserts_status_changes_and_deletes(db):
+    first = submit(db)
+    second = submit(db)
+    assert run(db.get_rollup_counts()) == {'pending': 2}
+
+    run(db.update_submission_status(first, 'approved', 'ok'))
+    assert run(db.get_rollup_counts()) == {'pending': 1, 'approved': 1}
+
+    # Re-saving the same status must not count twice
+    run(db.update_submission_status(first, 'approved', 'still ok'))
+    assert run(db.get_rollup_counts()) == {'pending': 1, 'approved': 1}
+
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute('DELETE FROM submissions WHERE id = ?', (second,))
+    assert run(db.get_rollup_counts()) == {'approved': 1}
+
+
+def test_rollups_by_day(db):
+    submission_id = submit(db)
+    day = run(db.get_submission(submission_id))['submitted_at'][:10]
+    assert run(db.get_rollup_counts(day)) == {'pending': 1}
+    assert run(db.get_rollup_counts('2000-01-01')) == {}
+
+
+def test_sheet_append_is_claimed_once(db):
+    submission_id = submit(db)
+    assert run(db.claim_sheet_append(submission_id))
+    assert not run(db.claim_sheet_append(submission_id))
+
+    run(db.release_sheet_append(submission_id))
+    assert run(db.claim_sheet_append(submission_id))
+    run(db.set_submission_sheet_row(submission_id, 7))
+    assert not run(db.claim_sheet_append(submission_id))
+
+
+def test_due_notifications_are_claimed_by_one_dispatcher(db):
+    ids = [run(db.enqueue_notification('42', 'status', '{}')) for _ in range(3)]
+    first = run(db.claim_due_notifications(limit=2))
+    second = run(db.claim_due_notifications(limit=2))
+    assert [row['id'] for row in first] == ids[:2]
+    assert [row['id'] for row in second] == ids[2:]
+    assert run(db.claim_due_notifications()) == []
+
+    run(db.reschedule_notifications([ids[0]], 0, 'timeout'))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE notification_queue SET next_attempt_at = datetime('now', '-1 seconds')")
+    assert [row['id'] for row in run(db.claim_due_notifications())] == [ids[0]]
+
+
+def test_purge_bookkeeping_keeps_recent_and_pending_rows(db):
+    run(db.claim_update('old'))
+    run(db.claim_update('new'))
+    sent, pending = (run(db.enqueue_notification('42', 'status', '{}')) for _ in range(2))
+    run(db.mark_notifications_sent([sent]))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE processed_updates SET created_at = datetime('now', '-40 days') "
+                     "WHERE key = 'old'")
+        conn.execute("UPDATE notification_queue SET created_at = datetime('now', '-40 days'), "
+                     "sent_at = datetime('now', '-40 days')")
+
+    assert run(db.purge_bookkeeping(30)) == {
+        'processed_updates': 1, 'job_runs': 0, 'notification_queue': 1,
+    }
+    assert run(db.claim_update('new')) is False
+    assert [row['id'] for row in run(db.claim_due_notifications())] == [pending]
@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from database_storage_service import DatabaseStorageService
+
+DATA = bytes(range(256)) * 2  # 512 bytes, no two neighbouring slices alike
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = DatabaseStorageService(str(tmp_path / 'audio.db'))
+    # Small chunks so a few hundred bytes span many of them
+    storage.CHUNK_SIZE = 100
+    storage.IO_SLICE = 32
+    return storage
+
+
+@pytest.fixture
+def object_id(storage):
+    return storage.store_stream(io.BytesIO(DATA), len(DATA), 'voice.ogg', 'audio/ogg')
+
+
+def test_stored_object_metadata(storage, object_id):
+    audio = storage.get_object(object_id)
+    assert audio['size'] == len(DATA)
+    assert audio['mime_type'] == 'audio/ogg'
+
+
+@pytest.mark.parametrize('start, end', [
+    (0, None),      # whole object
+    (0, 99),        # exactly the first chunk
+    (99, 100),      # last byte of one chunk, first of the next
+    (100, 199),     # exactly one inner chunk
+    (50, 350),      # spans several chunks
+    (95, 105),      # straddles a boundary inside one slice
+    (500, 511),     # tail of the short last chunk
+    (511, 511),     # single last byte
+    (0, 0),         # single first byte
+])
+def test_iter_range_matches_slice(storage, object_id, start, end):
+    expected = DATA[start:None if end is None else end + 1]
+    assert b''.join(storage.iter_range(object_id, start, end)) == expected
+
+
+def test_iter_range_clamps_end_to_size(storage, object_id):
+    assert b''.join(storage.iter_range(object_id, 480, 10_000)) == DATA[480:]
+
+
+def test_iter_range_yields_bounded_slices_within_chunks(storage, object_id):
+    slices = list(storage.iter_range(object_id, 90, 230))
+    assert all(0 < len(piece) <= storage.IO_SLICE for piece in slices)
+    # No slice crosses a chunk boundary
+    assert [len(piece) for piece in slices] == [10, 32, 32, 32, 4, 31]
+
+
+def test_iter_range_unknown_object(storage):
+    with pytest.raises(FileNotFoundError):
+        list(storage.iter_range('missing'))
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import PriorityTokenBucket, TokenBucket
+
+
+@pytest.fixture
+def bucket(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return TokenBucket(rate=2.0, capacity=3.0)
+
+
+def test_burst_up_to_capacity_then_wait(bucket):
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+
+def test_refills_at_rate_without_exceeding_capacity(bucket, clock):
+    for _ in range(3):
+        bucket.try_acquire()
+    clock.advance(1.0)
+    assert bucket.available == pytest.approx(2.0)
+    clock.advance(60.0)
+    assert bucket.available == pytest.approx(3.0)
+
+
+def test_multi_token_wait(bucket):
+    bucket.try_acquire(3.0)
+    assert bucket.try_acquire(2.0) == pytest.approx(1.0)
+
+
+def test_refund_is_capped_at_capacity(bucket):
+    bucket.try_acquire()
+    bucket.refund(5.0)
+    assert bucket.available == pytest.approx(3.0)
+
+
+def test_penalize_blocks_even_with_tokens(bucket, clock):
+    bucket.penalize(10.0)
+    assert bucket.try_acquire() == pytest.approx(10.0)
+    # A shorter penalty never shortens a running one
+    bucket.penalize(1.0)
+    clock.advance(4.0)
+    assert bucket.try_acquire() == pytest.approx(6.0)
+    clock.advance(6.0)
+    assert bucket.try_acquire() == 0.0
+
+
+def test_priority_waiters_are_served_lowest_number_first():
+    async def scenario():
+        bucket = PriorityTokenBucket(rate=50.0, capacity=1.0)
+        assert await bucket.acquire() == 0.0
+        order = []
+
+        async def take(priority, name):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        background = asyncio.create_task(take(10, 'background'))
+        await asyncio.sleep(0)
+        user = asyncio.create_task(take(0, 'user'))
+        await asyncio.gather(background, user)
+        return order, bucket.queue_depth
+
+    order, depth = asyncio.run(scenario())
+    assert order == ['user', 'background']
+    assert depth == 0
+
+
+def test_priority_bucket_does_not_queue_when_tokens_are_free():
+    async def scenario():
+        bucket = PriorityTokenBucket(rate=1.0, capacity=2.0)
+        return [await bucket.acquire(), await bucket.acquire()]
+
+    assert asyncio.run(scenario()) == [0.0, 0.0]
@@ -0,0 +1,96 @@
+"""
+Per-user anti-flood throttling of incoming messages.
+
+Registered as a ``TypeHandler`` in handler group -1, so it sees every
+update before the conversation handlers and runs before any database
+read, write or audio download. Each user has an in-memory token bucket;
+a message that finds it empty is dropped with ``ApplicationHandlerStop``.
+Audio costs more than text since it leads to a download and storage.
+
+Excess updates are dropped rather than deferred: updates are processed
+one at a time, so waiting here would hold up every other user too. The
+user is told to slow down once per burst.
+"""
+
+import logging
+from typing import Any, Dict, Set
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+import metrics
+from config import Config
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Idle buckets are dropped once this many users are tracked
+MAX_TRACKED_USERS = 10000
+
+
+class UserThrottle:
+    def __init__(self, rate: float = None, burst: float = None, audio_cost: float = None):
+        self.rate = rate or Config.USER_THROTTLE_RATE
+        self.burst = burst or Config.USER_THROTTLE_BURST
+        self.audio_cost = audio_cost or Config.USER_THROTTLE_AUDIO_COST
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._warned: Set[int] = set()
+        self.stats = {
+            'allowed': 0,
+            'dropped': 0,
+            'warnings': 0,
+        }
+        metrics.register('user_throttle', self.snapshot)
+
+    def _bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_USERS:
+                self._prune()
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _prune(self) -> None:
+        # A full bucket behaves exactly like a new one
+        for user_id, bucket in list(self._buckets.items()):
+            if bucket.available >= bucket.capacity:
+                del self._buckets[user_id]
+                self._warned.discard(user_id)
+
+    def allow(self, user_id: int, cost: float = 1.0) -> bool:
+        """Take ``cost`` tokens from the user's bucket if they are available"""
+        if self._bucket(user_id).try_acquire(min(cost, self.burst)) == 0:
+            self.stats['allowed'] += 1
+            self._warned.discard(user_id)
+            return True
+        self.stats['dropped'] += 1
+        return False
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Group -1 handler: stop processing of messages from flooding users"""
+        message = update.message
+        user = update.effective_user
+        if message is None or user is None:
+            return
+
+        cost = self.audio_cost if (message.audio or message.voice) else 1.0
+        if self.allow(user.id, cost):
+            return
+
+        if user.id not in self._warned:
+            self._warned.add(user.id)
+            self.stats['warnings'] += 1
+            logger.warning(f"Throttling messages from user {user.id}")
+            await message.reply_text(
+                "⏳ You're sending messages too quickly. Please wait a moment and try again."
+            )
+        raise ApplicationHandlerStop
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'tracked_users': len(self._buckets),
+            'throttled_users': len(self._warned),
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+        }
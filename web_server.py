@@ -0,0 +1,238 @@
+"""
+Async HTTP server for health checks and audio playback.
+
+Runs on the same event loop as the Telegram ``Application`` instead of a
+Flask development server in a side thread, so slow audio downloads never
+block each other and never fight the bot for the GIL. Local files are sent
+with ``sendfile`` (zero-copy) by ``aiohttp.web.FileResponse``.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import hdrs, web
+
+from audio_http import (
+    CACHE_CONTROL, RangeNotSatisfiable, etag_for, guess_mime_type, parse_range
+)
+from config import Config
+from health_check import health_report, home_report, status_report
+from storage_refs import TELEGRAM_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class _AudioFileResponse(web.FileResponse):
+    """FileResponse validated by the stored file's ID rather than its mtime.
+
+    FileResponse derives its ETag and Last-Modified from mtime and size, but
+    the disk cache bumps mtime on every hit to track recency, so those
+    validators would change on every play. This uses ``etag_for(file_id)``
+    (the same ETag as the Flask tier) and handles If-None-Match and
+    If-Range itself; FileResponse still does Range and sendfile.
+    """
+
+    def __init__(self, path: Path, file_id: str, headers: dict):
+        self._audio_etag = etag_for(file_id)
+        super().__init__(path, headers=headers)
+
+    # FileResponse assigns its mtime validators right before sending headers
+    @web.FileResponse.etag.setter
+    def etag(self, value) -> None:
+        web.StreamResponse.etag.fset(self, self._audio_etag)
+
+    @web.FileResponse.last_modified.setter
+    def last_modified(self, value) -> None:
+        web.StreamResponse.last_modified.fset(self, None)
+
+    async def prepare(self, request: web.BaseRequest):
+        if_none_match = request.if_none_match
+        if if_none_match and any(tag.value in (self._audio_etag, '*') for tag in if_none_match):
+            self.set_status(304)
+            self.etag = self._audio_etag
+            return await web.StreamResponse.prepare(self, request)
+
+        # Leave FileResponse only the Range header to act on
+        headers = request.headers.copy()
+        for name in (hdrs.IF_NONE_MATCH, hdrs.IF_MODIFIED_SINCE, hdrs.IF_MATCH,
+                     hdrs.IF_UNMODIFIED_SINCE, hdrs.IF_RANGE):
+            headers.popall(name, None)
+        # If-Range: only honour the range if the client's copy is still current
+        if_range = request.headers.get(hdrs.IF_RANGE)
+        if if_range and if_range.strip('"') != self._audio_etag:
+            headers.popall(hdrs.RANGE, None)
+        return await super().prepare(request.clone(headers=headers))
+
+
+class WebServer:
+    def __init__(self, drive_service=None, telegram_storage=None, database_storage=None,
+                 local_storage=None, db=None, host: str = None, port: int = None):
+        self.drive_service = drive_service
+        self.db = db
+        self.local_storage = local_storage
+        self.telegram_storage = telegram_storage
+        self.database_storage = database_storage
+        self.host = host or Config.WEB_HOST
+        self.port = port or Config.WEB_PORT
+        self.audio_dir = Path("audio_files")
+        self._runner: Optional[web.AppRunner] = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/', self.home)
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/status', self.status)
+        app.router.add_get('/audio_files/{filename:.+}', self.serve_audio)
+        app.router.add_get('/audio/drive/{file_id}', self.serve_drive_audio)
+        app.router.add_get('/audio/telegram/{file_id}', self.serve_telegram_audio)
+        app.router.add_get('/audio/db/{file_id}', self.serve_database_audio)
+        return app
+
+    async def start(self) -> None:
+        """Start listening on the running event loop"""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Web server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.json_response(home_report())
+
+    async def health(self, request: web.Request) -> web.Response:
+        payload, status_code = health_report()
+        return web.json_response(payload, status=status_code)
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response(status_report())
+
+    @staticmethod
+    def _file_response(path: Path, file_id: str) -> web.FileResponse:
+        return _AudioFileResponse(path, file_id, headers={
+            'Content-Type': guess_mime_type(path.name),
+            'Cache-Control': CACHE_CONTROL,
+        })
+
+    async def _is_known_audio(self, ref: str) -> bool:
+        # Only audio the bot stored may be proxied, not any file our credentials can read
+        if self.db is None:
+            from database import Database
+            self.db = Database(read_only=True)
+        return await self.db.is_audio_path_referenced(ref)
+
+    async def serve_audio(self, request: web.Request) -> web.StreamResponse:
+        """Serve audio files from local storage"""
+        filename = request.match_info['filename']
+        # Security: prevent directory traversal
+        if '..' in filename or filename.startswith('/'):
+            raise web.HTTPForbidden()
+
+        file_path = self.audio_dir / filename
+        if not file_path.is_file():
+            # Cold files may have been packed into an archive by the quota manager
+            if self.local_storage is None:
+                from local_storage_service import LocalStorageService
+                self.local_storage = LocalStorageService()
+            file_path = await asyncio.to_thread(self.local_storage.fetch_archived, filename)
+            if file_path is None:
+                raise web.HTTPNotFound()
+
+        return self._file_response(file_path, filename)
+
+    async def serve_drive_audio(self, request: web.Request) -> web.StreamResponse:
+        """Serve Drive-stored audio from the disk cache, downloading it on a miss"""
+        file_id = request.match_info['file_id']
+        if not await self._is_known_audio(file_id):
+            raise web.HTTPNotFound()
+        if self.drive_service is None:
+            from google_services import GoogleDriveService
+            self.drive_service = GoogleDriveService()
+
+        try:
+            file_path = await asyncio.to_thread(self.drive_service.fetch_audio, file_id)
+        except Exception as e:
+            logger.error(f"Error serving Drive audio {file_id}: {e}")
+            raise web.HTTPNotFound()
+
+        return self._file_response(file_path, file_id)
+
+    async def serve_telegram_audio(self, request: web.Request) -> web.StreamResponse:
+        """Serve audio kept in the Telegram storage channel, fetching it on first play"""
+        file_id = request.match_info['file_id']
+        if not await self._is_known_audio(TELEGRAM_PREFIX + file_id):
+            raise web.HTTPNotFound()
+        if self.telegram_storage is None:
+            from telegram_storage_service import TelegramStorageService
+            self.telegram_storage = TelegramStorageService()
+
+        try:
+            file_path = await asyncio.to_thread(self.telegram_storage.fetch_audio, file_id)
+        except Exception as e:
+            logger.error(f"Error serving Telegram audio {file_id}: {e}")
+            raise web.HTTPNotFound()
+
+        return self._file_response(file_path, file_id)
+
+    def _read_range(self, file_id: str, start: int, end: int) -> bytes:
+        return b''.join(self.database_storage.iter_range(file_id, start, end))
+
+    async def serve_database_audio(self, request: web.Request) -> web.StreamResponse:
+        """Stream audio kept in the SQLite audio database one chunk at a time"""
+        file_id = request.match_info['file_id']
+        if self.database_storage is None:
+            from database_storage_service import DatabaseStorageService
+            self.database_storage = DatabaseStorageService()
+
+        audio = await asyncio.to_thread(self.database_storage.get_object, file_id)
+        if not audio:
+            raise web.HTTPNotFound()
+
+        size = audio['size']
+        etag = etag_for(file_id)
+        headers = {'Cache-Control': CACHE_CONTROL, 'Accept-Ranges': 'bytes'}
+
+        if_none_match = request.if_none_match
+        if if_none_match and any(tag.value in (etag, '*') for tag in if_none_match):
+            response = web.Response(status=304, headers=headers)
+            response.etag = etag
+            return response
+
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            raise web.HTTPRequestRangeNotSatisfiable(
+                headers={**headers, 'Content-Range': f"bytes */{size}"}
+            )
+
+        # If-Range: only honour the range if the client's copy is still current
+        if_range = request.headers.get('If-Range')
+        if byte_range and if_range and if_range.strip('"') != etag:
+            byte_range = None
+
+        start, end = byte_range or (0, size - 1)
+        response = web.StreamResponse(status=206 if byte_range else 200, headers=headers)
+        if byte_range:
+            response.headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response.content_type = audio['mime_type'] or 'audio/mpeg'
+        response.content_length = end - start + 1
+        response.etag = etag
+        await response.prepare(request)
+
+        if request.method != 'HEAD':
+            # Read one storage chunk at a time off the loop
+            position = start
+            while position <= end:
+                window_end = min(end, position + self.database_storage.CHUNK_SIZE - 1)
+                data = await asyncio.to_thread(self._read_range, file_id, position, window_end)
+                await response.write(data)
+                position = window_end + 1
+
+        await response.write_eof()
+        return response
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for the standalone web tier.
+
+Serves /audio_files, /audio/*, /health and /status from gunicorn workers,
+separately from the bot process, so heavy review traffic can't starve the
+bot. Run with:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+and set WEB_SERVER_ENABLED=false for the bot. Both processes must share
+the working directory's audio_files/ and the data/ directory; the web tier
+only reads them (plus the Telegram audio cache, which it fills on demand).
+It opens the local audio index, the audio database and the bot database
+read-only, so start the bot first to create them.
+"""
+
+import sys
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from health_check import app
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000, debug=False)